@@ -0,0 +1,273 @@
+import argparse
+import json
+import math
+import time
+from bisect import bisect_right
+from datetime import datetime
+
+from classifier import GAME_VERSION_TIERS, WEIGHT_LOG_SUBS, LANGUAGE_TARGETS
+
+# 可选: NumPy 向量化打分 (没有安装时使用纯 Python 实现，结果相同)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ================= 配置区域 =================
+MAP_FILE = './translation_map.json'   # match.py 生成的对照表
+EXAMPLE_COUNT = 5                     # 每个方案列出的变化示例数
+# ===========================================
+
+# 简繁类型编码
+LANG_CODES = {'simplified': 0, 'traditional': 1, 'both': 2}
+LANG_NAMES = {code: name for name, code in LANG_CODES.items()}
+
+
+def parse_tiers(tiers):
+    """{版本名: 发布日期} -> (按时间升序的时间戳列表, 对应的版本等级列表)，规则与 classifier.parse_version_tiers 相同"""
+    timestamps = []
+    levels = []
+    for idx, (_, date_str) in enumerate(sorted(tiers.items(), key=lambda x: x[1])):
+        try:
+            timestamps.append(datetime.strptime(date_str, "%Y-%m-%d").timestamp())
+            levels.append(idx + 1)
+        except ValueError:
+            pass
+    return timestamps, levels
+
+
+def parse_tier_spec(spec):
+    """命令行的版本设置: JSON 文件路径，或 "1.6=2025-07-12,1.5=2024-04-12" """
+    if '=' not in spec:
+        with open(spec, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    tiers = {}
+    for part in spec.split(','):
+        name, _, date_str = part.partition('=')
+        tiers[name.strip()] = date_str.strip()
+    return tiers
+
+
+def eligibility_codes(preference):
+    """
+    语言偏好 -> 各简繁类型的优先级 (0 = 不可用)
+    繁体偏好: 繁体/通用为 2，简体为 1 (只有在没有繁体/通用时才会被选中，与 rank_translations 的回退规则一致)
+    """
+    codes = [0, 0, 0]
+    for lang_type in LANGUAGE_TARGETS[preference]:
+        codes[LANG_CODES[lang_type]] = 2
+    if preference == 'traditional':
+        codes[LANG_CODES['simplified']] = max(codes[LANG_CODES['simplified']], 1)
+    return codes
+
+
+class CandidateTable:
+    """
+    对照表中的全部候选汉化，按列存放
+    第 i 个原版的候选为 [offsets[i], offsets[i + 1]) 行，行内顺序与对照表中 translations 的顺序相同
+    """
+    def __init__(self, translation_map):
+        self.parent_ids = []
+        self.translation_ids = []
+        self.titles = []
+        offsets = [0]
+        updated = []
+        subs = []
+        langs = []
+        for parent_id, mod_data in translation_map.items():
+            self.parent_ids.append(parent_id)
+            for trans in mod_data.get('translations', []):
+                self.translation_ids.append(str(trans['id']))
+                self.titles.append(trans.get('title', ''))
+                updated.append(float(trans.get('updated', 0) or 0))
+                subs.append(float(trans.get('subs', 0) or 0))
+                langs.append(LANG_CODES.get(trans.get('lang_type'), LANG_CODES['both']))
+            offsets.append(len(updated))
+
+        if np is not None:
+            self.offsets = np.array(offsets, dtype=np.int64)
+            self.updated = np.array(updated, dtype=np.float64)
+            self.subs = np.array(subs, dtype=np.float64)
+            self.langs = np.array(langs, dtype=np.int8)
+            # 每行所属原版的下标 (向量化分组用)
+            self.parent_index = np.repeat(np.arange(len(self.parent_ids)), np.diff(self.offsets))
+        else:
+            self.offsets = offsets
+            self.updated = updated
+            self.subs = subs
+            self.langs = langs
+
+    @classmethod
+    def load(cls, path=MAP_FILE):
+        with open(path, 'rb') as f:
+            return cls(orjson.loads(f.read()) if orjson else json.load(f))
+
+    def __len__(self):
+        return len(self.translation_ids)
+
+    def score(self, weight_log_subs=WEIGHT_LOG_SUBS, tiers=GAME_VERSION_TIERS):
+        """返回 (版本等级, 次级分数) 两列，与 classifier.calculate_sort_score 的元组一一对应"""
+        timestamps, levels = parse_tiers(tiers)
+        if np is not None:
+            level_table = np.array([0] + levels, dtype=np.int64)
+            tier = level_table[np.searchsorted(np.array(timestamps, dtype=np.float64), self.updated, side='right')]
+            secondary = self.updated / 86400.0 + np.log10(np.maximum(self.subs, 1.0)) * weight_log_subs
+            return tier, secondary
+        level_table = [0] + levels
+        tier = [level_table[bisect_right(timestamps, ts)] for ts in self.updated]
+        secondary = [ts / 86400.0 + math.log10(max(1.0, s)) * weight_log_subs for ts, s in zip(self.updated, self.subs)]
+        return tier, secondary
+
+    def best_picks(self, preference, weight_log_subs=WEIGHT_LOG_SUBS, tiers=GAME_VERSION_TIERS):
+        """
+        一次求出每个原版在该语言偏好下的首选汉化，返回每个原版对应的行号 (没有可用汉化时为 -1)
+        排序键为 (语言优先级, 版本等级, 次级分数, -行号)，分数相同时取排在前面的，与 sorted(reverse=True) 的稳定排序一致
+        """
+        tier, secondary = self.score(weight_log_subs, tiers)
+        codes = eligibility_codes(preference)
+        if np is not None:
+            eligible = np.array(codes, dtype=np.int8)[self.langs]
+            rows = np.arange(len(self))
+            # 按原版分组，组内按排序键升序，每组最后一行即最佳
+            order = np.lexsort((-rows, secondary, tier, eligible, self.parent_index))
+            counts = np.diff(self.offsets)
+            picks = np.full(len(self.parent_ids), -1, dtype=np.int64)
+            nonempty = counts > 0
+            last = order[self.offsets[1:][nonempty] - 1]
+            picks[nonempty] = np.where(eligible[last] > 0, last, -1)
+            return picks
+
+        picks = []
+        for start, end in zip(self.offsets, self.offsets[1:]):
+            best_key = None
+            best_row = -1
+            for row in range(start, end):
+                eligible = codes[self.langs[row]]
+                if not eligible:
+                    continue
+                key = (eligible, tier[row], secondary[row])
+                if best_key is None or key > best_key:
+                    best_key, best_row = key, row
+            picks.append(best_row)
+        return picks
+
+
+def compare_picks(table, baseline, candidate, limit=EXAMPLE_COUNT):
+    """统计两组首选中不同的原版数，并给出前 limit 个示例"""
+    if np is not None:
+        changed = np.nonzero(baseline != candidate)[0]
+        count = int(changed.size)
+        changed = changed[:limit].tolist()
+    else:
+        changed = [i for i, (a, b) in enumerate(zip(baseline, candidate)) if a != b]
+        count = len(changed)
+        changed = changed[:limit]
+
+    def describe(row):
+        row = int(row)
+        return None if row < 0 else {'id': table.translation_ids[row], 'title': table.titles[row]}
+
+    examples = [{'parent': table.parent_ids[i], 'before': describe(baseline[i]), 'after': describe(candidate[i])}
+                for i in changed]
+    return count, examples
+
+
+def what_if(table, scenarios, preferences=tuple(LANGUAGE_TARGETS), limit=EXAMPLE_COUNT):
+    """
+    scenarios: [(方案名, 订阅数权重, 版本设置)]
+    与当前配置 (WEIGHT_LOG_SUBS, GAME_VERSION_TIERS) 相比，各方案下首选汉化发生变化的原版数
+    """
+    baselines = {pref: table.best_picks(pref) for pref in preferences}
+    report = []
+    for name, weight, tiers in scenarios:
+        started = time.perf_counter()
+        entry = {'name': name, 'weight_log_subs': weight, 'tiers': tiers, 'changes': {}}
+        for pref in preferences:
+            count, examples = compare_picks(table, baselines[pref], table.best_picks(pref, weight, tiers), limit)
+            entry['changes'][pref] = {'count': count, 'examples': examples}
+        entry['milliseconds'] = round((time.perf_counter() - started) * 1000, 3)
+        report.append(entry)
+    return report
+
+
+def check_against_map(table, translation_map, preference='simplified'):
+    """当前配置下的首选与对照表中预先排好的 best 不一致的原版数 (对照表由旧配置生成时会不一致)"""
+    picks = table.best_picks(preference)
+    mismatches = 0
+    for i, parent_id in enumerate(table.parent_ids):
+        ranked = translation_map[parent_id].get('best', {}).get(preference)
+        if ranked is None:
+            continue
+        expected = str(ranked[0]['id']) if ranked else None
+        actual = table.translation_ids[int(picks[i])] if picks[i] >= 0 else None
+        if expected != actual:
+            mismatches += 1
+    return mismatches
+
+
+def build_scenarios(weights, tier_specs):
+    """订阅数权重与版本设置的全部组合 (不含当前配置本身)"""
+    tier_options = [('当前版本设置', GAME_VERSION_TIERS)] + [(spec, parse_tier_spec(spec)) for spec in tier_specs]
+    weight_options = sorted(set(weights) | {WEIGHT_LOG_SUBS})
+    scenarios = []
+    for tier_name, tiers in tier_options:
+        for weight in weight_options:
+            if weight == WEIGHT_LOG_SUBS and tiers is GAME_VERSION_TIERS:
+                continue
+            scenarios.append((f"WEIGHT_LOG_SUBS={weight:g}, {tier_name}", weight, tiers))
+    return scenarios
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量打分: 评估不同排序权重和版本设置对首选汉化的影响')
+    parser.add_argument('--map', default=MAP_FILE, help='translation_map.json 路径')
+    parser.add_argument('--weights', default='',
+                        help='要比较的订阅数权重，逗号分隔 (例如 60,120)')
+    parser.add_argument('--tiers', action='append', default=[],
+                        help='要比较的版本设置: JSON 文件或 "1.6=2025-07-12,1.5=2024-04-12"，可重复指定')
+    parser.add_argument('--examples', type=int, default=EXAMPLE_COUNT, help='每个方案列出的变化示例数')
+    parser.add_argument('--output', help='把完整报告写入该 JSON 文件')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with open(args.map, 'rb') as f:
+        translation_map = orjson.loads(f.read()) if orjson else json.load(f)
+    table = CandidateTable(translation_map)
+    load_ms = (time.perf_counter() - started) * 1000
+    print(f"已加载 {len(table.parent_ids)} 个原版Mod，{len(table)} 个候选汉化 ({load_ms:.1f} ms，"
+          f"{'NumPy' if np is not None else '纯 Python'} 模式)")
+
+    started = time.perf_counter()
+    mismatches = check_against_map(table, translation_map)
+    print(f"当前配置打分 {(time.perf_counter() - started) * 1000:.1f} ms；与对照表中预排的首选不一致: {mismatches} 个")
+
+    weights = [float(w) for w in args.weights.split(',') if w.strip()]
+    scenarios = build_scenarios(weights, args.tiers)
+    if not scenarios:
+        print("未指定要比较的方案 (--weights / --tiers)。")
+        return
+
+    report = what_if(table, scenarios, limit=args.examples)
+    for entry in report:
+        counts = '，'.join(f"{pref} {change['count']} 个" for pref, change in entry['changes'].items())
+        print(f"\n[{entry['name']}] 首选变化: {counts} ({entry['milliseconds']:.1f} ms)")
+        for pref, change in entry['changes'].items():
+            for example in change['examples']:
+                before = example['before']['title'] if example['before'] else '无'
+                after = example['after']['title'] if example['after'] else '无'
+                print(f"  {pref} {example['parent']}: {before} -> {after}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'mods': len(table.parent_ids), 'candidates': len(table), 'map_mismatches': mismatches,
+                       'scenarios': report}, f, ensure_ascii=False, indent=2)
+        print(f"\n报告已写入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,520 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import match
+import subscribe
+from binmap import write_binary_map, BinaryTranslationMap
+from item_table import ItemTable
+
+# ================= 配置区域 =================
+BENCH_ITEMS = 20000                   # 合成数据集的条目数
+TRANSLATION_RATIO = 0.15              # 汉化包占比
+# 每个版本标签出现的概率 (原版Mod与汉化包相同)
+VERSION_TAG_WEIGHTS = {'1.6': 0.55, '1.5': 0.5, '1.4': 0.35, '1.3': 0.2}
+# 原版Mod的其他标签及其出现概率
+EXTRA_TAG_WEIGHTS = {'Mod': 0.9, 'Scenario': 0.03, 'Misc': 0.2, 'Gameplay': 0.3, 'Textures': 0.1}
+# 汉化包依赖的原版数量 -> 概率 (汉化合集会依赖多个原版)
+CHILD_FANOUT_WEIGHTS = {1: 0.85, 2: 0.1, 5: 0.04, 20: 0.01}
+# 汉化包标题模板 -> 概率 (决定简繁类型的分布)
+TRANSLATION_TITLE_WEIGHTS = {
+    '{name} 汉化': 0.4,
+    '{name} 简体中文': 0.2,
+    '[CN] {name}': 0.1,
+    '{name} Chinese Translation': 0.1,
+    '{name} 繁體中文 TW': 0.1,
+    '{name} 简繁中文': 0.1,
+}
+TIME_RANGE = ('2020-01-01', '2025-10-01')  # 条目更新时间的分布范围
+
+SUBSCRIBED_COUNT = 1000               # 模拟的已订阅原版Mod数量
+CONFIRM_SAMPLE = 200                  # 订阅确认测试最多发送的请求数
+PAGE_SIZE = 100                       # 模拟服务每页条目数 (与 QueryFiles 一致)
+MOCK_LATENCY = 0.0                    # 模拟服务每个请求的延迟 (秒)
+MOCK_ERROR_RATE = 0.0                 # 模拟服务返回 503 的概率
+MOCK_RETRY_AFTER = 0                  # 503 响应的 Retry-After (秒)
+CALLBACK_LATENCY = 0.05               # 模拟 Steam 订阅回调的延迟 (秒)
+CALLBACK_FAILURE_RATE = 0.02          # 模拟订阅失败的概率
+REPEAT = 3                            # 本地计算类测试重复次数 (取最快一次)
+SEED = 42
+# ===========================================
+
+NAME_WORDS = ['Vanilla', 'Expanded', 'Factions', 'Weapons', 'Animals', 'Furniture', 'Psycasts', 'Medieval',
+              'Mechanoids', 'Genes', 'Ideology', 'Storage', 'Power', 'Security', 'Apparel', 'Core', 'Framework',
+              'Quality', 'Biomes', 'Outposts', 'Hospitality', 'Dubs', 'Rimfeller', 'Android', 'Tiers']
+
+
+def weighted_choice(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def generate_dataset(count=BENCH_ITEMS, translation_ratio=TRANSLATION_RATIO, seed=SEED):
+    """
+    生成与 QueryFiles 返回格式一致的合成条目 (标签为 [{'tag': ...}]，依赖为 [{'publishedfileid': ...}])
+    热门原版会被更多汉化包依赖 (按排名偏斜选择)
+    """
+    rng = random.Random(seed)
+    start = time.mktime(time.strptime(TIME_RANGE[0], '%Y-%m-%d'))
+    end = time.mktime(time.strptime(TIME_RANGE[1], '%Y-%m-%d'))
+    translation_count = int(count * translation_ratio)
+    original_count = count - translation_count
+
+    def make_item(item_id, title, tags, children):
+        created = rng.uniform(start, end)
+        subs = int(rng.paretovariate(1.2) * 50)
+        return {
+            'result': 1,
+            'publishedfileid': str(item_id),
+            'creator': str(76561198000000000 + rng.randrange(10 ** 6)),
+            'consumer_appid': 294100,
+            'title': title,
+            'file_description': f"{title} ...",
+            'time_created': int(created),
+            'time_updated': int(rng.uniform(created, end)),
+            'subscriptions': subs,
+            'favorited': subs // 20,
+            'views': subs * 3,
+            'tags': [{'tag': tag, 'display_name': tag} for tag in tags],
+            'children': [{'publishedfileid': str(child), 'sortorder': i, 'file_type': 0}
+                         for i, child in enumerate(children)],
+            'vote_data': {'score': rng.random(), 'votes_up': subs // 10, 'votes_down': subs // 100},
+        }
+
+    def pick_tags(weights):
+        return [tag for tag, weight in weights.items() if rng.random() < weight]
+
+    items = []
+    original_ids = []
+    original_names = {}
+    next_id = 1000000000
+    for _ in range(original_count):
+        name = ' '.join(rng.sample(NAME_WORDS, 2)) + f" {next_id % 10000}"
+        items.append(make_item(next_id, name, pick_tags(VERSION_TAG_WEIGHTS) + pick_tags(EXTRA_TAG_WEIGHTS), []))
+        original_ids.append(next_id)
+        original_names[next_id] = name
+        next_id += 1
+
+    for _ in range(translation_count):
+        fanout = min(weighted_choice(rng, CHILD_FANOUT_WEIGHTS), len(original_ids))
+        # 随机数平方后排名靠前的原版被选中的概率更高
+        parents = {original_ids[int(len(original_ids) * rng.random() ** 2)] for _ in range(fanout)}
+        name = original_names[min(parents)] if len(parents) == 1 else f"汉化合集 {next_id % 10000}"
+        title = weighted_choice(rng, TRANSLATION_TITLE_WEIGHTS).format(name=name)
+        items.append(make_item(next_id, title, ['Translation'] + pick_tags(VERSION_TAG_WEIGHTS), sorted(parents)))
+        next_id += 1
+
+    rng.shuffle(items)
+    return items
+
+
+def clean_items(raw_items):
+    """与 scrap.clean_workshop_item (全部字段) 相同: 标签转为字符串列表"""
+    cleaned = []
+    for item in raw_items:
+        clean_item = item.copy()
+        clean_item['tags'] = [t.get('tag') for t in item['tags'] if 'tag' in t]
+        cleaned.append(clean_item)
+    return cleaned
+
+
+class MockQueryFilesServer:
+    """
+    本地模拟的 IPublishedFileService/QueryFiles (以及按ID查询的 GetDetails)
+    支持游标翻页、包含/排除标签 (任一标签即匹配)、按创建日期筛选 (date_range_created)、按更新时间排序 (query_type=21)、return_* 字段开关，
+    以及注入延迟和 503 错误 (带 Retry-After)
+    """
+    def __init__(self, items, latency=MOCK_LATENCY, error_rate=MOCK_ERROR_RATE, seed=SEED):
+        self.items = items
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._views = {}
+        self._by_id = {item['publishedfileid']: item for item in items}
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/IPublishedFileService/QueryFiles/v1/"
+
+    @property
+    def details_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/IPublishedFileService/GetDetails/v1/"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _view(self, required, excluded, query_type, created_range=(0, 2 ** 32 - 1)):
+        """按查询条件筛选并排序的结果 (同样的条件只计算一次)"""
+        key = (required, excluded, query_type, created_range)
+        with self._lock:
+            if key not in self._views:
+                required_set, excluded_set = set(required), set(excluded)
+                view = []
+                for item in self.items:
+                    tags = {t['tag'] for t in item['tags']}
+                    if required_set and not tags & required_set:
+                        continue
+                    if tags & excluded_set:
+                        continue
+                    if not created_range[0] <= item['time_created'] <= created_range[1]:
+                        continue
+                    view.append(item)
+                sort_key = 'time_updated' if query_type == 21 else 'time_created'
+                view.sort(key=lambda item: item[sort_key], reverse=True)
+                self._views[key] = view
+            return self._views[key]
+
+    def _begin_request(self):
+        """计数、注入延迟和错误；需要返回错误时返回错误响应，否则返回 None"""
+        with self._lock:
+            self.requests += 1
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            return 503, {'Retry-After': str(MOCK_RETRY_AFTER)}, b'{}'
+        return None
+
+    def _respond(self, response):
+        body = json.dumps({'response': response}, ensure_ascii=False).encode('utf-8')
+        with self._lock:
+            self.bytes_sent += len(body)
+        return 200, {'Content-Type': 'application/json'}, body
+
+    @staticmethod
+    def _project(item, flag):
+        """按请求中的字段开关裁剪条目"""
+        detail = dict(item)
+        for key, flag_name in (('tags', 'tags'), ('children', 'children'), ('vote_data', 'votes')):
+            if not flag(flag_name):
+                detail.pop(key)
+        if flag('short_description'):
+            detail['short_description'] = detail.pop('file_description')[:100]
+        return detail
+
+    @staticmethod
+    def _indexed(params, name):
+        """取出 name[0], name[1] ... 形式的数组参数 (按下标顺序)"""
+        values = [(int(key[len(name) + 1:-1]), value) for key, value in params.items()
+                  if key.startswith(f'{name}[') and key.endswith(']')]
+        return tuple(value for _, value in sorted(values))
+
+    def details(self, params):
+        """处理一次 GetDetails 请求；不存在的ID返回 result=9"""
+        error = self._begin_request()
+        if error:
+            return error
+        flag = lambda name: params.get(f'include{name}', params.get(name)) == '1'
+        details = []
+        for item_id in self._indexed(params, 'publishedfileids'):
+            item = self._by_id.get(item_id)
+            details.append(self._project(item, flag) if item else {'publishedfileid': item_id, 'result': 9})
+        return self._respond({'resultcount': len(details), 'publishedfiledetails': details})
+
+    def query(self, params):
+        """处理一次 QueryFiles 请求，返回 (状态码, 响应头, 响应体)"""
+        error = self._begin_request()
+        if error:
+            return error
+
+        flag = lambda name: params.get(f'return_{name}' if name != 'votes' else 'return_vote_data') == '1'
+        created_range = (int(params.get('date_range_created[timestamp_start]', 0)),
+                         int(params.get('date_range_created[timestamp_end]', 2 ** 32 - 1)))
+        view = self._view(self._indexed(params, 'requiredtags'), self._indexed(params, 'excludedtags'),
+                          int(params.get('query_type', 1)), created_range)
+        cursor = params.get('cursor', '*')
+        offset = 0 if cursor == '*' else int(cursor)
+        page_size = min(int(params.get('numperpage', PAGE_SIZE)), PAGE_SIZE)
+        page = view[offset:offset + page_size]
+        next_offset = offset + len(page)
+
+        return self._respond({
+            'total': len(view),
+            'publishedfiledetails': [self._project(item, flag) for item in page],
+            # 最后一页的下一页游标与本页相同 (与 Steam 的行为一致)
+            'next_cursor': str(next_offset) if next_offset < len(view) else cursor,
+        })
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+                path = parsed.path.rstrip('/')
+                if path == '/IPublishedFileService/QueryFiles/v1':
+                    status, headers, body = server.query(params)
+                elif path == '/IPublishedFileService/GetDetails/v1':
+                    status, headers, body = server.details(params)
+                else:
+                    status, headers, body = 404, {}, b'{}'
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class FakeSubscriptionResult:
+    def __init__(self, published_file_id, result):
+        self.publishedFileId = published_file_id
+        self.result = result
+
+
+class FakeWorkshop:
+    def __init__(self, owner):
+        self._owner = owner
+        self._callback = None
+
+    def GetNumSubscribedItems(self):
+        return len(self._owner.subscribed)
+
+    def GetSubscribedItems(self, count):
+        return [int(item_id) for item_id in list(self._owner.subscribed)[:count]]
+
+    def SetItemSubscribedCallback(self, callback):
+        self._callback = callback
+
+    def SubscribeItem(self, published_file_id):
+        self._owner.subscribe_calls += 1
+        success = self._owner.rng.random() >= self._owner.failure_rate
+        if success and self._owner.instant_state:
+            self._owner.subscribed.add(str(published_file_id))
+        if self._owner.callback_latency is None:
+            return
+        due = time.monotonic() + self._owner.callback_latency
+        self._owner.queued.append((due, FakeSubscriptionResult(published_file_id, 1 if success else 2)))
+
+    def GetItemState(self, published_file_id):
+        return subscribe.K_EITEM_STATE_SUBSCRIBED if str(published_file_id) in self._owner.subscribed else 0
+
+
+class FakeApps:
+    def IsSubscribedApp(self, app_id):
+        return True
+
+
+class FakeSteamworks:
+    """
+    模拟 SteamworksPy 的 STEAMWORKS 对象 (只实现 subscribe.py 用到的接口)
+    订阅请求在 callback_latency 秒后由 run_callbacks 触发回调，按 failure_rate 随机失败
+    instant_state=False 时订阅状态 (GetItemState) 要等成功回调送达后才变化，callback_latency=None 时永远没有回调
+    """
+    def __init__(self, subscribed=(), callback_latency=CALLBACK_LATENCY, failure_rate=CALLBACK_FAILURE_RATE,
+                 instant_state=True, seed=SEED):
+        self.subscribed = set(str(item_id) for item_id in subscribed)
+        self.callback_latency = callback_latency
+        self.failure_rate = failure_rate
+        self.instant_state = instant_state
+        self.rng = random.Random(seed)
+        self.queued = []
+        self.subscribe_calls = 0
+        self.Workshop = FakeWorkshop(self)
+        self.Apps = FakeApps()
+
+    def initialize(self):
+        pass
+
+    def run_callbacks(self):
+        now = time.monotonic()
+        due = [result for at, result in self.queued if at <= now]
+        self.queued = [(at, result) for at, result in self.queued if at > now]
+        for result in due:
+            if result.result == subscribe.K_ERESULT_OK:
+                self.subscribed.add(str(result.publishedFileId))
+            if self.Workshop._callback:
+                self.Workshop._callback(result)
+
+
+def best_time(func, repeat=REPEAT):
+    """重复执行取最快一次，返回 (耗时, 最后一次的返回值)"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_scrap(raw_items, results, latency, error_rate, workers):
+    """通过本地模拟服务测试 fetch_clean_workshop_data 的翻页速度"""
+    try:
+        import scrap
+    except ImportError as e:
+        print(f"跳过 scrap.py 测试 (缺少依赖: {e})")
+        return
+
+    work_dir = tempfile.mkdtemp(prefix='bench_scrap_')
+    try:
+        with MockQueryFilesServer(raw_items, latency=latency, error_rate=error_rate) as server:
+            scrap.QUERY_FILES_URL = server.url
+            scrap.OUTPUT_FOLDER = work_dir
+            # 限速器给一个很高的上限，只测量爬取本身的开销
+            limiter = scrap.RateLimiter(10000.0)
+
+            runs = [('fetch_clean_workshop_data', lambda: scrap.fetch_clean_workshop_data(
+                'bench', scrap.APP_ID, query_type=1, max_pages=10 ** 6, rate_limiter=limiter))]
+            if workers > 1:
+                runs.append((f'fetch_sharded_workshop_data[{workers}]', lambda: scrap.fetch_sharded_workshop_data(
+                    'bench', scrap.APP_ID, required_tags=list(VERSION_TAG_WEIGHTS), query_type=1,
+                    max_pages=10 ** 6, workers=workers, requests_per_second=10000.0)))
+
+            for name, run in runs:
+                scrap.temp_data.clear()
+                scrap.clear_checkpoints()
+                requests_before, errors_before = server.requests, server.errors
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    fetched = run()
+                elapsed = time.perf_counter() - start
+                pages = (server.requests - requests_before) - (server.errors - errors_before)
+                results[f'scrap.{name}.pages_per_second'] = pages / elapsed
+                results[f'scrap.{name}.items'] = len(fetched)
+                print(f"{name}: {pages} 页 / {elapsed:.2f} 秒 = {pages / elapsed:.1f} 页/秒 "
+                      f"({len(fetched)} 条，注入错误 {server.errors - errors_before} 次)")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_match(cleaned_items, results):
+    """测试 match.process_chunk_items 的吞吐量和对照表生成耗时，返回生成的对照表"""
+    def process():
+        ref_map, relation_map = ItemTable(), {}
+        match.process_chunk_items(cleaned_items, ref_map, relation_map)
+        return relation_map
+
+    elapsed, relation_map = best_time(process)
+    results['match.process_chunk_items.items_per_second'] = len(cleaned_items) / elapsed
+    print(f"process_chunk_items: {len(cleaned_items)} 条 / {elapsed:.3f} 秒 = "
+          f"{len(cleaned_items) / elapsed:,.0f} 条/秒 ({len(relation_map)} 个原版有汉化)")
+
+    def build_map():
+        ref_map = ItemTable()
+        relations = match.build_relations(cleaned_items, ref_map)
+        return {parent_id: match.build_parent_entry(parent_id, ref_map, list(translations.values()))
+                for parent_id, translations in relations.items()}
+
+    elapsed, translation_map = best_time(build_map)
+    results['match.build_map.seconds'] = elapsed
+    print(f"生成对照表 (含推荐排序): {elapsed:.3f} 秒")
+    return translation_map
+
+
+def bench_subscribe(translation_map, cleaned_items, results, subscribed_count, seed):
+    """测试 subscribe.py 的订阅规划 (JSON 与二进制对照表) 和订阅确认耗时"""
+    rng = random.Random(seed)
+    originals = [item['publishedfileid'] for item in cleaned_items if 'Translation' not in item['tags']]
+    subscribed = set(rng.sample(originals, min(subscribed_count, len(originals))))
+
+    for preference in ('simplified', 'traditional'):
+        elapsed, planned = best_time(lambda: subscribe.plan_subscriptions(translation_map, subscribed, preference))
+        results[f'subscribe.plan.{preference}.seconds'] = elapsed
+        print(f"订阅规划 ({preference}, JSON 对照表): {len(subscribed)} 个已订阅 -> "
+              f"{len(planned)} 个待订阅，{elapsed * 1000:.2f} 毫秒")
+
+    work_dir = tempfile.mkdtemp(prefix='bench_subscribe_')
+    try:
+        binary_path = os.path.join(work_dir, 'translation_map.bin')
+        write_binary_map(binary_path, translation_map)
+
+        def plan_binary():
+            with BinaryTranslationMap(binary_path) as binary_map:
+                return subscribe.plan_subscriptions(binary_map, subscribed, 'simplified')
+
+        elapsed, planned = best_time(plan_binary)
+        results['subscribe.plan.binary.seconds'] = elapsed
+        print(f"订阅规划 (simplified, 二进制对照表，含打开文件): {elapsed * 1000:.2f} 毫秒")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    # 订阅确认: 用模拟的 Steam 客户端发送一部分待订阅请求
+    titles = {item['id']: item['title'] for item in planned[:CONFIRM_SAMPLE]}
+    if not titles:
+        return
+    steam = FakeSteamworks(subscribed=subscribed, seed=seed)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        confirmed, failed = subscribe.SubscriptionConfirmer(steam, titles).run()
+    elapsed = time.perf_counter() - start
+    results['subscribe.confirm.seconds'] = elapsed
+    results['subscribe.confirm.requests'] = steam.subscribe_calls
+    print(f"订阅确认: {len(titles)} 个请求，确认 {len(confirmed)} 个，失败 {len(failed)} 个，"
+          f"共发送 {steam.subscribe_calls} 次，{elapsed:.2f} 秒")
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='离线性能测试: 合成数据 + 本地模拟 QueryFiles + 模拟 Steam 客户端')
+    parser.add_argument('--items', type=int, default=BENCH_ITEMS, help='合成数据集的条目数')
+    parser.add_argument('--translation-ratio', type=float, default=TRANSLATION_RATIO, help='汉化包占比')
+    parser.add_argument('--subscribed', type=int, default=SUBSCRIBED_COUNT, help='模拟的已订阅原版Mod数量')
+    parser.add_argument('--latency', type=float, default=MOCK_LATENCY, help='模拟服务每个请求的延迟 (秒)')
+    parser.add_argument('--error-rate', type=float, default=MOCK_ERROR_RATE, help='模拟服务返回 503 的概率')
+    parser.add_argument('--workers', type=int, default=1, help='>1 时额外测试并发分片爬取')
+    parser.add_argument('--seed', type=int, default=SEED, help='随机种子 (相同种子生成相同数据)')
+    parser.add_argument('--skip', nargs='*', choices=['scrap', 'match', 'subscribe'], default=[],
+                        help='跳过指定的测试')
+    parser.add_argument('--output', help='把结果写入 JSON 文件，便于对比不同版本')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    results = {}
+
+    print(f"生成合成数据: {args.items} 条，汉化包占比 {args.translation_ratio:.0%} ...")
+    raw_items = generate_dataset(args.items, args.translation_ratio, args.seed)
+    cleaned_items = clean_items(raw_items)
+
+    if 'scrap' not in args.skip:
+        print("\n=== scrap.py ===")
+        bench_scrap(raw_items, results, args.latency, args.error_rate, args.workers)
+
+    translation_map = None
+    if 'match' not in args.skip or 'subscribe' not in args.skip:
+        print("\n=== match.py ===")
+        translation_map = bench_match(cleaned_items, results)
+
+    if 'subscribe' not in args.skip:
+        print("\n=== subscribe.py ===")
+        bench_subscribe(translation_map, cleaned_items, results, args.subscribed, args.seed)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.output}")
@@ -0,0 +1,157 @@
+import json
+import mmap
+import os
+import struct
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 二进制对照表格式 (所有整数为小端):
+#   文件头:   MAGIC(4) 版本(u32) 条目数 N(u64)
+#   ID 表:    N 个 u64，按 publishedfileid 升序
+#   偏移表:   N+1 个 u64，第 i 项数据位于 [offset[i], offset[i+1])，相对数据区起点
+#   数据区:   每项为一个原版Mod条目的紧凑 JSON (与 translation_map.json 中的值相同)
+MAGIC = b'RWTM'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sIQ')
+U64 = struct.Struct('<Q')
+
+
+def dumps(value):
+    if orjson:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def write_binary_map(path, translation_map):
+    """
+    把对照表写成二进制格式 (先写临时文件再替换)
+    ID 表只能存放无符号整数，非数字的 ID (如缺少 publishedfileid 时的 'None') 会被跳过并提示
+    """
+    entries = []
+    skipped = []
+    for mod_id, data in translation_map.items():
+        try:
+            numeric_id = int(mod_id)
+        except (TypeError, ValueError):
+            skipped.append(mod_id)
+            continue
+        if not 0 <= numeric_id < 2 ** 64:
+            skipped.append(mod_id)
+            continue
+        entries.append((numeric_id, data))
+    if skipped:
+        print(f"警告: 跳过 {len(skipped)} 个非数字 ID 的条目: {', '.join(map(str, skipped[:5]))}")
+    entries.sort(key=lambda e: e[0])
+    count = len(entries)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, count))
+        for mod_id, _ in entries:
+            f.write(U64.pack(mod_id))
+
+        # 偏移表先占位，写完数据区再回填
+        offsets_pos = f.tell()
+        f.write(b'\0' * U64.size * (count + 1))
+        offsets = [0]
+        for _, data in entries:
+            blob = dumps(data)
+            f.write(blob)
+            offsets.append(offsets[-1] + len(blob))
+
+        f.seek(offsets_pos)
+        f.write(b''.join(U64.pack(offset) for offset in offsets))
+    os.replace(tmp_path, path)
+
+
+class BinaryTranslationMap:
+    """
+    只读的二进制对照表，通过 mmap 访问
+    打开时只读取文件头，按 publishedfileid 查询时在 ID 表上二分查找，只解析命中的条目
+    用法与 dict 相同: mod_id in m / m[mod_id] / m.get(mod_id)
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法 mmap
+            self._file.close()
+            raise ValueError(f"{path} 不是有效的二进制对照表")
+
+        try:
+            magic, version, count = HEADER.unpack_from(self._mm, 0)
+        except struct.error:
+            magic, version, count = b'', 0, 0
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} 不是有效的二进制对照表 (或版本不兼容)")
+        self._count = count
+        self._ids_pos = HEADER.size
+        self._offsets_pos = self._ids_pos + U64.size * count
+        self._data_pos = self._offsets_pos + U64.size * (count + 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __len__(self):
+        return self._count
+
+    def _id_at(self, index):
+        return U64.unpack_from(self._mm, self._ids_pos + U64.size * index)[0]
+
+    def _find(self, mod_id):
+        """二分查找，返回条目下标；不存在时返回 -1"""
+        try:
+            target = int(mod_id)
+        except (TypeError, ValueError):
+            return -1
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._id_at(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count and self._id_at(lo) == target:
+            return lo
+        return -1
+
+    def __contains__(self, mod_id):
+        return self._find(mod_id) >= 0
+
+    def __getitem__(self, mod_id):
+        index = self._find(mod_id)
+        if index < 0:
+            raise KeyError(mod_id)
+        start, end = struct.unpack_from('<QQ', self._mm, self._offsets_pos + U64.size * index)
+        return loads(self._mm[self._data_pos + start:self._data_pos + end])
+
+    def get(self, mod_id, default=None):
+        try:
+            return self[mod_id]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return (str(self._id_at(index)) for index in range(self._count))
+
+    def __iter__(self):
+        return self.keys()
@@ -0,0 +1,154 @@
+import math
+import re
+from bisect import bisect_right
+from datetime import datetime
+
+# ================= 配置区域 =================
+# 游戏版本发布日期: 汉化包最后更新时间晚于某个版本的发布日期，即视为支持该版本
+GAME_VERSION_TIERS = {
+    "1.6": "2025-07-12",
+    "1.5": "2024-04-12",
+    "1.4": "2022-10-21",
+    "1.3": "2021-07-21",
+}
+
+# 排序权重: 订阅数取对数后乘以该系数，与"更新时间(天)"相加
+WEIGHT_LOG_SUBS = 90.0
+
+# 每个原版Mod为每种语言偏好预先排好的候选汉化数量
+TOP_CANDIDATES = 3
+
+# 语言偏好 -> 可接受的简繁类型
+LANGUAGE_TARGETS = {
+    'simplified': {'simplified', 'both'},
+    'traditional': {'traditional', 'both'},
+}
+
+# 标题关键词 -> 含义
+# cn:   标题包含汉化意图 (判断是否为汉化包)
+# trad: 繁体中文
+# simp: 简体中文
+KEYWORD_FLAGS = {
+    '汉': {'cn'},
+    '漢': {'cn'},
+    '中': {'cn'},
+    'chinese': {'cn'},
+    'cn': {'cn', 'simp'},
+    'zh': {'cn'},
+    'tw': {'cn', 'trad'},
+    'hk': {'cn', 'trad'},
+    'ch': {'cn'},
+    'tc': {'cn', 'trad'},
+    '简': {'cn', 'simp'},
+    '繁': {'cn', 'trad'},
+    'simplified': {'cn', 'simp'},
+    'traditional': {'cn', 'trad'},
+    'cht': {'trad'},
+    '簡': {'simp'},
+    'chs': {'simp'},
+    'sc': {'simp'},
+}
+# ===========================================
+
+# 所有关键词合并为一个正则，一次扫描标题即可得到全部标记 (英文缩写需要单词边界，避免误中普通单词)
+KEYWORD_PATTERN = re.compile(
+    '|'.join(
+        rf'\b{re.escape(word)}\b' if word.isascii() and len(word) <= 3 else re.escape(word)
+        for word in sorted(KEYWORD_FLAGS, key=len, reverse=True)
+    ),
+    re.IGNORECASE
+)
+
+
+def scan_title(title):
+    """扫描标题，返回命中的标记集合 (cn / trad / simp)"""
+    flags = set()
+    if not title:
+        return flags
+    for match in KEYWORD_PATTERN.finditer(title):
+        flags |= KEYWORD_FLAGS[match.group(0).lower()]
+    return flags
+
+
+def language_type(flags):
+    """根据标记判断简繁类型: simplified / traditional / both (无法判断时视为 both)"""
+    is_traditional = 'trad' in flags
+    is_simplified = 'simp' in flags
+    if is_traditional and not is_simplified:
+        return 'traditional'
+    if is_simplified and not is_traditional:
+        return 'simplified'
+    return 'both'
+
+
+def detect_language_type(title):
+    """判断标题的简繁类型"""
+    return language_type(scan_title(title))
+
+
+def parse_version_tiers():
+    """把版本发布日期转为按时间升序的 (时间戳列表, [(版本名, 等级)])"""
+    parsed = []
+    sorted_items = sorted(GAME_VERSION_TIERS.items(), key=lambda x: x[1])
+    for idx, (ver_name, date_str) in enumerate(sorted_items):
+        try:
+            dt = datetime.strptime(date_str, "%Y-%m-%d")
+            parsed.append((dt.timestamp(), ver_name, idx + 1))
+        except ValueError:
+            pass
+    return [ts for ts, _, _ in parsed], [(ver_name, tier) for _, ver_name, tier in parsed]
+
+
+TIER_TIMESTAMPS, TIER_INFO = parse_version_tiers()
+
+
+def get_tier_info(updated_timestamp):
+    """返回 (版本等级, 版本名)；早于所有版本时为 (0, "Old")"""
+    idx = bisect_right(TIER_TIMESTAMPS, updated_timestamp)
+    if idx == 0:
+        return 0, "Old"
+    return TIER_INFO[idx - 1][1], TIER_INFO[idx - 1][0]
+
+
+def classify_translation(title, tags, updated):
+    """
+    一次性判断汉化包并计算其属性
+    条件: Tag 包含 'Translation' 且 标题包含中文关键词
+    是汉化包时返回 {'lang_type': 简繁类型, 'tier': 版本等级}，否则返回 None
+    """
+    if not tags or not isinstance(tags, list):
+        return None
+    if not any(t.lower() == 'translation' for t in tags if t):
+        return None
+
+    flags = scan_title(title)
+    if 'cn' not in flags:
+        return None
+
+    tier_level, _ = get_tier_info(updated)
+    return {'lang_type': language_type(flags), 'tier': tier_level}
+
+
+def calculate_sort_score(candidate):
+    """汉化包排序分: 先比较支持的游戏版本，再比较更新时间和订阅数"""
+    subs = candidate.get('subs', 0)
+    updated = candidate.get('updated', 0)
+    tier_level = candidate.get('tier')
+    if tier_level is None:
+        tier_level, _ = get_tier_info(updated)
+    return (tier_level, (updated / 86400.0) + (math.log10(max(1, subs)) * WEIGHT_LOG_SUBS))
+
+
+def rank_translations(translations, top=TOP_CANDIDATES):
+    """
+    为每种语言偏好挑出排名靠前的汉化包，返回 {语言偏好: [{'id', 'title'}, ...]} (按推荐顺序)
+    繁体偏好找不到繁体或通用汉化时，退而使用简体汉化
+    """
+    ranked_all = sorted(translations, key=calculate_sort_score, reverse=True)
+    best = {}
+    for preference, targets in LANGUAGE_TARGETS.items():
+        ranked = [t for t in ranked_all if t.get('lang_type') in targets]
+        if preference == 'traditional' and not ranked:
+            ranked = [t for t in ranked_all if t.get('lang_type') == 'simplified']
+        best[preference] = [{'id': t['id'], 'title': t.get('title', '')} for t in ranked[:top]]
+    return best
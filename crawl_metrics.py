@@ -0,0 +1,167 @@
+import json
+import math
+import os
+import threading
+import time
+
+# 请求耗时直方图的桶上限 (秒)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+
+
+class CrawlMetrics:
+    """
+    爬取过程的统计指标 (线程安全)
+    requests:  请求数、按状态码计数、耗时直方图、接收字节数
+    retries:   按原因 (状态码或异常类型) 统计的重试次数
+    sleep:     按原因 (retry / rate_limit / page_delay) 统计的等待时间
+    clean:     清洗耗时和条目数
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.status_counts = {}
+        self.error_counts = {}
+        self.retry_counts = {}
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+        self.bytes_received = 0
+        self.sleep_seconds = {}
+        self.clean_seconds = 0.0
+        self.items = 0
+
+    def observe_request(self, latency, status=None, nbytes=0, error=None):
+        """记录一次请求: status 为响应状态码；没有响应 (连接失败等) 时传入 error (异常类型名)"""
+        with self.lock:
+            self.requests += 1
+            self.latency_sum += latency
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    self.latency_buckets[i] += 1
+                    break
+            self.bytes_received += nbytes
+            if status is not None:
+                key = str(status)
+                self.status_counts[key] = self.status_counts.get(key, 0) + 1
+            if error is not None:
+                self.error_counts[error] = self.error_counts.get(error, 0) + 1
+
+    def record_retry(self, reason):
+        with self.lock:
+            self.retry_counts[str(reason)] = self.retry_counts.get(str(reason), 0) + 1
+
+    def add_sleep(self, reason, seconds):
+        if seconds <= 0:
+            return
+        with self.lock:
+            self.sleep_seconds[reason] = self.sleep_seconds.get(reason, 0.0) + seconds
+
+    def add_clean(self, seconds, items):
+        with self.lock:
+            self.clean_seconds += seconds
+            self.items += items
+
+    def snapshot(self):
+        """当前指标的快照 (可直接序列化为 JSON)"""
+        with self.lock:
+            elapsed = max(time.time() - self.started, 1e-9)
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets):
+                cumulative += count
+                buckets['+Inf' if bound == math.inf else str(bound)] = cumulative
+            return {
+                'timestamp': int(time.time()),
+                'elapsed_seconds': round(elapsed, 3),
+                'requests': self.requests,
+                'status_counts': dict(self.status_counts),
+                'error_counts': dict(self.error_counts),
+                'retry_counts': dict(self.retry_counts),
+                'latency_seconds_sum': round(self.latency_sum, 6),
+                'latency_buckets': buckets,
+                'bytes_received': self.bytes_received,
+                'sleep_seconds': {reason: round(seconds, 3) for reason, seconds in self.sleep_seconds.items()},
+                'clean_seconds': round(self.clean_seconds, 6),
+                'items': self.items,
+                'items_per_second': round(self.items / elapsed, 3),
+            }
+
+
+def format_prometheus(snapshot, prefix='workshop_crawl'):
+    """把快照转为 Prometheus 文本格式"""
+    lines = []
+
+    def metric(name, metric_type, samples):
+        lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+            lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if label_text else f"{prefix}_{name} {value}")
+
+    metric('requests_total', 'counter', [({}, snapshot['requests'])])
+    metric('responses_total', 'counter', [({'status': status}, count) for status, count in snapshot['status_counts'].items()])
+    metric('request_errors_total', 'counter', [({'error': error}, count) for error, count in snapshot['error_counts'].items()])
+    metric('retries_total', 'counter', [({'reason': reason}, count) for reason, count in snapshot['retry_counts'].items()])
+    lines.append(f"# TYPE {prefix}_request_latency_seconds histogram")
+    for bound, count in snapshot['latency_buckets'].items():
+        lines.append(f'{prefix}_request_latency_seconds_bucket{{le="{bound}"}} {count}')
+    lines.append(f"{prefix}_request_latency_seconds_sum {snapshot['latency_seconds_sum']}")
+    lines.append(f"{prefix}_request_latency_seconds_count {snapshot['requests']}")
+    metric('bytes_received_total', 'counter', [({}, snapshot['bytes_received'])])
+    metric('sleep_seconds_total', 'counter', [({'reason': reason}, seconds) for reason, seconds in snapshot['sleep_seconds'].items()])
+    metric('clean_seconds_total', 'counter', [({}, snapshot['clean_seconds'])])
+    metric('items_total', 'counter', [({}, snapshot['items'])])
+    metric('items_per_second', 'gauge', [({}, snapshot['items_per_second'])])
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsReporter:
+    """
+    定期把指标写入文件，结束时再写一次
+    jsonl:      每次追加一行快照 (便于画出随时间的变化)
+    prometheus: 每次整体替换为最新的文本格式 (可由 node_exporter textfile collector 采集)
+    """
+    def __init__(self, metrics, path, fmt='jsonl', interval=30.0):
+        if fmt not in ('jsonl', 'prometheus'):
+            raise ValueError(f"不支持的指标格式: {fmt}")
+        self.metrics = metrics
+        self.path = path
+        self.fmt = fmt
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def write(self):
+        snapshot = self.metrics.snapshot()
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        if self.fmt == 'jsonl':
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(snapshot, ensure_ascii=False) + '\n')
+        else:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(format_prometheus(snapshot))
+            os.replace(tmp_path, self.path)
+        return snapshot
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"写入指标文件失败: {e}")
+
+    def start(self):
+        if self.interval and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """停止定期写入并写入最终结果"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self.write()
@@ -0,0 +1,227 @@
+import json
+import os
+from array import array
+from collections import deque
+
+
+class DependencyGraph:
+    """
+    Mod 依赖关系图 (来自所有条目的 children 字段: 条目 -> 它依赖的Mod)
+    ID 统一驻留为整数下标，正向/反向边都用压缩邻接数组 (CSR) 保存:
+    第 i 个节点的边为 targets[offsets[i]:offsets[i + 1]]
+    is_translation 标记哪些节点是汉化包 (由 match.py 判定)
+    """
+    def __init__(self, ids, offsets, targets, translation_flags):
+        self.ids = ids
+        self.index = {item_id: i for i, item_id in enumerate(ids)}
+        self.offsets = offsets
+        self.targets = targets
+        self.is_translation = translation_flags
+        self.reverse_offsets, self.reverse_targets = self._reverse()
+
+    @classmethod
+    def build(cls, edges, translation_ids=()):
+        """
+        edges: 可迭代的 (条目ID, [依赖的Mod ID, ...])
+        translation_ids: 汉化包ID集合
+        """
+        ids = []
+        index = {}
+
+        def intern(item_id):
+            item_id = str(item_id)
+            i = index.get(item_id)
+            if i is None:
+                i = index[item_id] = len(ids)
+                ids.append(item_id)
+            return i
+
+        adjacency = {}
+        for item_id, dependencies in edges:
+            source = intern(item_id)
+            adjacency.setdefault(source, []).extend(intern(dep) for dep in dependencies)
+        for item_id in translation_ids:
+            intern(item_id)
+
+        offsets = array('I', [0])
+        targets = array('I')
+        for i in range(len(ids)):
+            targets.extend(adjacency.get(i, ()))
+            offsets.append(len(targets))
+
+        flags = bytearray(len(ids))
+        for item_id in translation_ids:
+            flags[index[str(item_id)]] = 1
+        return cls(ids, offsets, targets, flags)
+
+    def _reverse(self):
+        """由正向边生成反向边 (被依赖的Mod -> 依赖它的条目)"""
+        count = len(self.ids)
+        degree = [0] * (count + 1)
+        for target in self.targets:
+            degree[target + 1] += 1
+        offsets = array('I', [0]) * (count + 1)
+        for i in range(count):
+            offsets[i + 1] = offsets[i] + degree[i + 1]
+        targets = array('I', [0]) * len(self.targets)
+        fill = list(offsets[:count])
+        for source in range(count):
+            for k in range(self.offsets[source], self.offsets[source + 1]):
+                target = self.targets[k]
+                targets[fill[target]] = source
+                fill[target] += 1
+        return offsets, targets
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    def dependencies(self, i):
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def dependents(self, i):
+        return self.reverse_targets[self.reverse_offsets[i]:self.reverse_offsets[i + 1]]
+
+    def dependency_closure(self, mod_ids):
+        """
+        返回这些Mod及其全部 (间接) 依赖的ID集合
+        汉化包不向下展开 (它依赖的原版不因此被视为已加载)
+        """
+        seen = bytearray(len(self.ids))
+        queue = deque()
+        result = set()
+        for mod_id in mod_ids:
+            i = self.index.get(str(mod_id))
+            if i is None:
+                result.add(str(mod_id))
+            elif not seen[i]:
+                seen[i] = 1
+                queue.append(i)
+        while queue:
+            i = queue.popleft()
+            result.add(self.ids[i])
+            if self.is_translation[i]:
+                continue
+            for dep in self.dependencies(i):
+                if not seen[dep]:
+                    seen[dep] = 1
+                    queue.append(dep)
+        return result
+
+    def relevant_translations(self, mod_ids):
+        """
+        一次多源遍历找出与这组已安装Mod相关的全部汉化包
+        从每个已安装的原版出发沿反向边找依赖它的汉化包，汉化包的附加汉化继续沿反向边找到并归到同一个原版
+        (合集汉化包会归到它覆盖的每个原版)；同时沿正向边检查依赖，未安装的原版依赖只报告，不展开
+        返回 (translations, missing):
+            translations: {已安装的Mod ID: [汉化包ID, ...]}
+            missing:      {未安装的依赖Mod ID: [依赖它的已安装Mod ID, ...]}
+        """
+        installed = bytearray(len(self.ids))
+        queue = deque()
+        for mod_id in mod_ids:
+            i = self.index.get(str(mod_id))
+            if i is None or installed[i]:
+                continue
+            installed[i] = 1
+            if not self.is_translation[i]:
+                queue.append((i, i))
+
+        translations = {}
+        missing = {}
+        found = set()
+        while queue:
+            node, origin = queue.popleft()
+            if node == origin:
+                # 已安装原版的依赖若也已安装，本身就是遍历的起点
+                for dep in self.dependencies(node):
+                    if not installed[dep] and not self.is_translation[dep]:
+                        missing.setdefault(self.ids[dep], []).append(self.ids[node])
+            for dependent in self.dependents(node):
+                if self.is_translation[dependent] and (dependent, origin) not in found:
+                    found.add((dependent, origin))
+                    translations.setdefault(self.ids[origin], []).append(self.ids[dependent])
+                    queue.append((dependent, origin))
+        return translations, missing
+
+    def unmet_dependencies(self, item_id, installed_ids):
+        """该条目依赖、但不在 installed_ids 中的原版Mod ID (订阅它时 Steam 会连带订阅这些Mod)"""
+        i = self.index.get(str(item_id))
+        if i is None:
+            return []
+        return [self.ids[dep] for dep in self.dependencies(i)
+                if not self.is_translation[dep] and self.ids[dep] not in installed_ids]
+
+    def find_cycles(self):
+        """返回所有循环依赖 (强连通分量，含自依赖)，每个为一组Mod ID (Tarjan 算法的迭代实现)"""
+        count = len(self.ids)
+        order = [-1] * count
+        low = [0] * count
+        on_stack = bytearray(count)
+        stack = []
+        cycles = []
+        counter = 0
+
+        for root in range(count):
+            if order[root] != -1:
+                continue
+            work = [(root, self.offsets[root])]
+            order[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            while work:
+                node, k = work[-1]
+                if k < self.offsets[node + 1]:
+                    work[-1] = (node, k + 1)
+                    dep = self.targets[k]
+                    if order[dep] == -1:
+                        order[dep] = low[dep] = counter
+                        counter += 1
+                        stack.append(dep)
+                        on_stack[dep] = 1
+                        work.append((dep, self.offsets[dep]))
+                    elif on_stack[dep]:
+                        low[node] = min(low[node], order[dep])
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == order[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = 0
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or node in self.dependencies(node):
+                        cycles.append([self.ids[member] for member in component])
+        return cycles
+
+    def save(self, path):
+        """保存为 JSON (先写临时文件再替换)；反向边在读取时重新生成"""
+        data = {
+            'ids': self.ids,
+            'offsets': self.offsets.tolist(),
+            'targets': self.targets.tolist(),
+            'translations': [i for i, flag in enumerate(self.is_translation) if flag],
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        flags = bytearray(len(data['ids']))
+        for i in data['translations']:
+            flags[i] = 1
+        return cls(data['ids'], array('I', data['offsets']), array('I', data['targets']), flags)
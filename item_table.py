@@ -0,0 +1,319 @@
+from array import array
+from bisect import bisect_left
+
+# 行标记位
+ALIVE = 1          # 条目存在 (删除后保留空行，保存状态时丢弃)
+TRANSLATION = 2    # Tag 包含 'Translation'
+DETAIL = 4         # 保留了标题 (只保留原版详情时，其余条目的标题会被丢弃)
+
+MIN_PENDING = 4096  # 新增的行先记在小字典里，超过该数量 (且超过已排序行数的 1/8) 时并入有序索引
+MAX_ID = (1 << 63) - 1
+
+
+def _id_key(item_id):
+    """Steam 的 ID 都是数字，用整数作键比字符串省内存；异常的ID (非数字、有前导零) 原样保留"""
+    if item_id.isdigit() and (item_id == '0' or item_id[0] != '0'):
+        key = int(item_id)
+        if key <= MAX_ID:
+            return key
+    return item_id
+
+
+class ItemTable:
+    """
+    match.py 中全部Mod基础信息的紧凑存储 (取代每个条目一个 dict 的 ref_map)
+    按列存放在类型化数组中: 更新时间、标签组合编号、标题在 UTF-8 字节池中的位置、依赖在ID池中的位置
+    标签先驻留为编号，再把整组标签驻留为组合编号 (绝大多数Mod的标签组合相同)
+    同一ID再次写入时原地覆盖该行，旧的标题和依赖留在池中，废弃过多时整体压缩
+    按ID查找行号用按ID排序的 array('q') + 二分查找 (每行 12 字节，而 dict 每项约 100 字节)；
+    新增的行先记在 pending 中，积累到一定数量再排序后归并进有序索引；删除的行留在索引中，积累过多时再清理
+    """
+    def __init__(self):
+        self.index_ids = array('q')     # 有序索引: 按ID排序的整数ID
+        self.index_rows = array('I')    # 有序索引: 对应的行号
+        self.pending = {}               # 尚未并入有序索引的 整数ID -> 行号
+        self.dead_indexed = 0           # 有序索引中已删除的行数
+        self.other_rows = {}            # 非数字ID -> 行号
+        self.count = 0
+        self.ids = array('q')           # 行号 -> 整数ID (非数字ID为 0，见 other_ids)
+        self.other_ids = {}             # 行号 -> 非数字ID
+        self.updated = array('q')
+        self.tagset = array('I')
+        self.flags = bytearray()
+        self.title_start = array('Q')
+        self.title_length = array('I')
+        self.title_pool = bytearray()
+        self.dep_start = array('Q')
+        self.dep_count = array('I')
+        self.dep_pool = array('Q')
+        self.tag_names = []
+        self.tag_index = {}
+        self.tagsets = [()]
+        self.tagset_index = {(): 0}
+        self.wasted_titles = 0
+        self.wasted_deps = 0
+
+    # ---------- 行号索引 ----------
+
+    def _find(self, key):
+        """ID 键对应的行号；不存在 (或已删除) 时返回 None"""
+        if not isinstance(key, int):
+            return self.other_rows.get(key)
+        row = self.pending.get(key)
+        if row is not None:
+            return row
+        # 删除后重新写入的ID在索引中会出现多次 (只有一行未删除)
+        index_ids = self.index_ids
+        i = bisect_left(index_ids, key)
+        while i < len(index_ids) and index_ids[i] == key:
+            row = self.index_rows[i]
+            if self.flags[row] & ALIVE:
+                return row
+            i += 1
+        return None
+
+    def _insert(self, key, row):
+        if not isinstance(key, int):
+            self.other_rows[key] = row
+            return
+        self.pending[key] = row
+        if len(self.pending) > max(MIN_PENDING, len(self.index_ids) >> 3):
+            self._merge_pending()
+
+    def _merge_pending(self):
+        """把 pending 排序后归并进有序索引 (按段复制，不为每一行创建 Python 对象)"""
+        old_ids, old_rows = self.index_ids, self.index_rows
+        index_ids, index_rows = array('q'), array('I')
+        start = 0
+        for key in sorted(self.pending):
+            end = bisect_left(old_ids, key, start)
+            index_ids += old_ids[start:end]
+            index_rows += old_rows[start:end]
+            index_ids.append(key)
+            index_rows.append(self.pending[key])
+            start = end
+        index_ids += old_ids[start:]
+        index_rows += old_rows[start:]
+        self.index_ids, self.index_rows = index_ids, index_rows
+        self.pending = {}
+
+    def _drop_dead_rows(self):
+        """从有序索引中清理已删除的行"""
+        flags = self.flags
+        keep = [i for i, row in enumerate(self.index_rows) if flags[row] & ALIVE]
+        self.index_ids = array('q', [self.index_ids[i] for i in keep])
+        self.index_rows = array('I', [self.index_rows[i] for i in keep])
+        self.dead_indexed = 0
+
+    def _live_rows(self):
+        """按写入顺序产出全部未删除的行号"""
+        flags = self.flags
+        return (row for row in range(len(flags)) if flags[row] & ALIVE)
+
+    # ---------- 写入 ----------
+
+    def _intern_tags(self, tags):
+        ids = []
+        for tag in tags or ():
+            tag = str(tag)
+            tag_id = self.tag_index.get(tag)
+            if tag_id is None:
+                tag_id = self.tag_index[tag] = len(self.tag_names)
+                self.tag_names.append(tag)
+            ids.append(tag_id)
+        key = tuple(ids)
+        tagset_id = self.tagset_index.get(key)
+        if tagset_id is None:
+            tagset_id = self.tagset_index[key] = len(self.tagsets)
+            self.tagsets.append(key)
+        return tagset_id
+
+    def add(self, item_id, title, updated, tags, deps=()):
+        """新增或覆盖一个条目；deps 为它依赖的Mod ID (非数字ID的依赖无法存放，忽略)"""
+        item_id = str(item_id)
+        key = _id_key(item_id)
+        row = self._find(key)
+        if row is None:
+            row = len(self.flags)
+            self.ids.append(key if isinstance(key, int) else 0)
+            if not isinstance(key, int):
+                self.other_ids[row] = item_id
+            self.count += 1
+            self.updated.append(0)
+            self.tagset.append(0)
+            self.flags.append(0)
+            self.title_start.append(0)
+            self.title_length.append(0)
+            self.dep_start.append(0)
+            self.dep_count.append(0)
+        else:
+            self.wasted_titles += self.title_length[row]
+            self.wasted_deps += self.dep_count[row]
+
+        encoded = (title or '').encode('utf-8', 'surrogatepass')
+        self.title_start[row] = len(self.title_pool)
+        self.title_length[row] = len(encoded)
+        self.title_pool += encoded
+
+        dep_ids = [key for key in (_id_key(str(dep)) for dep in deps or ()) if isinstance(key, int)]
+        self.dep_start[row] = len(self.dep_pool)
+        self.dep_count[row] = len(dep_ids)
+        self.dep_pool.extend(dep_ids)
+
+        self.updated[row] = int(updated or 0)
+        self.tagset[row] = self._intern_tags(tags)
+        is_translation = any(tag and str(tag).lower() == 'translation' for tag in tags or ())
+        new_row = not self.flags[row]
+        self.flags[row] = ALIVE | DETAIL | (TRANSLATION if is_translation else 0)
+        if new_row:
+            self._insert(key, row)
+
+        if self.wasted_titles > len(self.title_pool) // 2 + (1 << 20):
+            self._compact_titles()
+        if self.wasted_deps > len(self.dep_pool) // 2 + (1 << 16):
+            self._compact_deps()
+
+    def remove(self, item_id):
+        key = _id_key(str(item_id))
+        row = self._find(key)
+        if row is None:
+            return
+        if isinstance(key, int):
+            if self.pending.pop(key, None) is None:
+                self.dead_indexed += 1
+        else:
+            del self.other_rows[key]
+            del self.other_ids[row]
+        self.count -= 1
+        self.flags[row] = 0
+        if self.dead_indexed > max(MIN_PENDING, len(self.index_ids) >> 3):
+            self._drop_dead_rows()
+        self.wasted_titles += self.title_length[row]
+        self.wasted_deps += self.dep_count[row]
+        self.title_length[row] = 0
+        self.dep_count[row] = 0
+
+    def prune_details(self, keep_ids):
+        """只保留 keep_ids (例如关系表中的原版) 的标题，其余条目只保留更新时间、标签和依赖"""
+        keep = {_id_key(str(item_id)) for item_id in keep_ids}
+        for row in self._live_rows():
+            key = self.other_ids.get(row, self.ids[row])
+            if key not in keep and self.flags[row] & DETAIL:
+                self.flags[row] &= ~DETAIL
+                self.wasted_titles += self.title_length[row]
+                self.title_length[row] = 0
+        self._compact_titles()
+
+    def _compact_titles(self):
+        pool = bytearray()
+        for row in self._live_rows():
+            start, length = self.title_start[row], self.title_length[row]
+            self.title_start[row] = len(pool)
+            pool += self.title_pool[start:start + length]
+        self.title_pool = pool
+        self.wasted_titles = 0
+
+    def _compact_deps(self):
+        pool = array('Q')
+        for row in self._live_rows():
+            start, count = self.dep_start[row], self.dep_count[row]
+            self.dep_start[row] = len(pool)
+            pool.extend(self.dep_pool[start:start + count])
+        self.dep_pool = pool
+        self.wasted_deps = 0
+
+    # ---------- 查询 ----------
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, item_id):
+        return self._find(_id_key(str(item_id))) is not None
+
+    def _item_id(self, row):
+        return self.other_ids.get(row) or str(self.ids[row])
+
+    def __iter__(self):
+        for row in self._live_rows():
+            yield self._item_id(row)
+
+    def _title(self, row):
+        start = self.title_start[row]
+        return self.title_pool[start:start + self.title_length[row]].decode('utf-8', 'surrogatepass')
+
+    def _tags(self, row):
+        return [self.tag_names[tag_id] for tag_id in self.tagsets[self.tagset[row]]]
+
+    def updated_of(self, item_id):
+        """条目的更新时间；不存在时返回 None"""
+        row = self._find(_id_key(str(item_id)))
+        return None if row is None else self.updated[row]
+
+    def get(self, item_id):
+        """返回 {'title', 'updated', 'tags'}；条目不存在或详情已被丢弃时返回 None"""
+        row = self._find(_id_key(str(item_id)))
+        if row is None or not self.flags[row] & DETAIL:
+            return None
+        return {'title': self._title(row), 'updated': self.updated[row], 'tags': self._tags(row)}
+
+    def has_detail(self, item_id):
+        row = self._find(_id_key(str(item_id)))
+        return row is not None and bool(self.flags[row] & DETAIL)
+
+    def is_translation(self, item_id):
+        row = self._find(_id_key(str(item_id)))
+        return row is not None and bool(self.flags[row] & TRANSLATION)
+
+    def iter_originals(self):
+        """产出全部非汉化包条目的 (ID, 标题)；详情已被丢弃的标题为 None"""
+        for row in self._live_rows():
+            flags = self.flags[row]
+            if not flags & TRANSLATION:
+                yield self._item_id(row), self._title(row) if flags & DETAIL else None
+
+    def iter_titles(self, include_translations=False):
+        """产出 (ID, 标题)，跳过已丢弃详情的条目；默认也跳过汉化包"""
+        for row in self._live_rows():
+            flags = self.flags[row]
+            if flags & DETAIL and (include_translations or not flags & TRANSLATION):
+                yield self._item_id(row), self._title(row)
+
+    def iter_deps(self):
+        """产出 (ID, [依赖的Mod ID, ...])，只包含有依赖的条目"""
+        for row in self._live_rows():
+            count = self.dep_count[row]
+            if count:
+                start = self.dep_start[row]
+                yield self._item_id(row), [str(dep) for dep in self.dep_pool[start:start + count]]
+
+    # ---------- 保存 / 读取 ----------
+
+    def to_state(self):
+        """转为可 JSON 序列化的列式结构 (丢弃已删除的行)"""
+        rows = list(self._live_rows())
+        used_tagsets = sorted({self.tagset[row] for row in rows})
+        remap = {tagset_id: i for i, tagset_id in enumerate(used_tagsets)}
+        deps = []
+        for row in rows:
+            start = self.dep_start[row]
+            deps.append(self.dep_pool[start:start + self.dep_count[row]].tolist())
+        return {
+            'ids': [self._item_id(row) for row in rows],
+            'updated': [self.updated[row] for row in rows],
+            'tagsets': [[self.tag_names[tag_id] for tag_id in self.tagsets[tagset_id]] for tagset_id in used_tagsets],
+            'tagset': [remap[self.tagset[row]] for row in rows],
+            'titles': [self._title(row) if self.flags[row] & DETAIL else None for row in rows],
+            'deps': deps,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        table = cls()
+        tagsets = state['tagsets']
+        for item_id, updated, tagset_id, title, deps in zip(
+                state['ids'], state['updated'], state['tagset'], state['titles'], state['deps']):
+            table.add(item_id, title, updated, tagsets[tagset_id], deps)
+            if title is None:
+                table.flags[table._find(_id_key(item_id))] &= ~DETAIL
+        table._merge_pending()
+        return table
@@ -1,41 +1,117 @@
 import json
-import re
 import os
 import glob
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from ndjson_io import list_parts, iter_ndjson
+from workshop_store import WorkshopStore
+from classifier import classify_translation, rank_translations
+from binmap import write_binary_map
+from depgraph import DependencyGraph
+from title_index import TitleIndex, pick_match
+from item_table import ItemTable
+from stage_profiler import profiler
+
+# 可选的高速 JSON 库: ijson 流式解析 (大文件不必整个读入内存)，orjson 快速解析
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # ================= 配置区域 =================
 INPUT_FOLDER = './output' 
+INPUT_DB = os.path.join(INPUT_FOLDER, 'workshop.db')   # scrap.py 写入的 SQLite 数据库，存在时优先读取
+DATA_FILE_PATTERN = 'workshop_data*.json'              # 没有数据库时读取的分块文件 (不含中断/进度等临时文件)
 OUTPUT_FILE = 'translation_map.json'
-
-# 关键词正则：匹配标题中包含汉化意图的词
-CN_PATTERN = re.compile(r'(汉|漢|中|Chinese|\bCN\b|\bZH\b|\bTW\b|\bHK\b|\bCH\b|\bTC\b|简|繁|simplified|traditional)', re.IGNORECASE)
+DEPGRAPH_FILE = 'dependency_graph.json'      # 全部条目的依赖关系图 (subscribe.py 用于找出间接依赖的Mod)；设为 None 不生成
+BINARY_OUTPUT_FILE = 'translation_map.bin'   # 紧凑二进制格式 (subscribe.py 按ID直接查询，无需解析整个文件)；设为 None 不生成
+STATE_FILE = 'match_state.json'        # 增量重建用的中间状态 (所有Mod的基础信息 + 依赖关系表)
+STATE_VERSION = 7                      # 输出格式变化时递增，旧状态会被丢弃并全量重建
+LOADER_WORKERS = os.cpu_count() or 1   # 并行解析文件的进程数 (1 = 串行)
+TITLE_MATCH = True                     # 没有填写依赖 (children) 的汉化包按标题匹配原版；设为 False 直接丢弃
+PARENT_DETAIL_ONLY = True              # 只为原版保留标题 (内存和状态文件最小)；增量模式下按标题匹配时从数据源取回其余原版的标题；False = 保留全部标题
 
 # ================= 核心逻辑 =================
 
-def is_translation_mod(title, tags):
+def project_item(item):
+    """只保留 process_chunk_items 用到的字段，减小进程间传输和内存占用 (FULL_DATA 的完整描述等全部丢弃)"""
+    return {
+        'publishedfileid': item.get('publishedfileid'),
+        'title': item.get('title', ''),
+        'time_updated': item.get('time_updated', 0),
+        'tags': item.get('tags', []),
+        'children': [{'publishedfileid': c.get('publishedfileid')} for c in item.get('children', [])],
+        'subscriptions': item.get('subscriptions', 0),
+        'vote_data': {'score': item.get('vote_data', {}).get('score', 0)}
+    }
+
+def iter_file_items(file_path):
+    """逐条读取数据文件中的条目 (JSON 数组或 NDJSON 分卷)"""
+    if file_path.endswith(('.ndjson', '.ndjson.gz', '.ndjson.zst')):
+        yield from iter_ndjson(file_path)
+    elif ijson is not None:
+        # 流式解析，无需把整个文件读入内存
+        with open(file_path, 'rb') as f:
+            yield from ijson.items(f, 'item', use_float=True)
+    else:
+        with open(file_path, 'rb') as f:
+            data = orjson.loads(f.read()) if orjson else json.load(f)
+        if isinstance(data, list):
+            yield from data
+
+def load_file_items(file_path):
+    """读取并投影单个文件的全部条目 (在子进程中运行)"""
+    return [project_item(item) for item in iter_file_items(file_path) if isinstance(item, dict)]
+
+def load_all_files(file_paths, workers=LOADER_WORKERS):
     """
-    判断是否为汉化包
-    条件：Tag包含 'Translation' 且 标题包含中文关键词
+    按文件顺序依次产出 (文件路径, 条目列表)；多个文件时在进程池中并行解析
+    同时提交的文件最多 workers*2 个，取走一个结果再提交下一个，已解析未处理的条目不会堆积在内存中
     """
-    if not tags or not isinstance(tags, list):
-        return False
-    
-    # 1. 检查 Tags
-    tag_set = {t.lower() for t in tags}
-    if 'translation' not in tag_set:
-        return False
-
-    # 2. 检查标题
-    if not title or not CN_PATTERN.search(title):
-        return False
-    
-    return True
+    if workers <= 1 or len(file_paths) <= 1:
+        for file_path in file_paths:
+            try:
+                yield file_path, load_file_items(file_path)
+            except Exception as e:
+                print(f"读取 {file_path} 失败: {e}")
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(file_paths))) as executor:
+        pending_paths = iter(file_paths)
+        in_flight = deque()
+        for file_path in pending_paths:
+            in_flight.append((file_path, executor.submit(load_file_items, file_path)))
+            if len(in_flight) >= workers * 2:
+                break
 
-def process_chunk_items(items, ref_map, relation_map):
+        while in_flight:
+            file_path, future = in_flight.popleft()
+            try:
+                items = future.result()
+            except Exception as e:
+                print(f"读取 {file_path} 失败: {e}")
+                items = None
+            # 先补充一个任务再交出结果，处理本文件时进程池继续解析后面的文件
+            next_path = next(pending_paths, None)
+            if next_path is not None:
+                in_flight.append((next_path, executor.submit(load_file_items, next_path)))
+            if items is not None:
+                yield file_path, items
+            del items
+
+def process_chunk_items(items, ref_map, relation_map, orphans=None):
     """
     处理分块数据
-    ref_map:      存储所有Mod的基础信息 (ID -> {title, updated, tags})
+    ref_map:      存储所有Mod的基础信息 (ItemTable: 标题、更新时间、标签、依赖的Mod ID)
     relation_map: 存储依赖关系 (原版ID -> [汉化包信息列表])
+    orphans:      传入列表时，收集没有依赖对象 (children) 的汉化包，之后按标题匹配原版
     """
     for item in items:
         # 基础数据提取
@@ -46,21 +122,15 @@ def process_chunk_items(items, ref_map, relation_map):
         
         # 1. 【核心修改】记录该 Mod 的信息到查找表 (包含 Tags)
         # 无论它是原版还是汉化，先存下来，以便后续反查原版信息
-        ref_map[item_id] = {
-            'title': title,
-            'updated': updated,
-            'tags': tags  # 新增：保存原mod的tags
-        }
+        # 同时记录全部条目的依赖 (不只是汉化包)，用于生成依赖关系图
+        children = item.get('children', [])
+        ref_map.add(item_id, title, updated, tags, [child.get('publishedfileid') for child in children])
         
-        # 2. 汉化包筛选逻辑
-        if not is_translation_mod(title, tags):
+        # 2. 汉化包筛选逻辑 (同时得到简繁类型和版本等级，subscribe.py 无需再做正则匹配)
+        classified = classify_translation(title, tags, updated)
+        if classified is None:
             continue
 
-        # 3. 依赖检查：必须有依赖对象 (children)
-        children = item.get('children', [])
-        if not children:
-            continue
-        
         # 构建汉化包信息对象
         trans_info = {
             'id': item_id,
@@ -68,62 +138,252 @@ def process_chunk_items(items, ref_map, relation_map):
             'updated': updated,
             'subs': item.get('subscriptions', 0),
             'score': item.get('vote_data', {}).get('score', 0),
-            'tags': tags
+            'tags': tags,
+            'lang_type': classified['lang_type'],
+            'tier': classified['tier']
         }
 
+        # 3. 依赖检查：必须有依赖对象 (children)，没有的留待按标题匹配
+        if not children:
+            if orphans is not None:
+                orphans.append(trans_info)
+            continue
+
         # 4. 注册关系
         for child in children:
             parent_id = str(child.get('publishedfileid'))
             # 使用 setdefault 简化逻辑：如果键不存在则创建空列表，然后 append
             relation_map.setdefault(parent_id, []).append(trans_info)
 
-def main():
-    global_ref_map = {}      # ID -> Info
-    global_relation_map = {} # ParentID -> [Translation Mods]
-    
-    json_files = glob.glob(os.path.join(INPUT_FOLDER, '*.json'))
+def new_title_links():
+    """
+    按标题匹配的中间状态 (保存在增量状态中，按标题建立的关系是由全部原版标题推导出的数据)
+    orphans:      汉化包ID -> {'info': 汉化包信息, 'candidates': [决定匹配结果的候选原版ID], 'parent': 匹配到的原版ID或 None}
+    common_grams: 匹配时索引的常用 n-gram (变化时所有相似度都会变)
+    """
+    return {'orphans': {}, 'common_grams': []}
+
+def link_orphans_by_title(orphans, index, relations, title_links):
+    """
+    为没有填写依赖的汉化包按标题匹配原版，匹配成功的注册到 relations (原版ID -> {汉化包ID: 汉化包信息})
+    每个汉化包只与共有 n-gram 的标题比较；候选原版和匹配结果记入 title_links
+    返回匹配到的原版ID集合
+    """
+    linked = set()
+    for trans_info in orphans:
+        candidates = index.candidates(trans_info['title'])
+        record = {'info': trans_info, 'candidates': [mod_id for mod_id, _ in candidates], 'parent': None}
+        matched = pick_match(candidates)
+        if matched is not None:
+            parent_id, score = matched
+            relations.setdefault(parent_id, {})[trans_info['id']] = dict(
+                trans_info, matched_by='title', match_score=round(score, 3)
+            )
+            record['parent'] = parent_id
+            linked.add(parent_id)
+        title_links['orphans'][trans_info['id']] = record
+    title_links['common_grams'] = sorted(index.common_grams)
+    matched_count = sum(1 for trans_info in orphans if title_links['orphans'][trans_info['id']]['parent'])
+    print(f"按标题匹配: {len(orphans)} 个未填写依赖的汉化包中 {matched_count} 个找到了原版。")
+    return linked
+
+def relink_orphans(title_links, new_orphans, changed_originals, original_titles, relations):
+    """
+    增量重建时更新按标题建立的关系，结果与全量重建相同
+    new_orphans:       本次新增或更新的无依赖汉化包 (已记入 title_links)
+    changed_originals: 本次新增、更新或删除的原版ID (含不再是原版的条目)
+    original_titles:   当前全部原版的 [(ID, 标题)]
+    需要重新匹配的汉化包: 新出现的；候选原版有变化的；与变化后的原版标题足够相似的；
+    索引的常用 n-gram 有变化时全部重新匹配
+    返回关系有变化的原版ID集合
+    """
+    orphans = title_links['orphans']
+    if not new_orphans and not (orphans and changed_originals):
+        return set()
+    index = TitleIndex(original_titles)
+    if sorted(index.common_grams) != title_links['common_grams']:
+        relink = set(orphans)
+    else:
+        relink = {trans_info['id'] for trans_info in new_orphans}
+        relink.update(trans_id for trans_id, record in orphans.items()
+                      if not changed_originals.isdisjoint(record['candidates']))
+        changed_titles = [(mod_id, title) for mod_id, title in original_titles if mod_id in changed_originals]
+        queries = {trans_id: record['info']['title'] for trans_id, record in orphans.items() if trans_id not in relink}
+        relink.update(index.similar_queries(queries, changed_titles))
+
+    affected = set()
+    for trans_id in relink:
+        parent_id = orphans[trans_id]['parent']
+        if parent_id is not None and trans_id in relations.get(parent_id, {}):
+            del relations[parent_id][trans_id]
+            if not relations[parent_id]:
+                del relations[parent_id]
+            affected.add(parent_id)
+    # 按原有顺序重新匹配
+    relinked = [record['info'] for trans_id, record in orphans.items() if trans_id in relink]
+    affected.update(link_orphans_by_title(relinked, index, relations, title_links))
+    return affected
+
+def iter_source_items(workers=LOADER_WORKERS):
+    """逐条产出数据文件中的全部条目 (没有数据库时使用)"""
+    json_files = glob.glob(os.path.join(INPUT_FOLDER, DATA_FILE_PATTERN))
+    # scrap.py 流式输出模式写入的 NDJSON 分卷
+    ndjson_files = [path for _, path in list_parts(INPUT_FOLDER)]
     
-    if not json_files:
+    if not json_files and not ndjson_files:
         print(f"错误：在 '{INPUT_FOLDER}' 中未找到 JSON 文件。")
         return
 
-    print(f"找到 {len(json_files)} 个文件，开始处理...")
+    print(f"找到 {len(json_files) + len(ndjson_files)} 个文件，开始处理...")
 
-    for idx, file_path in enumerate(json_files, 1):
-        print(f"[{idx}/{len(json_files)}] 读取: {os.path.basename(file_path)}")
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    process_chunk_items(data, global_ref_map, global_relation_map)
-        except Exception as e:
-            print(f"读取 {file_path} 失败: {e}")
+    # 并行解析所有文件 (每个文件在子进程中流式读取并只保留需要的字段)，按文件顺序处理
+    all_files = json_files + ndjson_files
+    stream_files = set(ndjson_files)
+    latest_stream_items = {}
+    for idx, (file_path, items) in enumerate(load_all_files(all_files, workers), 1):
+        print(f"[{idx}/{len(all_files)}] 读取: {os.path.basename(file_path)} ({len(items)} 条)")
+        if file_path in stream_files:
+            # 分卷只追加，同一个Mod可能出现多次，按ID去重后只处理最新版本
+            for item in items:
+                item_id = str(item.get('publishedfileid'))
+                existing = latest_stream_items.get(item_id)
+                if existing is None or item['time_updated'] >= existing['time_updated']:
+                    latest_stream_items[item_id] = item
+        else:
+            yield from items
 
-    # ================= 数据合并阶段 =================
-    print("\n正在合并原版Mod信息 (Title, Updated, Tags)...")
-    
-    final_output = {}
+    yield from latest_stream_items.values()
+
+def build_relations(items, ref_map, title_links=None):
+    """
+    处理条目并返回关系表 (原版ID -> {汉化包ID: 汉化包信息})，同一汉化包重复出现时只保留一份
+    title_links: 传入时记录按标题匹配的中间状态 (见 new_title_links)
+    """
+    relation_map = {}
+    orphans = [] if TITLE_MATCH else None
+    process_chunk_items(items, ref_map, relation_map, orphans)
+    relations = {}
+    for parent_id, trans_list in relation_map.items():
+        relations[parent_id] = {trans['id']: trans for trans in trans_list}
+    if orphans:
+        # 需要全部条目都进入 ref_map 后再匹配 (原版可能排在汉化包之后)
+        # 索引只在有待匹配的汉化包时建立 (每个原版标题一次)
+        link_orphans_by_title(orphans, TitleIndex(ref_map.iter_titles()), relations,
+                              title_links if title_links is not None else new_title_links())
+    return relations
+
+def build_parent_entry(parent_id, ref_map, translations):
+    """
+    反查 ref_map 补全原版信息，生成 translation_map 中的一项
+    best: 按语言偏好预先排好序的推荐汉化，subscribe.py 直接取用，无需再筛选和排序
+    """
+    parent_info = ref_map.get(parent_id)
     
-    # 遍历关系表，反查 ref_map 补全原版信息
-    for parent_id, trans_list in global_relation_map.items():
-        parent_info = global_ref_map.get(parent_id)
-        
-        if parent_info:
-            final_output[parent_id] = {
-                "title": parent_info['title'],
-                "updated": parent_info['updated'],
-                "tags": parent_info['tags'],  # 新增：输出原版tags
-                "translations": trans_list
-            }
+    if parent_info:
+        return {
+            "title": parent_info['title'],
+            "updated": parent_info['updated'],
+            "tags": parent_info['tags'],  # 新增：输出原版tags
+            "translations": translations,
+            "best": rank_translations(translations)
+        }
+    # 原版 Mod ID 存在于依赖关系中，但未在数据集中找到 (可能已删除或未爬取)
+    return {
+        "title": "Unknown Original Mod",
+        "updated": 0,
+        "tags": [],
+        "translations": translations,
+        "best": rank_translations(translations)
+    }
+
+def load_json_file(file_path):
+    with open(file_path, 'rb') as f:
+        return orjson.loads(f.read()) if orjson else json.load(f)
+
+def load_match_state():
+    """读取上一次运行保存的状态和输出，返回 (ref_map, relations, title_links, translation_map)；不可用时返回 None"""
+    if not os.path.exists(STATE_FILE) or not os.path.exists(OUTPUT_FILE):
+        return None
+    try:
+        state = load_json_file(STATE_FILE)
+        translation_map = load_json_file(OUTPUT_FILE)
+    except (OSError, ValueError) as e:
+        print(f"读取增量状态失败，将全量重建: {e}")
+        return None
+    if state.get('version') != STATE_VERSION:
+        print("增量状态的版本与当前程序不一致，将全量重建。")
+        return None
+    return ItemTable.from_state(state['ref_map']), state['relations'], state['title_links'], translation_map
+
+def save_match_state(ref_map, relations, title_links):
+    """保存状态 (先写临时文件再替换)"""
+    state = {'version': STATE_VERSION, 'ref_map': ref_map.to_state(), 'relations': relations,
+             'title_links': title_links}
+    tmp_path = STATE_FILE + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        if orjson:
+            f.write(orjson.dumps(state))
         else:
-            # 原版 Mod ID 存在于依赖关系中，但未在数据集中找到 (可能已删除或未爬取)
-            final_output[parent_id] = {
-                "title": "Unknown Original Mod",
-                "updated": 0,
-                "tags": [],
-                "translations": trans_list
-            }
+            f.write(json.dumps(state, ensure_ascii=False).encode('utf-8'))
+    os.replace(tmp_path, STATE_FILE)
+
+def apply_item_changes(changed_items, deleted_ids, ref_map, relations, title_links):
+    """
+    把新增/更新/删除的条目应用到 ref_map 和关系表 (按标题建立的关系之后由 relink_orphans 更新)
+    返回 (需要重新生成的原版ID集合, 新出现的无依赖汉化包列表, 有变化的原版ID集合)
+    """
+    stale_ids = set(deleted_ids)
+    stale_ids.update(str(item.get('publishedfileid')) for item in changed_items)
+    affected = set()
+    changed_originals = {item_id for item_id in stale_ids if item_id in ref_map and not ref_map.is_translation(item_id)}
+    for item_id in stale_ids:
+        title_links['orphans'].pop(item_id, None)
+
+    # 1. 撤销这些条目之前作为汉化包注册的关系
+    trans_parents = {}
+    for parent_id, translations in relations.items():
+        for trans_id in translations:
+            trans_parents.setdefault(trans_id, []).append(parent_id)
+    for trans_id in stale_ids:
+        for parent_id in trans_parents.get(trans_id, []):
+            del relations[parent_id][trans_id]
+            affected.add(parent_id)
+            if not relations[parent_id]:
+                del relations[parent_id]
+
+    for item_id in deleted_ids:
+        ref_map.remove(item_id)
 
+    # 2. 重新处理变化的条目 (没有依赖的汉化包留待按标题匹配)
+    relation_map = {}
+    new_orphans = [] if TITLE_MATCH else None
+    process_chunk_items(changed_items, ref_map, relation_map, new_orphans)
+    for parent_id, trans_list in relation_map.items():
+        relations.setdefault(parent_id, {}).update((trans['id'], trans) for trans in trans_list)
+        affected.add(parent_id)
+    for trans_info in new_orphans or ():
+        title_links['orphans'][trans_info['id']] = {'info': trans_info, 'candidates': [], 'parent': None}
+    changed_originals.update(item_id for item_id in stale_ids
+                             if item_id in ref_map and not ref_map.is_translation(item_id))
+
+    # 3. 原版自身的信息 (标题、标签等) 变化或被删除
+    affected.update(stale_ids & relations.keys())
+    return affected, new_orphans or [], changed_originals
+
+def collect_original_titles(ref_map, fetch_titles):
+    """
+    当前全部原版的 [(ID, 标题)]，顺序与 ref_map 一致
+    只保留原版详情时，其余原版的标题由 fetch_titles(ID列表) 取回 (返回 ID -> 标题)
+    """
+    titles = list(ref_map.iter_originals())
+    missing = [mod_id for mod_id, title in titles if title is None]
+    if missing:
+        fetched = fetch_titles(missing)
+        titles = [(mod_id, fetched.get(mod_id, '') if title is None else title) for mod_id, title in titles]
+    return titles
+
+def write_output(final_output):
+    """写出 translation_map.json 并打印统计信息"""
     # 统计信息
     mod_count = len(final_output)
     translation_count = sum(len(v['translations']) for v in final_output.values())
@@ -141,8 +401,154 @@ def main():
     except Exception as e:
         print(f"写入文件失败: {e}")
 
+    if BINARY_OUTPUT_FILE:
+        print(f"正在写入 {BINARY_OUTPUT_FILE} ...")
+        try:
+            write_binary_map(BINARY_OUTPUT_FILE, final_output)
+            print("完成。")
+        except OSError as e:
+            print(f"写入文件失败: {e}")
+
+def write_dependency_graph(ref_map, relations):
+    """由全部条目的依赖生成依赖关系图，并报告循环依赖"""
+    if not DEPGRAPH_FILE:
+        return
+    translation_ids = set()
+    for translations in relations.values():
+        translation_ids.update(translations)
+    graph = DependencyGraph.build(
+        ref_map.iter_deps(),
+        translation_ids
+    )
+    cycles = graph.find_cycles()
+    if cycles:
+        print(f"发现 {len(cycles)} 组循环依赖 (不影响结果)，例如: {' -> '.join(cycles[0][:5])}")
+    print(f"正在写入 {DEPGRAPH_FILE} ({len(graph)} 个节点，{graph.edge_count} 条依赖) ...")
+    try:
+        graph.save(DEPGRAPH_FILE)
+    except OSError as e:
+        print(f"写入文件失败: {e}")
+
+def write_results(final_output, ref_map, relations, title_links):
+    """写出对照表、依赖关系图和增量状态"""
+    with profiler.stage('write_output'):
+        write_output(final_output)
+    with profiler.stage('dependency_graph'):
+        write_dependency_graph(ref_map, relations)
+    with profiler.stage('save_state'):
+        save_match_state(ref_map, relations, title_links)
+
+def full_rebuild(workers=LOADER_WORKERS):
+    """全量重建: 读取全部条目，重新生成对照表和增量状态"""
+    ref_map = ItemTable()      # ID -> Info
+    title_links = new_title_links()
+    
+    if os.path.exists(INPUT_DB):
+        # 数据库中每个Mod只有一条记录，无需再处理重复的分块文件
+        print(f"从数据库 {INPUT_DB} 读取...")
+        with profiler.stage('build_relations'), WorkshopStore(INPUT_DB) as store:
+            relations = build_relations(store.iter_items(), ref_map, title_links)
+    else:
+        with profiler.stage('build_relations'):
+            relations = build_relations(iter_source_items(workers), ref_map, title_links)
+        if not ref_map:
+            return
+    print(f"共读取 {len(ref_map)} 条。")
+    if PARENT_DETAIL_ONLY:
+        ref_map.prune_details(relations)
+
+    # ================= 数据合并阶段 =================
+    print("\n正在合并原版Mod信息 (Title, Updated, Tags)...")
+    final_output = {}
+    with profiler.stage('merge'):
+        for parent_id, translations in relations.items():
+            final_output[parent_id] = build_parent_entry(parent_id, ref_map, list(translations.values()))
+
+    write_results(final_output, ref_map, relations, title_links)
+
+def incremental_rebuild(state, workers=LOADER_WORKERS):
+    """增量重建: 只处理新增/更新/删除的条目，只重新生成受影响的原版条目"""
+    ref_map, relations, title_links, final_output = state
+
+    if os.path.exists(INPUT_DB):
+        # 数据库模式只需读取 ID 和更新时间，再取出有变化的条目
+        print(f"从数据库 {INPUT_DB} 读取更新时间...")
+        with profiler.stage('scan_changes'), WorkshopStore(INPUT_DB) as store:
+            current_times = store.get_update_times()
+            changed_ids = [item_id for item_id, updated in current_times.items()
+                           if ref_map.updated_of(item_id) != updated]
+            changed_items = list(store.iter_items(changed_ids))
+    else:
+        with profiler.stage('scan_changes'):
+            current_items = {}
+            for item in iter_source_items(workers):
+                current_items[str(item.get('publishedfileid'))] = item
+            current_times = {item_id: item.get('time_updated', 0) for item_id, item in current_items.items()}
+            changed_items = [item for item_id, item in current_items.items()
+                             if ref_map.updated_of(item_id) != current_times[item_id]]
+        if not current_items:
+            return
+
+    deleted_ids = [item_id for item_id in ref_map if item_id not in current_times]
+    print(f"增量更新: {len(changed_items)} 条新增或更新，{len(deleted_ids)} 条已删除。")
+
+    def fetch_titles(item_ids):
+        if os.path.exists(INPUT_DB):
+            with WorkshopStore(INPUT_DB) as store:
+                return store.get_titles(item_ids)
+        return {item_id: current_items[item_id].get('title', '') for item_id in item_ids}
+
+    with profiler.stage('apply_changes'):
+        affected, new_orphans, changed_originals = apply_item_changes(
+            changed_items, deleted_ids, ref_map, relations, title_links)
+    with profiler.stage('title_match'):
+        if new_orphans or (title_links['orphans'] and changed_originals):
+            original_titles = collect_original_titles(ref_map, fetch_titles)
+            affected.update(relink_orphans(title_links, new_orphans, changed_originals, original_titles, relations))
+    if PARENT_DETAIL_ONLY:
+        with profiler.stage('restore_details'):
+            # 新成为原版的条目之前只保留了更新时间等，重新取回它的标题
+            missing = [parent_id for parent_id in affected
+                       if parent_id in relations and parent_id in ref_map and not ref_map.has_detail(parent_id)]
+            if missing:
+                if os.path.exists(INPUT_DB):
+                    with WorkshopStore(INPUT_DB) as store:
+                        restored = list(store.iter_items(missing))
+                else:
+                    restored = [current_items[parent_id] for parent_id in missing]
+                for item in restored:
+                    ref_map.add(item.get('publishedfileid'), item.get('title', ''), item.get('time_updated', 0),
+                                item.get('tags', []), [child.get('publishedfileid') for child in item.get('children', [])])
+            ref_map.prune_details(relations)
+    print(f"重新生成 {len(affected)} 个原版Mod的汉化列表...")
+    with profiler.stage('merge'):
+        for parent_id in affected:
+            if parent_id in relations:
+                final_output[parent_id] = build_parent_entry(parent_id, ref_map, list(relations[parent_id].values()))
+            else:
+                final_output.pop(parent_id, None)
+
+    write_results(final_output, ref_map, relations, title_links)
+
+def main(workers=LOADER_WORKERS, full=False):
+    with profiler.stage('load_state'):
+        state = None if full else load_match_state()
+    if state:
+        incremental_rebuild(state, workers)
+    else:
+        full_rebuild(workers)
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='生成汉化对照表 translation_map.json')
+    parser.add_argument('--workers', type=int, default=LOADER_WORKERS, help='并行解析文件的进程数 (1 = 串行)')
+    parser.add_argument('--full', action='store_true', help='忽略上次的增量状态，全量重建')
+    parser.add_argument('--profile', nargs='?', const='profile_match.txt', metavar='REPORT',
+                        help='按阶段统计耗时和内存并写出报告 (子进程中的文件解析不计入函数耗时，可配合 --workers 1)')
+    args = parser.parse_args()
+    if args.profile:
+        profiler.enable(args.profile)
+
     if not os.path.exists(INPUT_FOLDER):
         print(f"提示：请确保文件夹 '{INPUT_FOLDER}' 存在。")
     else:
-        main()
+        main(args.workers, args.full)
@@ -0,0 +1,157 @@
+import gzip
+import io
+import json
+import os
+import re
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 有 orjson 时用它解析每一行 (比标准库快数倍)
+loads = orjson.loads if orjson else json.loads
+
+# 读取被中断写入的压缩文件时可能出现的错误
+TRUNCATED_ERRORS = (EOFError, OSError) + ((zstandard.ZstdError,) if zstandard else ())
+
+# 压缩方式 -> 文件扩展名
+COMPRESSION_SUFFIXES = {
+    None: '',
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+class NdjsonWriter:
+    """
+    流式 NDJSON 写入器
+    每次 write 追加一页数据并立即落盘；单个分卷的条目数或 (未压缩) 字节数超过上限时自动切换到下一个分卷
+    分卷命名: <prefix>_0001.ndjson[.gz|.zst]，已有同名前缀的分卷时从下一个编号继续 (断点续爬不会覆盖旧分卷)
+    """
+    def __init__(self, folder, prefix, compression=None, max_items=10000, max_bytes=64 * 1024 * 1024):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        if compression == 'zstd' and zstandard is None:
+            raise RuntimeError("使用 zstd 压缩请先安装库: pip install zstandard")
+
+        self.folder = folder
+        self.prefix = prefix
+        self.compression = compression
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.paths = []
+        self.total_items = 0
+
+        self._raw = None
+        self._stream = None
+        self._part_items = 0
+        self._part_bytes = 0
+        self._part_index = max(
+            (part_index for part_index, _ in list_parts(folder, prefix)), default=0
+        )
+
+    def _open_next(self):
+        self.close()
+        os.makedirs(self.folder, exist_ok=True)
+        self._part_index += 1
+        path = os.path.join(
+            self.folder,
+            f"{self.prefix}_{self._part_index:04d}.ndjson{COMPRESSION_SUFFIXES[self.compression]}"
+        )
+        self._raw = open(path, 'ab')
+        if self.compression == 'gzip':
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode='ab')
+        elif self.compression == 'zstd':
+            self._stream = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = self._raw
+        self._part_items = 0
+        self._part_bytes = 0
+        self.paths.append(path)
+
+    def write(self, items):
+        """追加写入一批条目，并刷新到磁盘"""
+        for item in items:
+            if (self._stream is None or self._part_items >= self.max_items
+                    or self._part_bytes >= self.max_bytes):
+                self._open_next()
+            line = json.dumps(item, ensure_ascii=False).encode('utf-8') + b'\n'
+            self._stream.write(line)
+            self._part_items += 1
+            self._part_bytes += len(line)
+            self.total_items += 1
+        self.flush()
+
+    def flush(self):
+        """把缓冲区和压缩器中的数据刷到磁盘 (压缩流按块刷新，崩溃后已刷新部分仍可读取)"""
+        if self._stream is None:
+            return
+        if self.compression == 'zstd':
+            self._stream.flush(zstandard.FLUSH_BLOCK)
+        elif self.compression == 'gzip':
+            self._stream.flush()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+
+    def close(self):
+        if self._stream is None:
+            return
+        self.flush()
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.close()
+        self._stream = None
+        self._raw = None
+
+
+def list_parts(folder, prefix=None):
+    """列出文件夹中的 NDJSON 分卷，返回 [(分卷编号, 路径)]；prefix 为空时列出全部"""
+    pattern = re.compile(r'^(?P<prefix>.+)_(?P<index>\d{4,})\.ndjson(\.gz|\.zst)?$')
+    parts = []
+    if not os.path.exists(folder):
+        return parts
+    for name in sorted(os.listdir(folder)):
+        match = pattern.match(name)
+        if not match:
+            continue
+        if prefix is not None and match.group('prefix') != prefix:
+            continue
+        parts.append((int(match.group('index')), os.path.join(folder, name)))
+    return parts
+
+
+def open_text(path):
+    """按扩展名打开 (可能压缩的) NDJSON 文件"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError("读取 zstd 文件请先安装库: pip install zstandard")
+        raw = open(path, 'rb')
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True), encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def iter_ndjson(path):
+    """逐行读取 NDJSON 文件；程序中断留下的不完整结尾会被跳过"""
+    with open_text(path) as f:
+        try:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield loads(line)
+                except ValueError:
+                    # 只可能出现在被中断写入的最后一行
+                    continue
+        except TRUNCATED_ERRORS as e:
+            # 压缩流缺少结尾 (写入时被强行终止)，已刷新的部分已全部读出
+            print(f"{os.path.basename(path)} 结尾不完整，已读取可用部分: {e}")
+
@@ -0,0 +1,108 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+# 不参与缓存键的请求参数 (API key 不同不影响返回内容，也不应写入磁盘)
+IGNORED_PARAMS = ('key',)
+
+
+class CacheMissError(Exception):
+    """仅回放模式下请求的响应不在缓存中"""
+
+
+class ResponseCache:
+    """
+    HTTP 响应的磁盘缓存 (gzip 压缩的原始响应体)
+    缓存键由 URL 和规范化后的请求参数 (去掉 API key，按参数名排序) 计算，
+    文件为 <folder>/<键的前两位>/<键>.json.gz，写入时间即文件修改时间
+    ttl:         超过该秒数的缓存视为过期，重新请求 (None = 永不过期)
+    replay_only: 只从缓存读取，不发起网络请求；缓存中没有时抛出 CacheMissError (不检查过期)
+    """
+    def __init__(self, folder, ttl=None, replay_only=False):
+        self.folder = folder
+        self.ttl = ttl
+        self.replay_only = replay_only
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.oldest_hit = None   # 本次使用过的缓存中最早的写入时间
+
+    @staticmethod
+    def make_key(url, params):
+        normalized = sorted((str(name), str(value)) for name, value in (params or {}).items()
+                            if name not in IGNORED_PARAMS)
+        raw = json.dumps([url, normalized], ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.folder, key[:2], f"{key}.json.gz")
+
+    def _is_fresh(self, path):
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return False
+        return self.replay_only or self.ttl is None or time.time() - mtime <= self.ttl
+
+    def contains(self, url, params):
+        """是否有可用 (未过期) 的缓存，用于决定是否需要等待限速"""
+        return self._is_fresh(self._path(self.make_key(url, params)))
+
+    def get(self, url, params):
+        """返回缓存的 JSON 响应；没有可用缓存时返回 None (仅回放模式下抛出 CacheMissError)"""
+        path = self._path(self.make_key(url, params))
+        data = None
+        mtime = None
+        if self._is_fresh(path):
+            try:
+                mtime = os.path.getmtime(path)
+                with gzip.open(path, 'rb') as f:
+                    data = json.loads(f.read())
+            except (OSError, EOFError, ValueError):
+                # 写入中途崩溃留下的残缺文件，当作没有缓存
+                data = None
+        with self.lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                if self.oldest_hit is None or mtime < self.oldest_hit:
+                    self.oldest_hit = mtime
+        if data is None and self.replay_only:
+            raise CacheMissError(f"缓存中没有该请求的响应: {url}")
+        return data
+
+    def put(self, url, params, body):
+        """保存原始响应体 (bytes)，先写临时文件再替换"""
+        if self.replay_only:
+            return
+        path = self._path(self.make_key(url, params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(gzip.compress(body, compresslevel=6))
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.writes += 1
+
+    def prune(self):
+        """删除过期的缓存文件，返回删除数量"""
+        if self.ttl is None or self.replay_only or not os.path.isdir(self.folder):
+            return 0
+        removed = 0
+        deadline = time.time() - self.ttl
+        for sub in os.scandir(self.folder):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                try:
+                    if entry.stat().st_mtime < deadline:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
@@ -1,54 +1,47 @@
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import json
+import random
+from email.utils import parsedate_to_datetime
 import urllib3
 import signal
 import sys
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 import os
 
+from ndjson_io import NdjsonWriter, list_parts
+from workshop_store import WorkshopStore
+from crawl_metrics import CrawlMetrics, MetricsReporter
+from response_cache import ResponseCache, CacheMissError
+from stage_profiler import profiler
+
 # 忽略 SSL 验证警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # 全局变量用于存储临时数据
 temp_data = []
+# 可重入: 串行爬取时信号处理器可能恰好在主线程持有该锁时运行
+temp_lock = threading.RLock()
+# 中断标志: 并发爬取时通知各分片线程停止
+stop_event = threading.Event()
+# 流式输出模式下的写入器 (中断时需要关闭以刷新压缩流)
+stream_writer = None
+# 流式写入与关闭写入器互斥 (分片线程在写入时不能关闭)
+stream_lock = threading.Lock()
+# 没有完整爬完的游标链 (分片失败、达到页数上限或被中断)；存在时不能据此判断哪些条目已被删除
+incomplete_chains = []
+# 请求耗时、重试、等待时间等统计指标 (见 crawl_metrics.py)
+metrics = CrawlMetrics()
+metrics_reporter = None
+# 响应缓存 (见 response_cache.py)；为空时不使用缓存
+response_cache = None
 
 # ================= 配置区域 =================
-# 从文件读取 API key
-try:
-    with open('steam_web_api_key.txt', 'r', encoding='utf-8') as f:
-        API_KEY = f.read().strip()
-    if not API_KEY:
-        print("错误: steam_web_api_key.txt 文件为空")
-        print("请前往 https://steamcommunity.com/dev/apikey 获取 API key 并添加到该文件中")
-        input("回车退出...")
-        sys.exit(1)
-except FileNotFoundError:
-    print("未找到 steam_web_api_key.txt 文件")
-    print("正在创建 steam_web_api_key.txt 文件...")
-    
-    print("\n请按照以下步骤获取 Steam Web API Key:")
-    print("1. 打开浏览器，访问 https://steamcommunity.com/dev/apikey")
-    print("2. 登录您的 Steam 账号")
-    print("3. 在域名字段中输入任意名称（例如 'localhost'）")
-    print("4. 勾选同意条款，然后点击注册按钮")
-    print("5. 复制生成的 API Key")
-    print("6. 在此处粘贴您的 API Key 并按回车键")
-    
-    # 让用户在命令行中输入 API Key
-    api_key_input = input("\n请粘贴您的 Steam Web API Key: ").strip()
-    
-    if not api_key_input:
-        print("错误: API Key 不能为空")
-        input("回车退出...")
-        sys.exit(1)
-    
-    # 将 API Key 写入文件
-    with open('steam_web_api_key.txt', 'w', encoding='utf-8') as f:
-        f.write(api_key_input)
-    
-    print("\nAPI Key 已成功保存到 steam_web_api_key.txt 文件中")
-    API_KEY = api_key_input
+API_KEY_FILE = 'steam_web_api_key.txt'    # Steam Web API Key 保存位置 (首次运行时会提示输入)
 APP_ID = 294100                      # 替换这里 (例如 Wallpaper Engine)
 
 # 筛选条件
@@ -83,38 +76,238 @@ k_PublishedFileQueryType_RankedByLastUpdatedDate	按最后更新日期排序	21
 
 QUERY_TYPE = 1
 
+QUERY_FILES_URL = "https://api.steampowered.com/IPublishedFileService/QueryFiles/v1/"  # QueryFiles 接口地址 (benchmark.py 会换成本地模拟服务)
+GET_DETAILS_URL = "https://api.steampowered.com/IPublishedFileService/GetDetails/v1/"    # 按ID批量查询 (--refresh 定向刷新)
+DETAILS_BATCH_SIZE = 100              # 定向刷新时每个请求查询的ID数量
 MAX_PAGES = 999                       # 爬取页数 (每页100条)
 OUTPUT_FOLDER = "output"               # 输出文件夹名称
 OUTPUT_FILE = "workshop_data.json"
 CHUNK_SIZE = 1000                     # 每1000条保存一个文件
 MAX_RETRIES = 12                       # 最大重试次数
-RETRY_DELAY = 5                       # 重试延迟秒数
+RETRY_DELAY = 1                       # 重试基础延迟秒数 (指数退避: 1, 2, 4, 8 ... 秒，带随机抖动)
+RETRY_MAX_DELAY = 60                  # 单次重试最长等待秒数
+HTTP_POOL_SIZE = 16                   # HTTP 连接池大小 (复用 keep-alive 连接)
+CHECKPOINT_FOLDER = "checkpoint"      # 断点文件夹 (位于输出文件夹中)，用于 --resume 断点续爬
+DB_FILE = "workshop.db"               # SQLite 数据库 (位于输出文件夹中)，每页写入，match.py 优先从这里读取
+USE_DB = True                         # 是否写入 SQLite 数据库
+
+# --- 输出格式配置 ---
+OUTPUT_FORMAT = "json"                # json = 爬取结束后分块写入 JSON；ndjson = 每页流式追加写入 NDJSON 分卷 (内存占用恒定)
+NDJSON_PREFIX = "workshop_data"       # NDJSON 分卷文件名前缀
+NDJSON_COMPRESSION = None             # NDJSON 压缩方式: None / "gzip" / "zstd" (需 pip install zstandard)
+NDJSON_ROTATE_ITEMS = 10000           # 每个 NDJSON 分卷最多条目数
+NDJSON_ROTATE_BYTES = 64 * 1024 * 1024  # 每个 NDJSON 分卷最多字节数 (未压缩)
 FULL_DATA = True
+
+# --- 字段投影配置 ---
+# 下游需要的字段 -> 需要开启的 return_* 请求参数 (publishedfileid 总会返回)
+FIELD_FLAGS = {
+    'publishedfileid': None,
+    'title': 'return_details',
+    'time_created': 'return_details',
+    'time_updated': 'return_details',
+    'views': 'return_details',
+    'subscriptions': 'return_details',
+    'favorited': 'return_details',
+    'file_size': 'return_details',
+    'creator': 'return_details',
+    'file_description': 'return_details',
+    'tags': 'return_tags',
+    'children': 'return_children',
+    'vote_data': 'return_vote_data',
+    'kvtags': 'return_kv_tags',
+    'previews': 'return_previews',
+    'metadata': 'return_metadata',
+}
+# 字段投影方案: 只请求并保存这些字段 (FULL_DATA = False 时使用 lean 方案)
+FIELD_PROFILES = {
+    # 原有的裁剪模式字段
+    'lean': ['publishedfileid', 'title', 'time_created', 'time_updated', 'views',
+             'subscriptions', 'favorited', 'tags', 'children'],
+    # match.py 实际读取的字段
+    'match': ['publishedfileid', 'title', 'time_updated', 'tags', 'children', 'subscriptions', 'vote_data'],
+}
+# QueryFiles 的 return_* 参数 -> GetDetails 中对应的参数 (return_details 对应的基础字段 GetDetails 总会返回)
+DETAILS_FLAGS = {
+    'return_tags': 'includetags',
+    'return_children': 'includechildren',
+    'return_vote_data': 'includevotes',
+    'return_kv_tags': 'includekvtags',
+    'return_previews': 'includeadditionalpreviews',
+    'return_metadata': 'includemetadata',
+    'return_short_description': 'short_description',
+}
+# 统计字段为0时API会省略，投影时补默认值 (存工厂函数，每个条目生成新的默认值，避免共享同一个列表)
+FIELD_DEFAULTS = {'views': int, 'subscriptions': int, 'favorited': int, 'children': list}
+
+# --- 增量爬取配置 ---
+STATE_FILE = "crawl_state.json"        # 爬取状态文件 (保存在输出文件夹中)
+INCREMENTAL_QUERY_TYPE = 21           # 增量模式按最后更新日期排序 (RankedByLastUpdatedDate)
+
+# --- 统计指标配置 ---
+METRICS_FILE = "crawl_metrics"        # 指标文件名 (位于输出文件夹中，按格式加 .jsonl / .prom 扩展名)
+METRICS_FORMAT = "jsonl"              # jsonl = 每次追加一行快照；prometheus = 文本格式 (每次整体替换)；None = 不输出
+METRICS_INTERVAL = 30                 # 爬取过程中每隔多少秒写一次指标 (结束时总会再写一次)
+
+# --- 响应缓存配置 ---
+RESPONSE_CACHE = False                # 是否缓存请求的响应 (重新运行时直接使用未过期的缓存，不再请求 Steam)
+RESPONSE_CACHE_FOLDER = "http_cache"  # 缓存文件夹 (位于输出文件夹中)
+RESPONSE_CACHE_TTL = 6 * 3600         # 缓存有效期 (秒)，过期的页面会重新请求
+
+# --- 并发分片爬取配置 ---
+SHARD_WORKERS = 1                     # 并发线程数 (1 = 串行爬取；>1 时拆分为互不重叠的分片并发爬取)
+SHARD_DATE_START = "2016-07-01"       # 没有包含标签时按创建日期切分分片，从该日期切到本次爬取开始 (更早的条目归入第一个分片)
+SHARD_DATE_WINDOWS_PER_WORKER = 2     # 按创建日期切分时，每个线程对应的分片数 (分片越多，各线程越均衡)
+REQUESTS_PER_SECOND = 4.0             # 所有分片共享的全局请求速率上限 (次/秒)
+
+# --- 多任务爬取配置 (--jobs) ---
+JOBS_FOLDER = "jobs"                  # 每个任务的输出保存在 输出文件夹/jobs/<任务名>/ 下
+JOB_WORKERS = 4                       # 同时运行的任务数 (未通过 --workers 指定时)
 # ===========================================
 
-def retry_on_failure(max_retries=3, delay=5):
-    """重试装饰器"""
+def load_api_key():
+    """从文件读取 API key；文件不存在时引导用户输入并保存"""
+    try:
+        with open(API_KEY_FILE, 'r', encoding='utf-8') as f:
+            api_key = f.read().strip()
+        if not api_key:
+            print(f"错误: {API_KEY_FILE} 文件为空")
+            print("请前往 https://steamcommunity.com/dev/apikey 获取 API key 并添加到该文件中")
+            input("回车退出...")
+            sys.exit(1)
+        return api_key
+    except FileNotFoundError:
+        print(f"未找到 {API_KEY_FILE} 文件")
+        print(f"正在创建 {API_KEY_FILE} 文件...")
+        
+        print("\n请按照以下步骤获取 Steam Web API Key:")
+        print("1. 打开浏览器，访问 https://steamcommunity.com/dev/apikey")
+        print("2. 登录您的 Steam 账号")
+        print("3. 在域名字段中输入任意名称（例如 'localhost'）")
+        print("4. 勾选同意条款，然后点击注册按钮")
+        print("5. 复制生成的 API Key")
+        print("6. 在此处粘贴您的 API Key 并按回车键")
+        
+        # 让用户在命令行中输入 API Key
+        api_key_input = input("\n请粘贴您的 Steam Web API Key: ").strip()
+        
+        if not api_key_input:
+            print("错误: API Key 不能为空")
+            input("回车退出...")
+            sys.exit(1)
+        
+        # 将 API Key 写入文件
+        with open(API_KEY_FILE, 'w', encoding='utf-8') as f:
+            f.write(api_key_input)
+        
+        print(f"\nAPI Key 已成功保存到 {API_KEY_FILE} 文件中")
+        return api_key_input
+
+class FatalRequestError(Exception):
+    """不应重试的请求错误 (例如 403: API key 无效)"""
+
+def get_retry_after(exception):
+    """从 429/503 响应的 Retry-After 头中解析需要等待的秒数，没有则返回 None"""
+    response = getattr(exception, 'response', None)
+    if response is None or response.status_code not in (429, 503):
+        return None
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def retry_on_failure(max_retries=3, delay=5, max_delay=60):
+    """
+    重试装饰器 (指数退避 + 随机抖动，遵循 Retry-After，FatalRequestError 直接抛出)
+    等待时间取 Retry-After 与退避时间中较长的一个；调用时可传入 rate_limiter，每次重试前先领取令牌
+    """
     def decorator(func):
         @wraps(func)
-        def wrapper(*args, **kwargs):
+        def wrapper(*args, rate_limiter=None, **kwargs):
             last_exception = None
             for attempt in range(max_retries):
                 try:
                     return func(*args, **kwargs)
+                except FatalRequestError:
+                    raise
                 except Exception as e:
                     last_exception = e
                     if attempt < max_retries - 1:
+                        backoff = min(max_delay, delay * (2 ** attempt))
+                        wait_time = backoff / 2 + random.uniform(0, backoff / 2)
+                        # Retry-After 是服务器要求的最短等待，退避时间更长时仍按退避等待
+                        wait_time = max(get_retry_after(e) or 0.0, wait_time)
                         print(f"第 {attempt + 1} 次尝试失败: {str(e)}")
-                        print(f"{delay} 秒后进行第 {attempt + 2} 次重试...")
-                        time.sleep(delay)
+                        print(f"{wait_time:.1f} 秒后进行第 {attempt + 2} 次重试...")
+                        response = getattr(e, 'response', None)
+                        metrics.record_retry(response.status_code if response is not None else type(e).__name__)
+                        metrics.add_sleep('retry', wait_time)
+                        time.sleep(wait_time)
+                        if rate_limiter is not None:
+                            # 重试也是一次请求，同样占用全局速率
+                            rate_limiter.wait()
                     else:
                         print(f"所有 {max_retries} 次重试都失败了")
             raise last_exception
         return wrapper
     return decorator
 
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """获取共享的 HTTP 会话 (连接池 + keep-alive，避免每页重新握手)"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.verify = False
+            _session = session
+        return _session
+
+class RateLimiter:
+    """全局限速器: 多个线程共享，保证总请求速率不超过 rate 次/秒"""
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self):
+        # 在锁内预约下一个请求时间槽，锁外睡眠，避免线程互相阻塞
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_time > 0:
+            metrics.add_sleep('rate_limit', wait_time)
+            time.sleep(wait_time)
+
 def signal_handler(sig, frame):
-    """Ctrl+C 信号处理器"""
+    """
+    Ctrl+C 信号处理器
+    流式输出模式下只设置中断标志: 各游标链写完当前页后停止，由主线程关闭写入器并保留断点
+    (信号处理器在主线程中运行，此时主线程可能正持有写入锁，不能在这里关闭写入器)
+    """
+    if sig is not None and stream_writer is not None:
+        if stop_event.is_set():
+            print('\n再次收到中断信号，立即退出 (已写入的分卷均已落盘，可用 --resume 继续)')
+            sys.exit(1)
+        stop_event.set()
+        print('\n\n检测到中断信号 (Ctrl+C)')
+        print('正在停止: 写完当前页后保存进度，可用 --resume 继续 (再按一次 Ctrl+C 立即退出)')
+        return
+
+    stop_event.set()
     print('\n\n检测到中断信号 (Ctrl+C)')
     print('正在保存已获取的数据...')
     
@@ -122,7 +315,15 @@ def signal_handler(sig, frame):
     if not os.path.exists(OUTPUT_FOLDER):
         os.makedirs(OUTPUT_FOLDER)
     
-    if temp_data:
+    with temp_lock:
+        snapshot = list(temp_data)
+
+    if stream_writer is not None:
+        # 流式模式下每页都已落盘，只需关闭写入器 (出错退出时，等正在写入的线程写完这一页)
+        with stream_lock:
+            stream_writer.close()
+        print(f"数据已流式写入 {len(stream_writer.paths)} 个 NDJSON 分卷，共 {stream_writer.total_items} 条")
+    elif snapshot:
         # 保存临时数据
         timestamp = time.strftime("%Y%m%d_%H%M%S")
         interrupt_file = os.path.join(OUTPUT_FOLDER, f"interrupted_data_{timestamp}.json")
@@ -130,8 +331,8 @@ def signal_handler(sig, frame):
         # 分块保存中断数据
         chunk_index = 0
         total_saved = 0
-        for i in range(0, len(temp_data), CHUNK_SIZE):
-            chunk = temp_data[i:i + CHUNK_SIZE]
+        for i in range(0, len(snapshot), CHUNK_SIZE):
+            chunk = snapshot[i:i + CHUNK_SIZE]
             if chunk_index == 0:
                 chunk_filename = interrupt_file
             else:
@@ -146,157 +347,911 @@ def signal_handler(sig, frame):
         print(f"\n中断时成功保存 {total_saved} 条数据到 {interrupt_file}")
     else:
         print("没有可保存的数据")
+
+    if metrics_reporter is not None:
+        metrics_reporter.stop()
+        print(f"统计指标已写入 {metrics_reporter.path}")
     
     print("程序已安全退出")
     sys.exit(0)
 
-@retry_on_failure(max_retries=MAX_RETRIES, delay=RETRY_DELAY)
-def make_request(url, params, timeout=15):
+def make_request(url, params, timeout=15, rate_limiter=None):
+    """
+    网络请求: 启用响应缓存时优先返回未过期的缓存 (仅回放模式下没有缓存会抛出 CacheMissError)
+    rate_limiter: 失败重试前领取令牌 (首次请求前的等待由调用方负责)
+    """
+    if response_cache is not None:
+        data = response_cache.get(url, params)
+        if data is not None:
+            return data
+    return fetch_json(url, params, timeout, rate_limiter=rate_limiter)
+
+def is_cached(url, params):
+    """该请求能否直接由缓存返回 (此时无需等待限速)"""
+    return response_cache is not None and response_cache.contains(url, params)
+
+@retry_on_failure(max_retries=MAX_RETRIES, delay=RETRY_DELAY, max_delay=RETRY_MAX_DELAY)
+def fetch_json(url, params, timeout=15):
     """带重试的网络请求函数"""
-    response = requests.get(url, params=params, timeout=timeout, verify=False)
+    started = time.perf_counter()
+    try:
+        response = get_session().get(url, params=params, timeout=timeout)
+    except requests.exceptions.RequestException as e:
+        metrics.observe_request(time.perf_counter() - started, error=type(e).__name__)
+        raise
+    metrics.observe_request(time.perf_counter() - started, status=response.status_code, nbytes=len(response.content))
     try:
         response.raise_for_status()  # 如果状态码不是200会抛出异常
     except requests.exceptions.HTTPError as e:
         if response.status_code == 403:
+            # 403 重试也没用，直接失败 (无人值守运行时不能停在 input() 上)
             print("错误: 403 Forbidden")
             print("可能是API key无效？")
-            print("请检查 steam_web_api_key.txt 文件中的 API key 是否正确")
+            print(f"请检查 {API_KEY_FILE} 文件中的 API key 是否正确")
             print("如果需要，请前往 https://steamcommunity.com/dev/apikey 重新获取")
-            input("回车退出...")
+            raise FatalRequestError(f"403 Forbidden: {url}") from e
         raise
-    return response.json()
+    data = response.json()
+    if response_cache is not None:
+        response_cache.put(url, params, response.content)
+    return data
 
-def save_progress_data(data, page_num):
-    """保存进度数据"""
-    if data:
-        # 确保输出文件夹存在
-        if not os.path.exists(OUTPUT_FOLDER):
-            os.makedirs(OUTPUT_FOLDER)
-        
-        progress_file = os.path.join(OUTPUT_FOLDER, f"progress_data_page_{page_num}.json")
-        with open(progress_file, 'w', encoding='utf-8') as f:
-            json.dump(data[-100:], f, ensure_ascii=False, indent=4)  # 只保存最近100条
-        print(f"进度数据已保存到 {progress_file}")
-
-def fetch_clean_workshop_data(api_key, app_id, required_tags=None, excluded_tags=None, query_type=1, max_pages=1, full_data=FULL_DATA):
-    global temp_data
-    base_url = "https://api.steampowered.com/IPublishedFileService/QueryFiles/v1/"
+class CrawlCheckpoint:
+    """
+    单条游标链的断点 (保存在 输出文件夹/checkpoint/ 下；多任务爬取的任务在 checkpoint/jobs/<任务名>/ 下)
+    <名称>.ndjson: 已获取的条目，每页追加写入并 fsync
+    <名称>.json:   已提交的游标、页码、条目数和 ndjson 的有效字节数 (先写临时文件再原子替换)
+    崩溃发生在两者之间时，恢复时按记录的字节数截断 ndjson，丢弃未提交的半页数据
+    流式输出模式下条目已经写入输出分卷，断点只记录游标和条目数
+    """
+    def __init__(self, name, signature, folder=None):
+        folder = folder or os.path.join(OUTPUT_FOLDER, CHECKPOINT_FOLDER)
+        self.meta_path = os.path.join(folder, f"{name}.json")
+        self.items_path = os.path.join(folder, f"{name}.ndjson")
+        self.signature = signature
+        self.offset = 0
+
+    def load(self):
+        """读取断点，返回 (游标, 下一页页码, 已获取条目, 已获取条目数, 是否已完成)；没有可用断点时返回 None"""
+        if not os.path.exists(self.meta_path) or not os.path.exists(self.items_path):
+            return None
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取断点失败: {e}")
+            return None
+        if meta.get('signature') != self.signature:
+            print(f"断点 {self.meta_path} 的查询条件与本次不同，忽略。")
+            return None
+
+        self.offset = meta['offset']
+        with open(self.items_path, 'r+b') as f:
+            f.truncate(self.offset)
+            f.seek(0)
+            items = [json.loads(line) for line in f.read().decode('utf-8').splitlines() if line]
+        return meta['cursor'], meta['page'], items, meta.get('items', len(items)), meta.get('done', False)
+
+    def commit(self, page_items, cursor, page, total_items, done=False):
+        """先把本页条目落盘，再提交游标；只有提交过的游标才会在恢复时使用"""
+        os.makedirs(os.path.dirname(self.meta_path), exist_ok=True)
+        with open(self.items_path, 'ab') as f:
+            f.truncate(self.offset)
+            for item in page_items:
+                f.write(json.dumps(item, ensure_ascii=False).encode('utf-8') + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+            self.offset = f.tell()
+
+        meta = {
+            'signature': self.signature,
+            'cursor': cursor,
+            'page': page,
+            'items': total_items,
+            'offset': self.offset,
+            'done': done,
+            'saved_at': int(time.time())
+        }
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.meta_path)
+
+def load_run_info():
+    """读取上一次未完成爬取的运行信息 (开始时间、是否增量等)"""
+    run_path = os.path.join(OUTPUT_FOLDER, CHECKPOINT_FOLDER, 'run.json')
+    if not os.path.exists(run_path):
+        return None
+    try:
+        with open(run_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_run_info(run_info):
+    """记录本次爬取的运行信息，供 --resume 使用"""
+    folder = os.path.join(OUTPUT_FOLDER, CHECKPOINT_FOLDER)
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, 'run.json'), 'w', encoding='utf-8') as f:
+        json.dump(run_info, f, ensure_ascii=False)
+
+def job_checkpoint_folder(name):
+    """多任务爬取中单个任务的断点文件夹 (与主任务的断点分开，任务名与分片名相同也不会冲突)"""
+    return os.path.join(OUTPUT_FOLDER, CHECKPOINT_FOLDER, JOBS_FOLDER, name)
+
+def clear_checkpoints(folder=None):
+    """
+    删除断点文件 (全新爬取开始时或爬取成功保存后调用)
+    folder 默认为主任务的断点文件夹；只删除其中的文件，各任务的断点子文件夹保留
+    """
+    folder = folder or os.path.join(OUTPUT_FOLDER, CHECKPOINT_FOLDER)
+    if not os.path.exists(folder):
+        return
+    for entry in os.scandir(folder):
+        if entry.is_file():
+            os.remove(entry.path)
+    if not os.listdir(folder):
+        os.rmdir(folder)
+
+def load_crawl_state():
+    """
+    读取爬取状态
+    last_run: 上一次成功爬取的开始时间 (增量模式的时间水位线)
+    items:    每个Mod的 time_updated (ID -> 时间戳)
+    """
+    state_path = os.path.join(OUTPUT_FOLDER, STATE_FILE)
+    if not os.path.exists(state_path):
+        return None
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"读取爬取状态失败: {e}")
+        return None
+    if not isinstance(state, dict) or 'last_run' not in state:
+        return None
+    state.setdefault('items', {})
+    return state
+
+def save_crawl_state(state):
+    """保存爬取状态 (先写临时文件再替换，避免写到一半损坏)"""
+    if not os.path.exists(OUTPUT_FOLDER):
+        os.makedirs(OUTPUT_FOLDER)
+    state_path = os.path.join(OUTPUT_FOLDER, STATE_FILE)
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, state_path)
+
+def get_dataset_files(folder=None):
+    """返回已保存的数据集分块文件 (workshop_data.json, workshop_data_2.json ...)"""
+    folder = folder or OUTPUT_FOLDER
+    base_name = os.path.splitext(OUTPUT_FILE)[0]
+    files = []
+    if not os.path.exists(folder):
+        return files
+    for name in os.listdir(folder):
+        if name == OUTPUT_FILE:
+            files.append(name)
+        elif name.startswith(base_name + '_') and name.endswith('.json') and name[len(base_name) + 1:-5].isdigit():
+            files.append(name)
+    return [os.path.join(folder, name) for name in files]
+
+def get_ndjson_parts():
+    """返回流式输出模式写入的 NDJSON 分卷 (workshop_data_<运行时间>_0001.ndjson ...)"""
+    return [path for _, path in list_parts(OUTPUT_FOLDER)
+            if os.path.basename(path).startswith(NDJSON_PREFIX + '_')]
+
+def load_existing_dataset():
+    """读取已保存的数据集"""
+    items = []
+    for file_path in get_dataset_files():
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            items.extend(data)
+    return items
+
+def save_dataset(data, folder=None):
+    """分块保存数据集，并删除多余的旧分块文件 (folder 默认为输出文件夹)"""
+    folder = folder or OUTPUT_FOLDER
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+    written = set()
+    chunk_index = 0
+    for i in range(0, len(data), CHUNK_SIZE):
+        chunk = data[i:i + CHUNK_SIZE]
+        if chunk_index == 0:
+            chunk_filename = os.path.join(folder, OUTPUT_FILE)
+        else:
+            chunk_filename = os.path.join(folder, f"workshop_data_{chunk_index + 1}.json")
+        with open(chunk_filename, 'w', encoding='utf-8') as f:
+            json.dump(chunk, f, ensure_ascii=False, indent=4)
+        print(f"已保存 {len(chunk)} 条数据到 {chunk_filename}")
+        written.add(os.path.normpath(chunk_filename))
+        chunk_index += 1
+
+    # 数据变少时，旧的分块文件会残留，需要清理掉
+    for file_path in get_dataset_files(folder):
+        if os.path.normpath(file_path) not in written:
+            os.remove(file_path)
+            print(f"已删除过期的分块文件 {file_path}")
+    return chunk_index
+
+def merge_items(existing_items, new_items):
+    """
+    将增量数据合并进已有数据集
+    以 publishedfileid 为键，新数据覆盖旧数据；返回 (合并结果, 新增数, 更新数)
+    """
+    merged = {}
+    for item in existing_items:
+        merged[str(item.get('publishedfileid'))] = item
+
+    added = 0
+    updated = 0
+    for item in new_items:
+        item_id = str(item.get('publishedfileid'))
+        if item_id in merged:
+            updated += 1
+        else:
+            added += 1
+        merged[item_id] = item
+    return list(merged.values()), added, updated
+
+def update_crawl_state(state, updates, run_started=None):
+    """
+    把本次获取到的 time_updated (ID -> 时间戳) 记入状态，并推进时间水位线
+    run_started 为空时保留原来的水位线 (爬取不完整，水位线之后的更新并没有全部看到)
+    """
+    if state is None:
+        state = {'last_run': 0, 'items': {}}
+    state['items'].update(updates)
+    if run_started is not None:
+        state['last_run'] = run_started
+    return state
+
+def finish_crawl_state(crawl_state, incremental, updates, run_started):
+    """
+    爬取结束时保存爬取状态并处理断点
+    完整爬取: 推进水位线并清理断点；有未完成的游标链时保留原水位线和断点，之后可用 --resume 继续
+    """
+    if incomplete_chains:
+        save_crawl_state(update_crawl_state(crawl_state, updates))
+        print(f"游标链 {', '.join(incomplete_chains)} 未爬取完整，保留时间水位线和断点，可用 --resume 继续。")
+        return
+    save_crawl_state(update_crawl_state(crawl_state if incremental else None, updates, crawl_watermark(run_started)))
+    clear_checkpoints()
+
+def build_query_params(api_key, app_id, cursor, query_type, required_tags=None, excluded_tags=None, fields=None,
+                       created_range=None):
+    """
+    构造 QueryFiles 请求参数
+    fields 为空时开启全部 return_* 参数；否则只开启这些字段需要的参数，减小响应体积
+    created_range: (开始, 结束) 时间戳，只查询创建时间在此范围内的条目 (含两端)
+    """
+    params = {
+        'key': api_key,
+        'appid': app_id,
+        'cursor': cursor,
+        'numperpage': 100,
+        'query_type': query_type,
+        'match_all_tags' : 0,
+    }
+
+    if fields is None:
+        # 开启详细数据返回，以便获取统计数据和标签
+        params.update({
+            'return_children': 1,
+            'return_vote_data': 1,
+            'return_tags': 1,
+            'return_details': 1,
+            'return_kv_tags': 1
+        })
+    else:
+        for field in fields:
+            if field not in FIELD_FLAGS:
+                raise ValueError(f"未知字段: {field}")
+            if FIELD_FLAGS[field]:
+                params[FIELD_FLAGS[field]] = 1
+        if 'file_description' not in fields:
+            # 不需要描述时让API只返回简短描述，完整描述往往是响应中最大的部分
+            params['return_short_description'] = 1
+
+    # 处理包含标签 (Required Tags)
+    if required_tags:
+        for i, tag in enumerate(required_tags):
+            params[f'requiredtags[{i}]'] = tag
+
+    # 处理排除标签 (Excluded Tags)
+    if excluded_tags:
+        for i, tag in enumerate(excluded_tags):
+            params[f'excludedtags[{i}]'] = tag
+
+    # 按创建日期筛选 (date_range_created)
+    if created_range:
+        params['date_range_created[timestamp_start]'] = created_range[0]
+        params['date_range_created[timestamp_end]'] = created_range[1]
+
+    return params
+
+def clean_workshop_item(item, fields=None):
+    """
+    清洗单个条目
+    fields 为空时保留全部数据；否则直接投影出指定字段，不复制整个条目
+    标签 API返回的是 [{'tag': 'A'}, {'tag': 'B'}] 格式，统一转为 ['A', 'B']
+    """
+    if fields is None:
+        # 获取全部数据
+        clean_item = item.copy()
+        if 'tags' in clean_item:
+            clean_item['tags'] = [t.get('tag') for t in clean_item['tags'] if 'tag' in t]
+        return clean_item
+
+    clean_item = {}
+    for field in fields:
+        if field == 'tags':
+            clean_item['tags'] = [t.get('tag') for t in item.get('tags', []) if 'tag' in t]
+        else:
+            # 统计数据如果为0，API有时会省略该字段
+            if field in item:
+                clean_item[field] = item[field]
+            else:
+                default = FIELD_DEFAULTS.get(field)
+                clean_item[field] = default() if default else None
+    return clean_item
+
+def resolve_fields(fields, full_data=FULL_DATA):
+    """实际使用的字段投影: 没有指定字段且 full_data 为假时使用 lean 方案 (爬取和定向刷新共用)"""
+    if fields is None and not full_data:
+        return FIELD_PROFILES['lean']
+    return fields
+
+def fetch_clean_workshop_data(api_key, app_id, required_tags=None, excluded_tags=None, query_type=1, max_pages=1, full_data=FULL_DATA, updated_since=None, rate_limiter=None, label=None, resume=False, sink=None, fields=None, on_page=None, checkpoint_folder=None, page_limit_complete=False, created_range=None, keep_temp=True):
+    """
+    爬取并清洗创意工坊数据
+    updated_since: 增量模式的时间水位线，遇到 time_updated 早于该值的条目即停止翻页
+                   (需配合 query_type=21 按最后更新日期排序使用)
+    rate_limiter:  共享限速器；为空时沿用每页固定延时 1 秒
+    label:         分片名称，用于日志前缀和断点文件名
+    resume:        从该游标链上次提交的断点继续爬取
+    sink:          流式输出回调，每页清洗后调用 sink(page_items)；设置后不在内存中累积条目，返回空列表
+    fields:        字段投影 (见 FIELD_PROFILES)，只请求并保存这些字段；为空时按 full_data 决定
+    on_page:       每页清洗后、提交断点前调用 on_page(page_items)，例如写入数据库
+    checkpoint_folder:   断点文件夹 (默认为主任务的断点文件夹)
+    created_range:       (开始, 结束) 时间戳，只爬取创建时间在此范围内的条目 (按日期分片时使用)
+    page_limit_complete: 用完 max_pages 时视为已完成 (页数是有意设置的上限，而不是安全上限)
+    keep_temp:           把条目加入全局临时数据，中断时保存到 interrupted_data；任务模式靠各自的断点恢复，不加入
+    """
+    prefix = f"[{label}] " if label else ""
+    fields = resolve_fields(fields, full_data)
+    mode_text = '全部' if fields is None else f"投影 {len(fields)} 个字段"
     cursor = "*" # 初始游标
     cleaned_items = []
+    total_items = 0
     successful_pages = 0
+    start_page = 0
 
-    for page in range(max_pages):
-        print(f"--- 正在爬取第 {page + 1} 页 (模式: {query_type}, 数据模式: {'全部' if full_data else '裁剪'}) ---")
-        
-        # 1. 构造基本参数
-        params = {
-            'key': api_key,
-            'appid': app_id,
-            'cursor': cursor,
-            'numperpage': 100,
-            'query_type': query_type,
-            'return_children' : 1,
-            'match_all_tags' : 0,
-            
-            # 开启详细数据返回，以便获取统计数据和标签
-            'return_vote_data': 1, 
-            'return_tags': 1, 
-            'return_details': 1,
-            'return_kv_tags': 1 
-        }
+    checkpoint = CrawlCheckpoint(label or 'main', {
+        'app_id': app_id,
+        'required_tags': required_tags,
+        'excluded_tags': excluded_tags,
+        'query_type': query_type,
+        'fields': fields,
+        'updated_since': updated_since,
+        'created_range': list(created_range) if created_range else None,
+        'stream': sink is not None
+    }, checkpoint_folder)
+    if resume:
+        restored = checkpoint.load()
+        if restored:
+            cursor, start_page, cleaned_items, total_items, done = restored
+            if keep_temp:
+                with temp_lock:
+                    temp_data.extend(cleaned_items)
+            if done:
+                print(f"{prefix}断点显示该游标链已爬取完毕，直接使用已保存的 {total_items} 条数据。")
+                return cleaned_items
+            print(f"{prefix}从断点恢复: 第 {start_page + 1} 页，已获取 {total_items} 条，cursor: {cursor}")
 
-        # 2. 处理包含标签 (Required Tags)
-        if required_tags:
-            for i, tag in enumerate(required_tags):
-                params[f'requiredtags[{i}]'] = tag
+    for page in range(start_page, max_pages):
+        if stop_event.is_set():
+            print(f"{prefix}收到中断信号，停止爬取。")
+            incomplete_chains.append(label or 'main')
+            break
 
-        # 3. 处理排除标签 (Excluded Tags)
-        if excluded_tags:
-            for i, tag in enumerate(excluded_tags):
-                params[f'excludedtags[{i}]'] = tag
+        print(f"{prefix}--- 正在爬取第 {page + 1} 页 (模式: {query_type}, 数据模式: {mode_text}) ---")
+        
+        # 1. 构造请求参数 (包含/排除标签、按字段投影开启 return_* 参数)
+        params = build_query_params(api_key, app_id, cursor, query_type, required_tags, excluded_tags, fields,
+                                    created_range)
 
         try:
             # 发送请求
-            print(f"[请求] 第 {page + 1} 页 - cursor: {cursor}")
-            data = make_request(base_url, params, timeout=15)
+            print(f"{prefix}[请求] 第 {page + 1} 页 - cursor: {cursor}")
+            from_cache = is_cached(QUERY_FILES_URL, params)
+            if rate_limiter and not from_cache:
+                rate_limiter.wait()
+            data = make_request(QUERY_FILES_URL, params, timeout=15, rate_limiter=rate_limiter)
             
             # 检查是否有数据
             if 'response' not in data or 'publishedfiledetails' not in data['response']:
-                print("未获取到数据，可能已到达末尾。")
+                print(f"{prefix}未获取到数据，可能已到达末尾。")
+                checkpoint.commit([], cursor, page, total_items, done=True)
                 break
             
             items = data['response']['publishedfiledetails']
             if not items:
-                print("本页无数据，停止。")
+                print(f"{prefix}本页无数据，停止。")
+                checkpoint.commit([], cursor, page, total_items, done=True)
                 break
 
             # 4. 数据清洗与提取
+            clean_started = time.perf_counter()
             page_items = []
+            reached_watermark = False
             for item in items:
-                if full_data:
-                    # 获取全部数据
-                    clean_item = item.copy()
-                    # 处理标签格式
-                    if 'tags' in clean_item:
-                        raw_tags = clean_item['tags']
-                        tag_list = [t.get('tag') for t in raw_tags if 'tag' in t]
-                        clean_item['tags'] = tag_list
-                else:
-                    # 只保留指定字段
-                    # 提取标签列表 (API返回的是 [{'tag': 'A'}, {'tag': 'B'}] 格式，转为 ['A', 'B'])
-                    raw_tags = item.get('tags', [])
-                    tag_list = [t.get('tag') for t in raw_tags if 'tag' in t]
-
-                    clean_item = {
-                        'publishedfileid': item.get('publishedfileid'),
-                        'title': item.get('title'),
-                        'time_created': item.get('time_created'),
-                        'time_updated': item.get('time_updated'),
-                        # 统计数据如果为0，API有时会省略该字段，所以用 .get(key, 0)
-                        'views': item.get('views', 0),
-                        'subscriptions': item.get('subscriptions', 0),
-                        'favorited': item.get('favorited', 0),
-                        'tags': tag_list,
-                        'children': item.get('children', [])
-                    }
-                page_items.append(clean_item)
-                cleaned_items.append(clean_item)
-            
-            # 更新全局临时数据
-            temp_data = cleaned_items.copy()
-            
-            print(f"本页获取 {len(page_items)} 条，总计已获取 {len(cleaned_items)} 条。")
+                # 增量模式: 结果按更新时间倒序，一旦早于水位线，后面的都是旧数据
+                if updated_since is not None and item.get('time_updated', 0) < updated_since:
+                    reached_watermark = True
+                    break
+
+                page_items.append(clean_workshop_item(item, fields))
+            total_items += len(page_items)
+            metrics.add_clean(time.perf_counter() - clean_started, len(page_items))
 
-            # 保存进度数据（每5页保存一次）
-            if (page + 1) % 5 == 0:
-                save_progress_data(page_items, page + 1)
+            if on_page:
+                on_page(page_items)
 
-            # 5. 处理翻页游标
+            if sink:
+                # 流式输出: 本页直接写入输出文件，不在内存中累积
+                sink(page_items)
+            else:
+                cleaned_items.extend(page_items)
+                if keep_temp:
+                    # 更新全局临时数据 (多个分片线程共享)
+                    with temp_lock:
+                        temp_data.extend(page_items)
+            
+            print(f"{prefix}本页获取 {len(page_items)} 条，总计已获取 {total_items} 条。")
+
+            # 5. 处理翻页游标 (先把本页数据和下一页游标写入断点，再继续翻页)
             next_cursor = data['response'].get('next_cursor')
+            finished = reached_watermark or not next_cursor or next_cursor == cursor
+            checkpoint.commit([] if sink else page_items, next_cursor or cursor, page + 1, total_items, done=finished)
+
+            if reached_watermark:
+                print(f"{prefix}已到达上次爬取的时间水位线，停止翻页。")
+                successful_pages += 1
+                break
+
             if not next_cursor or next_cursor == cursor:
-                print("所有页面已爬取完毕。")
+                print(f"{prefix}所有页面已爬取完毕。")
                 break
             cursor = next_cursor
             
             successful_pages += 1
             
-            # 延时
-            time.sleep(1)
+            # 延时 (使用共享限速器时由限速器控制节奏；缓存命中时不需要)
+            if not rate_limiter and not from_cache:
+                metrics.add_sleep('page_delay', 1)
+                time.sleep(1)
 
+        except FatalRequestError:
+            raise
+        except CacheMissError as e:
+            # 仅回放模式: 缓存到此为止，这条游标链没有完整爬完
+            print(f"{prefix}{e}，停止翻页。")
+            incomplete_chains.append(label or 'main')
+            break
         except requests.exceptions.RequestException as e:
-            print(f"网络请求错误: {e}")
-            print("跳过当前页，继续下一页...")
+            print(f"{prefix}网络请求错误: {e}")
+            print(f"{prefix}跳过当前页，继续下一页...")
             continue
         except Exception as e:
-            print(f"处理数据时发生错误: {e}")
-            print("跳过当前页，继续下一页...")
+            print(f"{prefix}处理数据时发生错误: {e}")
+            print(f"{prefix}跳过当前页，继续下一页...")
             continue
+    else:
+        # 没有遇到结尾就用完了页数上限
+        if page_limit_complete:
+            print(f"{prefix}已达到页数上限 {max_pages} 页。")
+        else:
+            incomplete_chains.append(label or 'main')
 
-    print(f"\n爬取完成！成功处理 {successful_pages} 页，共获取 {len(cleaned_items)} 条数据。")
+    print(f"\n{prefix}爬取完成！成功处理 {successful_pages} 页，共获取 {total_items} 条数据。")
     return cleaned_items
 
+RESULT_FILE_NOT_FOUND = 9               # GetDetails 中条目已删除 (或不可见) 时的 result
+
+def build_details_params(api_key, item_ids, fields=None):
+    """构造 GetDetails 请求参数，字段开关沿用 build_query_params 的投影规则"""
+    query_params = build_query_params(api_key, APP_ID, '*', QUERY_TYPE, fields=fields)
+    params = {'key': api_key, 'appid': APP_ID}
+    for return_flag, include_flag in DETAILS_FLAGS.items():
+        if query_params.get(return_flag):
+            params[include_flag] = 1
+    for i, item_id in enumerate(item_ids):
+        params[f'publishedfileids[{i}]'] = item_id
+    return params
+
+def fetch_workshop_details(api_key, item_ids, fields=None, rate_limiter=None, on_page=None, full_data=FULL_DATA):
+    """
+    按ID定向刷新: 每个请求查询最多 DETAILS_BATCH_SIZE 个条目
+    返回 (清洗后的条目, 已从创意工坊删除的ID)；请求失败的批次跳过 (这些ID既不更新也不删除)
+    字段投影与 fetch_clean_workshop_data 相同 (没有指定字段且 full_data 为假时使用 lean 方案)
+    """
+    fields = resolve_fields(fields, full_data)
+    item_ids = list(dict.fromkeys(str(item_id) for item_id in item_ids))
+    batch_count = (len(item_ids) + DETAILS_BATCH_SIZE - 1) // DETAILS_BATCH_SIZE
+    items = []
+    missing_ids = []
+    for batch_index, start in enumerate(range(0, len(item_ids), DETAILS_BATCH_SIZE), 1):
+        if stop_event.is_set():
+            print("收到中断信号，停止刷新。")
+            break
+        batch = item_ids[start:start + DETAILS_BATCH_SIZE]
+        print(f"--- 正在刷新第 {batch_index}/{batch_count} 批 ({len(batch)} 个ID) ---")
+        params = build_details_params(api_key, batch, fields)
+        try:
+            if rate_limiter and not is_cached(GET_DETAILS_URL, params):
+                rate_limiter.wait()
+            data = make_request(GET_DETAILS_URL, params, timeout=15, rate_limiter=rate_limiter)
+        except FatalRequestError:
+            raise
+        except (requests.exceptions.RequestException, CacheMissError) as e:
+            print(f"网络请求错误: {e}")
+            print("跳过当前批次，继续下一批...")
+            continue
+
+        clean_started = time.perf_counter()
+        page_items = []
+        for item in data.get('response', {}).get('publishedfiledetails', []):
+            if item.get('result') == RESULT_FILE_NOT_FOUND:
+                missing_ids.append(str(item.get('publishedfileid')))
+            elif item.get('result') == 1:
+                page_items.append(clean_workshop_item(item, fields))
+        metrics.add_clean(time.perf_counter() - clean_started, len(page_items))
+
+        if on_page:
+            on_page(page_items)
+        items.extend(page_items)
+        print(f"本批获取 {len(page_items)} 条，总计已获取 {len(items)} 条。")
+
+    return items, missing_ids
+
+def read_id_list(file_path):
+    """读取ID列表文件: JSON 数组，或每行一个ID (忽略空行和 # 开头的注释)"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if text.lstrip().startswith('['):
+        return [str(item_id) for item_id in json.loads(text)]
+    return [line.strip() for line in text.splitlines() if line.strip() and not line.strip().startswith('#')]
+
+def run_refresh(api_key, ids_path, output_format=OUTPUT_FORMAT, compression=None, fields=None):
+    """
+    定向刷新模式: 只重新获取列表中的条目，更新数据库、已有数据集和爬取状态
+    不推进增量模式的时间水位线 (其他条目并没有被检查)
+    """
+    item_ids = read_id_list(ids_path)
+    print(f"定向刷新 {len(item_ids)} 个ID (每批 {DETAILS_BATCH_SIZE} 个)...")
+    run_started = int(time.time())
+    if not os.path.exists(OUTPUT_FOLDER):
+        os.makedirs(OUTPUT_FOLDER)
+
+    store = None
+    on_page = None
+    if USE_DB:
+        store = WorkshopStore(os.path.join(OUTPUT_FOLDER, DB_FILE))
+        on_page = lambda page_items: store.upsert_items(page_items, crawled_at=run_started)
+
+    items, missing_ids = fetch_workshop_details(api_key, item_ids, fields, RateLimiter(REQUESTS_PER_SECOND), on_page)
+    print(f"\n刷新完成: 获取 {len(items)} 条，{len(missing_ids)} 条已从创意工坊删除。")
+
+    if store is not None:
+        if missing_ids:
+            store.delete_items(missing_ids)
+        print(f"数据库 {DB_FILE} 共 {store.count()} 条数据。")
+        store.close()
+
+    if output_format == 'ndjson':
+        # 分卷只追加，读取时按ID取最新版本；已删除的条目会在下次全量爬取时清理
+        writer = NdjsonWriter(OUTPUT_FOLDER, f"{NDJSON_PREFIX}_{run_started}", compression=compression,
+                              max_items=NDJSON_ROTATE_ITEMS, max_bytes=NDJSON_ROTATE_BYTES)
+        writer.write(items)
+        writer.close()
+        print(f"已写入 {writer.total_items} 条数据到 {len(writer.paths)} 个 NDJSON 分卷。")
+    elif get_dataset_files():
+        missing_set = set(missing_ids)
+        data, added, updated = merge_items(load_existing_dataset(), items)
+        data = [item for item in data if str(item.get('publishedfileid')) not in missing_set]
+        chunk_index = save_dataset(data)
+        print(f"新增 {added} 条，更新 {updated} 条，数据集共 {len(data)} 条，分为 {chunk_index} 个文件。")
+    else:
+        print("没有已保存的 JSON 数据集，只更新了数据库。")
+
+    crawl_state = load_crawl_state()
+    if crawl_state is not None:
+        crawl_state['items'].update({str(item.get('publishedfileid')): item.get('time_updated', 0) for item in items})
+        for item_id in missing_ids:
+            crawl_state['items'].pop(item_id, None)
+        save_crawl_state(crawl_state)
+
+def build_shards(required_tags, windows=1, until=None):
+    """
+    将爬取任务拆分为互不重叠的分片 (分片的结果之和等于串行爬取的结果，不会重复请求同一个条目)
+    有包含标签时每个标签一个分片: 查询时 match_all_tags=0 (任一标签即匹配)，
+    因此第 i 个分片排除前面各分片的标签，带多个版本标签的Mod只由第一个匹配的分片获取
+    没有包含标签时按创建日期把 SHARD_DATE_START ~ until 等分为 windows 段 (首尾两段不设下限/上限)
+    until 须在断点续爬时保持不变 (取本次运行的开始时间)，否则分片与断点对不上
+    """
+    if required_tags:
+        return [{'label': tag, 'required_tags': [tag], 'excluded_tags': list(required_tags[:i]), 'created_range': None}
+                for i, tag in enumerate(required_tags)]
+    if windows <= 1:
+        return [{'label': 'all', 'required_tags': None, 'excluded_tags': [], 'created_range': None}]
+
+    start = int(time.mktime(time.strptime(SHARD_DATE_START, '%Y-%m-%d')))
+    until = int(until if until is not None else time.time())
+    step = max(1, (until - start) // windows)
+    bounds = [start + step * i for i in range(1, windows)]
+    starts = [0] + bounds
+    ends = [bound - 1 for bound in bounds] + [2 ** 32 - 1]
+    return [{'label': f'created_{i + 1}', 'required_tags': None, 'excluded_tags': [], 'created_range': (begin, end)}
+            for i, (begin, end) in enumerate(zip(starts, ends))]
+
+def dedupe_items(items):
+    """按 publishedfileid 去重，保留 time_updated 较新的那条 (分片互不重叠，这里只是以防万一: 例如爬取期间条目的标签有变化)"""
+    unique = {}
+    for item in items:
+        item_id = str(item.get('publishedfileid'))
+        existing = unique.get(item_id)
+        if existing is None or item.get('time_updated', 0) > existing.get('time_updated', 0):
+            unique[item_id] = item
+    return list(unique.values())
+
+def fetch_sharded_workshop_data(api_key, app_id, required_tags=None, excluded_tags=None, query_type=1, max_pages=1,
+                                full_data=FULL_DATA, updated_since=None, workers=SHARD_WORKERS,
+                                requests_per_second=REQUESTS_PER_SECOND, resume=False, sink=None, fields=None,
+                                on_page=None, shard_until=None):
+    """
+    并发分片爬取: 拆分为互不重叠的分片 (见 build_shards)，每个分片一条游标链，在线程池中运行，共享全局限速器
+    shard_until: 按创建日期分片的终点 (断点续爬时沿用中断那次运行的开始时间)
+    sink / on_page 会被多个线程同时调用，需要自行保证线程安全；流式输出时偶然的重复条目由读取方按ID去重
+    """
+    shards = build_shards(required_tags, workers * SHARD_DATE_WINDOWS_PER_WORKER, shard_until)
+    rate_limiter = RateLimiter(requests_per_second)
+    print(f"并发分片爬取: {len(shards)} 个分片，{workers} 个线程，全局限速 {requests_per_second} 次/秒")
+
+    all_items = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                fetch_clean_workshop_data,
+                api_key,
+                app_id,
+                required_tags=shard['required_tags'],
+                excluded_tags=list(excluded_tags or []) + shard['excluded_tags'],
+                query_type=query_type,
+                max_pages=max_pages,
+                full_data=full_data,
+                updated_since=updated_since,
+                rate_limiter=rate_limiter,
+                label=shard['label'],
+                resume=resume,
+                sink=sink,
+                fields=fields,
+                on_page=on_page,
+                created_range=shard['created_range']
+            )
+            for shard in shards
+        ]
+        for shard, future in zip(shards, futures):
+            try:
+                all_items.extend(future.result())
+            except FatalRequestError:
+                # API key 无效等致命错误: 通知其余分片停止，并向上抛出
+                stop_event.set()
+                raise
+            except Exception as e:
+                print(f"[{shard['label']}] 分片爬取失败: {e}")
+                incomplete_chains.append(shard['label'])
+
+    if sink:
+        print("\n所有分片完成！")
+        return []
+
+    unique_items = dedupe_items(all_items)
+    print(f"\n所有分片完成！共获取 {len(all_items)} 条，去重后 {len(unique_items)} 条。")
+    return unique_items
+
+def load_jobs(file_path):
+    """
+    读取任务文件: JSON 数组 (或 {"jobs": [...]})，每个任务为
+    {"name", "app_id", "required_tags", "excluded_tags", "query_type", "max_pages", "fields"}
+    除 name 外都可省略，省略时使用配置区域中的值；fields 为 FIELD_PROFILES 中的方案名
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('jobs', [])
+
+    jobs = []
+    names = set()
+    for spec in data:
+        name = str(spec.get('name', ''))
+        if not name or not all(c.isalnum() or c in '-_.' for c in name) or name.startswith('.'):
+            raise ValueError(f"任务名只能包含字母、数字和 -_. : {name!r}")
+        if name in names:
+            raise ValueError(f"任务名重复: {name}")
+        names.add(name)
+        fields = spec.get('fields')
+        if fields is not None and fields not in FIELD_PROFILES:
+            raise ValueError(f"[{name}] 未知的字段投影方案: {fields}")
+        jobs.append({
+            'name': name,
+            'app_id': int(spec.get('app_id', APP_ID)),
+            'required_tags': spec.get('required_tags', TARGET_TAGS),
+            'excluded_tags': spec.get('excluded_tags', EXCLUDED_TAGS),
+            'query_type': int(spec.get('query_type', QUERY_TYPE)),
+            'max_pages': int(spec.get('max_pages', MAX_PAGES)),
+            'fields': fields,
+        })
+    return jobs
+
+def run_job(api_key, job, rate_limiter, resume=False):
+    """运行单个任务 (一条游标链) 并把结果写入该任务的输出文件夹，返回任务摘要"""
+    started = time.time()
+    items = fetch_clean_workshop_data(
+        api_key,
+        job['app_id'],
+        required_tags=job['required_tags'],
+        excluded_tags=job['excluded_tags'],
+        query_type=job['query_type'],
+        max_pages=job['max_pages'],
+        rate_limiter=rate_limiter,
+        label=job['name'],
+        resume=resume,
+        fields=FIELD_PROFILES[job['fields']] if job['fields'] else None,
+        checkpoint_folder=job_checkpoint_folder(job['name']),
+        # 任务文件中的 max_pages 是有意设置的上限，爬满即算完成
+        page_limit_complete=True,
+        # 各任务的条目不混入全局临时数据，中断后用 --resume 从任务断点恢复
+        keep_temp=False
+    )
+    folder = os.path.join(OUTPUT_FOLDER, JOBS_FOLDER, job['name'])
+    chunks = save_dataset(items, folder)
+    complete = job['name'] not in incomplete_chains
+    if complete:
+        # 只清理本任务的断点，不影响其他任务和主任务
+        clear_checkpoints(job_checkpoint_folder(job['name']))
+    return {
+        'name': job['name'],
+        'items': len(items),
+        'chunks': chunks,
+        'complete': complete,
+        'seconds': round(time.time() - started, 3),
+        'folder': folder,
+    }
+
+def run_jobs(api_key, jobs, workers=JOB_WORKERS, requests_per_second=REQUESTS_PER_SECOND, resume=False):
+    """
+    多任务爬取: 所有任务在同一个线程池中运行，共享 HTTP 连接池和全局限速器，各自输出到 jobs/<任务名>/
+    断点保存在 checkpoint/jobs/<任务名>/ 下，完成的任务各自清理
+    不写入数据库和增量爬取状态 (它们只对应配置区域中的主任务)
+    """
+    rate_limiter = RateLimiter(requests_per_second)
+    print(f"多任务爬取: {len(jobs)} 个任务，{workers} 个线程，全局限速 {requests_per_second} 次/秒")
+
+    summaries = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_job, api_key, job, rate_limiter, resume) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                summaries.append(future.result())
+            except FatalRequestError:
+                # API key 无效等致命错误: 通知其余任务停止，并向上抛出
+                stop_event.set()
+                raise
+            except Exception as e:
+                print(f"[{job['name']}] 任务失败: {e}")
+                summaries.append({'name': job['name'], 'items': 0, 'complete': False, 'error': str(e)})
+
+    summary_path = os.path.join(OUTPUT_FOLDER, JOBS_FOLDER, 'summary.json')
+    os.makedirs(os.path.dirname(summary_path), exist_ok=True)
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump({'finished': int(time.time()), 'jobs': summaries}, f, ensure_ascii=False, indent=2)
+
+    print("\n所有任务完成:")
+    for summary in summaries:
+        status = '完成' if summary['complete'] else '未完成'
+        print(f"  [{summary['name']}] {status}，{summary['items']} 条"
+              + (f"，{summary['seconds']:.1f} 秒" if 'seconds' in summary else f"，错误: {summary.get('error')}"))
+    if not all(summary['complete'] for summary in summaries):
+        print("未完成的任务保留了断点，可用 --jobs 配合 --resume 继续。")
+    return summaries
+
+def make_stream_sink(writer, updates):
+    """创建线程安全的流式输出回调，同时记录每个条目的 time_updated 供爬取状态使用"""
+    def sink(page_items):
+        with stream_lock:
+            writer.write(page_items)
+            for item in page_items:
+                updates[str(item.get('publishedfileid'))] = item.get('time_updated', 0)
+    return sink
+
+def start_metrics_reporter(fmt):
+    """按格式启动定期写入统计指标的后台线程；fmt 为 'none' 时返回 None"""
+    if fmt == 'none':
+        return None
+    path = os.path.join(OUTPUT_FOLDER, METRICS_FILE + ('.jsonl' if fmt == 'jsonl' else '.prom'))
+    return MetricsReporter(metrics, path, fmt, METRICS_INTERVAL).start()
+
+def open_response_cache(enabled, ttl, replay_only):
+    """按命令行参数创建响应缓存；未启用时返回 None"""
+    if not enabled and not replay_only:
+        return None
+    cache = ResponseCache(os.path.join(OUTPUT_FOLDER, RESPONSE_CACHE_FOLDER),
+                          ttl=ttl if ttl and ttl > 0 else None, replay_only=replay_only)
+    if replay_only:
+        print(f"仅回放模式: 只使用 {cache.folder} 中缓存的响应，不发起网络请求")
+    else:
+        removed = cache.prune()
+        print(f"响应缓存: {cache.folder} (有效期 {ttl} 秒{f'，已清理 {removed} 个过期文件' if removed else ''})")
+    return cache
+
+def crawl_watermark(run_started):
+    """增量水位线: 用到缓存时取最早的缓存时间 (缓存之后的更新并没有被看到)"""
+    if response_cache is None or response_cache.oldest_hit is None:
+        return run_started
+    return min(run_started, int(response_cache.oldest_hit))
+
+def print_cache_summary():
+    if response_cache is not None:
+        print(f"响应缓存: 命中 {response_cache.hits} 次，未命中 {response_cache.misses} 次，写入 {response_cache.writes} 个响应")
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='Steam Workshop 数据爬虫')
+    parser.add_argument('--incremental', action='store_true',
+                        help='增量模式: 只爬取上次成功爬取之后更新过的条目，并合并进已有数据集')
+    parser.add_argument('--workers', type=int, default=SHARD_WORKERS,
+                        help='并发线程数 (>1 时按包含标签分片并发爬取)')
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND,
+                        help='并发爬取时的全局请求速率上限 (次/秒)')
+    parser.add_argument('--resume', action='store_true',
+                        help='从上次中断时提交的断点 (游标与已获取数据) 继续爬取')
+    parser.add_argument('--format', choices=['json', 'ndjson'], default=OUTPUT_FORMAT,
+                        help='输出格式: json = 结束时分块写入；ndjson = 每页流式追加写入分卷')
+    parser.add_argument('--compression', choices=['gzip', 'zstd'], default=NDJSON_COMPRESSION,
+                        help='NDJSON 分卷的压缩方式')
+    parser.add_argument('--fields', choices=sorted(FIELD_PROFILES),
+                        help='字段投影方案: 只请求并保存下游需要的字段 (例如 match = match.py 用到的字段)')
+    parser.add_argument('--refresh', metavar='ID_FILE',
+                        help='定向刷新: 只按ID批量获取文件中列出的条目 (可由 subscribe.py --export-ids 生成)')
+    parser.add_argument('--jobs', metavar='JOBS_FILE',
+                        help='多任务爬取: 按任务文件中的多组 AppID/标签/排序条件爬取，共享连接和限速，分别输出')
+    parser.add_argument('--metrics', choices=['jsonl', 'prometheus', 'none'], default=METRICS_FORMAT or 'none',
+                        help='统计指标的输出格式 (请求耗时、重试、等待时间等)')
+    parser.add_argument('--cache', action='store_true', default=RESPONSE_CACHE,
+                        help='缓存请求的响应，重新运行时直接使用未过期的缓存')
+    parser.add_argument('--cache-ttl', type=int, default=RESPONSE_CACHE_TTL,
+                        help='响应缓存的有效期 (秒，0 = 永不过期)')
+    parser.add_argument('--replay', action='store_true',
+                        help='仅回放: 只使用缓存的响应 (不检查有效期)，不发起任何网络请求')
+    parser.add_argument('--profile', nargs='?', const='profile_scrap.txt', metavar='REPORT',
+                        help='按阶段统计耗时和内存并写出报告 (并发线程中的函数耗时不计入，可配合 --workers 1)')
+    return parser.parse_args()
+
 # 执行主程序
 if __name__ == "__main__":
+    args = parse_args()
+    if args.profile:
+        profiler.enable(args.profile)
+    API_KEY = load_api_key()
+
     # 注册信号处理器
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
@@ -308,53 +1263,196 @@ if __name__ == "__main__":
     print(f"包含标签: {TARGET_TAGS}")
     print(f"排除标签: {EXCLUDED_TAGS}")
     print(f"最大重试次数: {MAX_RETRIES}")
-    print(f"重试延迟: {RETRY_DELAY} 秒")
-    print("提示: 按 Ctrl+C 可随时中断并保存已获取的数据")
+    print(f"重试延迟: {RETRY_DELAY} 秒起，指数退避，最长 {RETRY_MAX_DELAY} 秒")
+    print("提示: 按 Ctrl+C 可随时中断并保存已获取的数据，之后可用 --resume 断点续爬")
     print("=" * 50)
-    
-    try:
-        data = fetch_clean_workshop_data(
-            API_KEY, 
-            APP_ID, 
-            required_tags=TARGET_TAGS, 
-            excluded_tags=EXCLUDED_TAGS, 
-            query_type=QUERY_TYPE, 
-            max_pages=MAX_PAGES
+
+    response_cache = open_response_cache(args.cache, args.cache_ttl, args.replay)
+
+    if args.refresh:
+        metrics_reporter = start_metrics_reporter(args.metrics)
+        with profiler.stage('refresh'):
+            run_refresh(API_KEY, args.refresh, args.format, args.compression,
+                        FIELD_PROFILES[args.fields] if args.fields else None)
+        if metrics_reporter is not None:
+            metrics_reporter.stop()
+        print_cache_summary()
+        sys.exit(0)
+
+    if args.jobs:
+        jobs = load_jobs(args.jobs)
+        metrics_reporter = start_metrics_reporter(args.metrics)
+        try:
+            with profiler.stage('jobs'):
+                run_jobs(API_KEY, jobs, args.workers if args.workers > 1 else min(JOB_WORKERS, len(jobs)) or 1,
+                         args.rate, args.resume)
+        finally:
+            if metrics_reporter is not None:
+                metrics_reporter.stop()
+            print_cache_summary()
+        sys.exit(0)
+
+    # 水位线取本次开始时间: 爬取过程中才更新的条目留给下一次增量处理
+    run_started = int(time.time())
+    crawl_state = load_crawl_state()
+    incremental = False
+    updated_since = None
+    run_info = load_run_info() if args.resume else None
+    rotate_items, rotate_bytes = NDJSON_ROTATE_ITEMS, NDJSON_ROTATE_BYTES
+
+    if run_info:
+        # 断点续爬沿用中断那次运行的模式和时间水位线，保证断点的查询条件一致
+        run_started = run_info['run_started']
+        incremental = run_info['incremental'] and crawl_state is not None
+        updated_since = run_info['updated_since']
+        args.workers = run_info.get('workers', args.workers)
+        args.format = run_info.get('format', args.format)
+        args.fields = run_info.get('fields', args.fields)
+        # 续写的 NDJSON 分卷沿用中断时的压缩格式和分卷大小
+        args.compression = run_info.get('compression', args.compression)
+        rotate_items = run_info.get('rotate_items', rotate_items)
+        rotate_bytes = run_info.get('rotate_bytes', rotate_bytes)
+        print(f"断点续爬: 继续 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(run_started))} 开始的{'增量' if incremental else '全量'}爬取")
+    else:
+        if args.resume:
+            print("未找到可恢复的断点，开始新的爬取。")
+        clear_checkpoints()
+        if args.incremental:
+            if crawl_state and (get_ndjson_parts() if args.format == 'ndjson' else get_dataset_files()):
+                incremental = True
+                updated_since = crawl_state['last_run']
+                last_run_text = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(updated_since))
+                print(f"增量模式: 只爬取 {last_run_text} 之后更新的条目")
+            else:
+                print("未找到爬取状态或已有数据集，改为执行全量爬取。")
+        save_run_info({'run_started': run_started, 'incremental': incremental, 'updated_since': updated_since,
+                       'workers': args.workers, 'format': args.format, 'fields': args.fields,
+                       'compression': args.compression, 'rotate_items': rotate_items, 'rotate_bytes': rotate_bytes})
+
+    # 流式输出: 每页直接追加写入本次运行的 NDJSON 分卷
+    sink = None
+    streamed_updates = {}
+    if args.format == 'ndjson':
+        stream_writer = NdjsonWriter(
+            OUTPUT_FOLDER,
+            f"{NDJSON_PREFIX}_{run_started}",
+            compression=args.compression,
+            max_items=rotate_items,
+            max_bytes=rotate_bytes
         )
-        
-        # 确保输出文件夹存在
+        sink = make_stream_sink(stream_writer, streamed_updates)
+
+    # 定期输出统计指标
+    metrics_reporter = start_metrics_reporter(args.metrics)
+
+    # 每页写入 SQLite 数据库 (按 publishedfileid 覆盖，重复爬取也不会产生重复数据)
+    store = None
+    on_page = None
+    if USE_DB:
         if not os.path.exists(OUTPUT_FOLDER):
             os.makedirs(OUTPUT_FOLDER)
-        
-        # 分块保存最终结果
-        chunk_index = 0
-        for i in range(0, len(data), CHUNK_SIZE):
-            chunk = data[i:i + CHUNK_SIZE]
-            if chunk_index == 0:
-                chunk_filename = os.path.join(OUTPUT_FOLDER, OUTPUT_FILE)
+        store = WorkshopStore(os.path.join(OUTPUT_FOLDER, DB_FILE))
+        on_page = lambda page_items: store.upsert_items(page_items, crawled_at=run_started)
+    
+    try:
+        with profiler.stage('crawl'):
+            if args.workers > 1:
+                fetched = fetch_sharded_workshop_data(
+                    API_KEY,
+                    APP_ID,
+                    required_tags=TARGET_TAGS,
+                    excluded_tags=EXCLUDED_TAGS,
+                    query_type=INCREMENTAL_QUERY_TYPE if incremental else QUERY_TYPE,
+                    max_pages=MAX_PAGES,
+                    updated_since=updated_since,
+                    workers=args.workers,
+                    requests_per_second=args.rate,
+                    resume=run_info is not None,
+                    sink=sink,
+                    fields=FIELD_PROFILES[args.fields] if args.fields else None,
+                    on_page=on_page,
+                    shard_until=run_started
+                )
             else:
-                chunk_filename = os.path.join(OUTPUT_FOLDER, f"workshop_data_{chunk_index + 1}.json")
-            with open(chunk_filename, 'w', encoding='utf-8') as f:
-                json.dump(chunk, f, ensure_ascii=False, indent=4)
-            print(f"已保存 {len(chunk)} 条数据到 {chunk_filename}")
-            chunk_index += 1
-        
-        print(f"\n爬取结束！共保存 {len(data)} 条数据，分为 {chunk_index} 个文件。")
+                fetched = fetch_clean_workshop_data(
+                    API_KEY, 
+                    APP_ID, 
+                    required_tags=TARGET_TAGS, 
+                    excluded_tags=EXCLUDED_TAGS, 
+                    query_type=INCREMENTAL_QUERY_TYPE if incremental else QUERY_TYPE, 
+                    max_pages=MAX_PAGES,
+                    updated_since=updated_since,
+                    resume=run_info is not None,
+                    sink=sink,
+                    fields=FIELD_PROFILES[args.fields] if args.fields else None,
+                    on_page=on_page
+                )
+
+        if store is not None:
+            if not incremental and not incomplete_chains:
+                # 完整的全量爬取中没有出现的条目已被删除或不再符合筛选条件
+                with profiler.stage('db_cleanup'):
+                    removed = store.delete_not_crawled_since(run_started)
+                if removed:
+                    print(f"已从数据库删除 {removed} 条本次未出现的条目")
+            print(f"数据库 {DB_FILE} 共 {store.count()} 条数据。")
+            store.close()
+
+        if stream_writer is not None:
+            with stream_lock:
+                stream_writer.close()
+            print(f"\n爬取结束！本次共写入 {stream_writer.total_items} 条数据到 {len(stream_writer.paths)} 个 NDJSON 分卷。")
+            if not incremental and not incomplete_chains:
+                # 全量爬取成功后，旧的分卷已被完整替代 (增量模式的分卷只追加，读取时按ID取最新)
+                for part_path in get_ndjson_parts():
+                    if not os.path.basename(part_path).startswith(f"{NDJSON_PREFIX}_{run_started}_"):
+                        os.remove(part_path)
+                        print(f"已删除旧的分卷 {part_path}")
+            finish_crawl_state(crawl_state, incremental, streamed_updates, run_started)
+        else:
+            if incremental:
+                known_items = crawl_state['items']
+                changed = [item for item in fetched
+                           if known_items.get(str(item.get('publishedfileid'))) != item.get('time_updated', 0)]
+                print(f"\n增量爬取获取 {len(fetched)} 条，其中 {len(changed)} 条有变化，正在合并进已有数据集...")
+                with profiler.stage('merge'):
+                    data, added, updated = merge_items(load_existing_dataset(), changed)
+                print(f"新增 {added} 条，更新 {updated} 条，数据集共 {len(data)} 条。")
+            elif incomplete_chains:
+                # 不完整的全量爬取不能替换已有数据集，只合并本次获取到的条目
+                print(f"\n全量爬取未完成，获取的 {len(fetched)} 条合并进已有数据集...")
+                with profiler.stage('merge'):
+                    data, added, updated = merge_items(load_existing_dataset(), fetched)
+                print(f"新增 {added} 条，更新 {updated} 条，数据集共 {len(data)} 条。")
+            else:
+                data = fetched
+
+            # 分块保存最终结果
+            with profiler.stage('save_dataset'):
+                chunk_index = save_dataset(data)
         
-        # 清理进度文件
-        progress_files = [f for f in os.listdir(OUTPUT_FOLDER) if f.startswith('progress_data_page_')]
-        for pf in progress_files:
-            os.remove(os.path.join(OUTPUT_FOLDER, pf))
-        if progress_files:
-            print(f"已清理 {len(progress_files)} 个进度文件")
+            print(f"\n爬取结束！共保存 {len(data)} 条数据，分为 {chunk_index} 个文件。")
+
+            # 记录本次爬取的状态，供下次增量使用 (爬取完整时才推进水位线、清理断点)
+            fetched_updates = {str(item.get('publishedfileid')): item.get('time_updated', 0) for item in fetched}
+            finish_crawl_state(crawl_state, incremental, fetched_updates, run_started)
         
-        # 打印第一条数据示例
-        if data:
-            print("\n第一条数据示例:")
-            print(json.dumps(data[0], ensure_ascii=False, indent=2))
+            # 打印第一条数据示例
+            if data:
+                print("\n第一条数据示例:")
+                print(json.dumps(data[0], ensure_ascii=False, indent=2))
             
     except Exception as e:
         print(f"程序执行出错: {e}")
-        if temp_data:
+        if temp_data or stream_writer is not None:
             print("正在保存已获取的临时数据...")
-            signal_handler(None, None)  # 调用信号处理器保存数据
\ No newline at end of file
+            signal_handler(None, None)  # 调用信号处理器保存数据
+
+    if metrics_reporter is not None:
+        snapshot = metrics_reporter.stop()
+        sleep_text = ', '.join(f"{reason} {seconds:.1f} 秒" for reason, seconds in snapshot['sleep_seconds'].items()) or '无'
+        print(f"\n统计: {snapshot['requests']} 次请求，接收 {snapshot['bytes_received'] / 1024 / 1024:.1f} MB，"
+              f"重试 {sum(snapshot['retry_counts'].values())} 次，等待 {sleep_text}，"
+              f"{snapshot['items_per_second']:.1f} 条/秒")
+        print(f"统计指标已写入 {metrics_reporter.path}")
+    print_cache_summary()
@@ -0,0 +1,174 @@
+import atexit
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# ================= 配置区域 =================
+TOP_FUNCTIONS = 15       # 每个阶段列出的耗时最多的函数数
+TOP_ALLOCATIONS = 10     # 每个阶段列出的内存增长最多的代码行数
+TRACE_FRAMES = 1         # tracemalloc 记录的调用栈深度 (越深越慢)
+TRACE_ALLOCATIONS = True # 是否统计各阶段内存增长最多的代码行 (需要对比内存快照，数据量大时每个阶段要多花数秒)
+# ===========================================
+
+PROFILER_FILES = {__file__, cProfile.__file__, pstats.__file__, tracemalloc.__file__}
+
+
+class StageResult:
+    """同名阶段的累计结果 (一个阶段可以多次进入)"""
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.peak = 0
+        self.retained = 0
+        self.stats = None
+        self.allocations = []
+
+
+class StageProfiler:
+    """
+    按阶段统计耗时、cProfile 函数耗时和 tracemalloc 内存
+    未启用时 stage() 什么都不做，可以一直留在代码中
+    阶段可以嵌套: 进入内层阶段时暂停外层的 cProfile，函数耗时只计入当前最内层的阶段；
+    峰值内存同时计入内外两层
+    cProfile 只统计调用 stage() 的线程 (并发爬取的工作线程不在其中)，tracemalloc 统计全部线程
+    """
+    def __init__(self):
+        self.enabled = False
+        self.report_path = None
+        self.results = {}
+        self.order = []
+        self._stack = []
+        self._started = None
+        self._thread = None
+        self.overhead = 0.0
+
+    def enable(self, report_path):
+        """开始统计；进程退出时 (包括 sys.exit) 自动写出报告"""
+        self.enabled = True
+        self.report_path = report_path
+        self._started = time.perf_counter()
+        self._thread = threading.get_ident()
+        tracemalloc.start(TRACE_FRAMES)
+        atexit.register(self.write_report)
+        print(f"性能分析已开启，结束时报告写入 {report_path} (分析期间运行会明显变慢)")
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled or threading.get_ident() != self._thread:
+            yield
+            return
+
+        result = self.results.get(name)
+        if result is None:
+            result = self.results[name] = StageResult(name)
+            self.order.append(name)
+
+        overhead_started = time.perf_counter()
+        if self._stack:
+            outer = self._stack[-1]
+            outer['profile'].disable()
+            outer['peak'] = max(outer['peak'], tracemalloc.get_traced_memory()[1])
+        frame = {
+            'profile': cProfile.Profile(),
+            'peak': 0,
+            'snapshot': tracemalloc.take_snapshot() if TRACE_ALLOCATIONS else None,
+        }
+        self._stack.append(frame)
+        tracemalloc.reset_peak()
+        frame['memory'] = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        self.overhead += started - overhead_started
+        frame['profile'].enable()
+        try:
+            yield
+        finally:
+            frame['profile'].disable()
+            elapsed = time.perf_counter() - started
+            overhead_started = time.perf_counter()
+            self._stack.pop()
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(frame['peak'], peak)
+
+            result.calls += 1
+            result.seconds += elapsed
+            result.peak = max(result.peak, peak)
+            result.retained += current - frame['memory']
+            if result.stats is None:
+                result.stats = pstats.Stats(frame['profile'])
+            else:
+                result.stats.add(frame['profile'])
+            if frame['snapshot'] is not None:
+                diffs = tracemalloc.take_snapshot().compare_to(frame['snapshot'], 'lineno')
+                result.allocations = self._merge_allocations(result.allocations, diffs)
+
+            if self._stack:
+                outer = self._stack[-1]
+                outer['peak'] = max(outer['peak'], peak)
+                tracemalloc.reset_peak()
+                outer['profile'].enable()
+            self.overhead += time.perf_counter() - overhead_started
+
+    @staticmethod
+    def _merge_allocations(existing, diffs):
+        """累计各代码行的内存增长，只保留增长最多的几行"""
+        merged = dict(existing)
+        for stat in diffs:
+            frame = stat.traceback[0]
+            # 分析器自身 (含 cProfile、tracemalloc) 的分配不计入
+            if stat.size_diff <= 0 or frame.filename in PROFILER_FILES:
+                continue
+            key = f"{frame.filename}:{frame.lineno}"
+            size, count = merged.get(key, (0, 0))
+            merged[key] = (size + stat.size_diff, count + stat.count_diff)
+        return sorted(merged.items(), key=lambda item: item[1][0], reverse=True)[:TOP_ALLOCATIONS]
+
+    def format_report(self):
+        # 内存快照和对比本身很慢，不计入总耗时
+        total = time.perf_counter() - self._started - self.overhead
+        peak = max((result.peak for result in self.results.values()), default=0)
+        lines = [f"总耗时 {total:.3f} 秒 (另有分析器自身开销 {self.overhead:.3f} 秒)，"
+                 f"阶段内存峰值 {peak / 1024 / 1024:.1f} MB (tracemalloc)", ""]
+        lines.append(f"{'阶段':<24}{'次数':>6}{'耗时(秒)':>12}{'占比':>8}{'峰值(MB)':>12}{'留存(MB)':>12}")
+        for name in self.order:
+            result = self.results[name]
+            lines.append(f"{name:<24}{result.calls:>6}{result.seconds:>12.3f}{result.seconds / max(total, 1e-9):>8.1%}"
+                         f"{result.peak / 1024 / 1024:>12.1f}{result.retained / 1024 / 1024:>12.1f}")
+
+        for name in self.order:
+            result = self.results[name]
+            lines += ["", "=" * 80, f"阶段: {name}", "=" * 80]
+            if result.stats is not None:
+                stream = io.StringIO()
+                result.stats.stream = stream
+                result.stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+                lines.append("耗时最多的函数 (按累计耗时):")
+                lines += [line for line in stream.getvalue().splitlines() if line.strip()][-(TOP_FUNCTIONS + 1):]
+            if result.allocations:
+                lines.append("")
+                lines.append("内存增长最多的代码行 (阶段结束时仍未释放):")
+                for key, (size, count) in result.allocations:
+                    lines.append(f"  {size / 1024:>10.1f} KB  {count:>8} 个对象  {key}")
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self):
+        if not self.enabled or not self.results:
+            return
+        report = self.format_report()
+        folder = os.path.dirname(self.report_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.report_path, 'w', encoding='utf-8') as f:
+            f.write(report)
+        print(f"\n性能分析报告已写入 {self.report_path}")
+        print('\n'.join(report.splitlines()[:len(self.order) + 3]))
+        self.results = {}
+
+
+# 各脚本共用的分析器 (命令行 --profile 时启用)
+profiler = StageProfiler()
@@ -1,51 +1,75 @@
 import json
 import os
-import re
 import sys
-import math
 import time
-from datetime import datetime
 import argparse
+import urllib.request
+import urllib.error
 
-try:
-    from steamworks import STEAMWORKS
-except ImportError:
-    print("请先安装库: pip install git+https://github.com/philippj/SteamworksPy.git")
-    input("回车结束...")
-    sys.exit(1)
+from classifier import detect_language_type, rank_translations
+from binmap import BinaryTranslationMap
+from depgraph import DependencyGraph
+from stage_profiler import profiler
 
 # ================= 配置区域 =================
 GAME_APP_ID = 294100 
 JSON_FILE_PATH = './translation_map.json'
+SERVICE_URL = None   # translation_service.py 的地址 (例如 'http://127.0.0.1:8765')，设置后由服务挑选汉化，本地无需读取对照表
+SERVICE_TIMEOUT = 10.0
+DEPGRAPH_FILE_PATH = './dependency_graph.json'  # match.py 生成的依赖关系图，存在时据此识别合集汉化、附加汉化和缺失的依赖
+BINARY_FILE_PATH = './translation_map.bin'   # match.py 生成的二进制对照表，存在且不比 JSON 旧时优先使用
 # LANGUAGE_PREFERENCE 将通过命令行参数或交互式输入设置
 LANGUAGE_PREFERENCE = None
 
-GAME_VERSION_TIERS = {
-    "1.6": "2025-07-12",
-    "1.5": "2024-04-12",
-    "1.4": "2022-10-21",
-    "1.3": "2021-07-21",
-}
-WEIGHT_LOG_SUBS = 90.0
+# 汉化排序规则 (版本等级、订阅数权重) 见 classifier.py，match.py 生成对照表时已按语言偏好排好序
 
-# --- 批量验证配置 ---
-MAX_VERIFY_CYCLES = 15
-VERIFY_INTERVAL = 3.0
+# --- 订阅调度与确认配置 ---
+SUBSCRIBE_BATCH_SIZE = 10     # 初始每批发送的订阅请求数 (之后根据 Steam 的确认速度自动调整)
+MAX_BATCH_SIZE = 50           # 每批最多发送的请求数
+MAX_IN_FLIGHT = 50            # 同时等待确认的请求数上限
+BATCH_INTERVAL = 0.5          # 两批之间的最短间隔 (秒)
+CONFIRM_TIMEOUT = 60.0        # 连续这么久没有任何进展 (确认或失败) 就停止等待 (秒)
+MAX_SUBSCRIBE_RETRIES = 5     # 单个项目订阅失败后的最多重试次数
+RETRY_BASE_DELAY = 1.0        # 重试等待的基础时间 (秒)，每次失败翻倍
+STATE_CHECK_DELAY = 2.0       # 发出请求后多久仍没有回调，就开始定期查询该项目的订阅状态 (秒)
+RESEND_TIMEOUT = 30.0         # 既没有回调、订阅状态也一直未变时，多久后才重新发送请求 (秒)
+CALLBACK_POLL_INTERVAL = 0.05 # 处理 Steam 回调的间隔 (秒)
 
 # True = 仅模拟，False = 实际订阅
 DRY_RUN = False
 # ===========================================
 
-def get_language_preference():
-    """获取语言偏好设置"""
+# Steam 常量
+K_ERESULT_OK = 1
+K_EITEM_STATE_SUBSCRIBED = 1
+
+def load_steamworks():
+    """按需导入 SteamworksPy (只在真正连接 Steam 时需要)"""
+    try:
+        from steamworks import STEAMWORKS
+    except ImportError:
+        print("请先安装库: pip install git+https://github.com/philippj/SteamworksPy.git")
+        input("回车结束...")
+        sys.exit(1)
+    return STEAMWORKS
+
+def parse_args():
+    """解析命令行参数"""
     parser = argparse.ArgumentParser(description='RimWorld 汉化自动订阅工具')
     parser.add_argument('--lang', choices=['1', '2'], help='语言选择: 1=简体中文, 2=繁体中文')
-    
-    args = parser.parse_args()
-    
-    if args.lang:
+    parser.add_argument('--server', default=SERVICE_URL,
+                        help='translation_service.py 的地址，由服务挑选汉化 (失败时改为读取本地对照表)')
+    parser.add_argument('--export-ids', metavar='FILE',
+                        help='只导出已订阅Mod及其候选汉化的ID列表 (供 scrap.py --refresh 定向刷新)，不执行订阅')
+    parser.add_argument('--profile', nargs='?', const='profile_subscribe.txt', metavar='REPORT',
+                        help='按阶段统计耗时和内存并写出报告')
+    return parser.parse_args()
+
+def get_language_preference(lang=None):
+    """获取语言偏好设置"""
+    if lang:
         # 通过命令行参数设置
-        return 'simplified' if args.lang == '1' else 'traditional'
+        return 'simplified' if lang == '1' else 'traditional'
     else:
         # 交互式输入
         print("请选择语言偏好:")
@@ -60,7 +84,17 @@ def get_language_preference():
             else:
                 print("无效输入，请输入 1 或 2")
 
-def load_translations(filepath):
+def load_translations(filepath, binary_path=BINARY_FILE_PATH):
+    """
+    读取对照表
+    有二进制对照表时直接 mmap 打开 (只在查询时解析用到的条目)，否则完整解析 JSON
+    """
+    if binary_path and os.path.exists(binary_path):
+        if not os.path.exists(filepath) or os.path.getmtime(binary_path) >= os.path.getmtime(filepath):
+            try:
+                return BinaryTranslationMap(binary_path)
+            except (OSError, ValueError) as e:
+                print(f"二进制对照表不可用，改为读取 JSON: {e}")
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
             return json.load(f)
@@ -69,55 +103,18 @@ def load_translations(filepath):
         input("回车结束...")
         sys.exit(1)
 
-RE_TRADITIONAL = re.compile(r'(繁|\bTW\b|\bHK\b|\bCHT\b|\bTC\b|traditional)', re.IGNORECASE)
-RE_SIMPLIFIED = re.compile(r'(简|簡|\bCN\b|\bCHS\b|\bSC\b|simplified)', re.IGNORECASE)
-
-def detect_language_type(title):
-    is_traditional = bool(RE_TRADITIONAL.search(title))
-    is_simplified = bool(RE_SIMPLIFIED.search(title))
-    if is_traditional and is_simplified: return 'both'
-    elif is_traditional: return 'traditional'
-    return 'both'
-
-def preprocess_translations(translation_map):
-    print("正在预处理所有汉化候选项的简繁类型...")
-    count = 0
-    for mod_id, data in translation_map.items():
-        candidates = data.get("translations", [])
+def ensure_ranked(mod_data):
+    """
+    match.py 生成的对照表已包含按语言偏好排好序的推荐汉化 (best)
+    旧版对照表缺少时，在这里补上简繁标记和推荐列表
+    """
+    if 'best' not in mod_data:
+        candidates = mod_data.get("translations", [])
         for cand in candidates:
-            cand['lang_type'] = detect_language_type(cand.get('title', ''))
-            count += 1
-    print(f"预处理完成，已标记 {count} 个候选项。")
-    return translation_map
-
-def parse_version_tiers():
-    parsed = []
-    sorted_items = sorted(GAME_VERSION_TIERS.items(), key=lambda x: x[1])
-    for idx, (ver_name, date_str) in enumerate(sorted_items):
-        try:
-            dt = datetime.strptime(date_str, "%Y-%m-%d")
-            ts = dt.timestamp()
-            parsed.append((ts, ver_name, idx + 1))
-        except ValueError:
-            pass
-    return sorted(parsed, key=lambda x: x[0], reverse=True)
-
-SORTED_VERSION_TIERS = parse_version_tiers()
-
-def get_mod_tier_info(updated_timestamp):
-    for ts, ver_name, tier_level in SORTED_VERSION_TIERS:
-        if updated_timestamp >= ts: return tier_level, ver_name
-    return 0, "Old"
-
-def calculate_sort_score(candidate):
-    subs = candidate.get('subs', 0)
-    updated = candidate.get('updated', 0)
-    tier_level, _ = get_mod_tier_info(updated)
-    return (tier_level, (updated / 86400.0) + (math.log10(max(1, subs)) * WEIGHT_LOG_SUBS))
-
-def select_best_translation(candidates):
-    if not candidates: return None
-    return sorted(candidates, key=calculate_sort_score, reverse=True)[0]
+            if 'lang_type' not in cand:
+                cand['lang_type'] = detect_language_type(cand.get('title', ''))
+        mod_data['best'] = rank_translations(candidates)
+    return mod_data
 
 def get_current_subscribed_ids(steam):
     """获取当前所有已订阅的Item ID集合"""
@@ -125,52 +122,192 @@ def get_current_subscribed_ids(steam):
     items = steam.Workshop.GetSubscribedItems(count)
     return set(str(item) for item in items)
 
-def main():
-    # 获取语言偏好设置
-    global LANGUAGE_PREFERENCE
-    LANGUAGE_PREFERENCE = get_language_preference()
-    
-    print(f"语言偏好已设置为: {'简体中文' if LANGUAGE_PREFERENCE == 'simplified' else '繁体中文'}")
-    
-    try:
-        steam = STEAMWORKS()
-        steam.initialize()
-    except Exception as e:
-        print(f"Steam 初始化失败: {e}")
-        return
+class SubscriptionConfirmer:
+    """
+    订阅调度与确认器
+    按批发送订阅请求，同时等待确认的请求数不超过 max_in_flight；批大小随确认情况自动调整
+    (每批全部确认后加 1，出现失败或超时减半)，避免一次性发出几百个请求卡住 Steam 客户端
+    订阅回调直接给出每个项目的结果；迟迟没有回调的项目继续等待，同时定期查询订阅状态
+    (Steam 变慢时回调会晚到，此时重发只会加倍请求量)；晚到的成功回调即使项目已重新排队也照样确认
+    只有回调明确返回失败、或超过 resend_timeout 仍无任何结果时才按指数退避重新排队，
+    直到全部确认或长时间没有进展
+    """
+    def __init__(self, steam, titles, timeout=CONFIRM_TIMEOUT, max_retries=MAX_SUBSCRIBE_RETRIES,
+                 retry_delay=RETRY_BASE_DELAY, state_check_delay=STATE_CHECK_DELAY,
+                 resend_timeout=RESEND_TIMEOUT, poll_interval=CALLBACK_POLL_INTERVAL, batch_size=SUBSCRIBE_BATCH_SIZE,
+                 max_batch_size=MAX_BATCH_SIZE, max_in_flight=MAX_IN_FLIGHT, batch_interval=BATCH_INTERVAL):
+        self.steam = steam
+        self.titles = titles
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.state_check_delay = state_check_delay
+        self.resend_timeout = resend_timeout
+        self.poll_interval = poll_interval
+        self.batch_size = float(batch_size)
+        self.max_batch_size = max_batch_size
+        self.max_in_flight = max_in_flight
+        self.batch_interval = batch_interval
+        # 项目ID -> 状态: queued (排队/等待重试) / pending (已发送，等待结果) / confirmed / failed
+        self.items = {
+            item_id: {'status': 'queued', 'attempts': 0, 'sent_at': 0.0, 'checked_at': 0.0, 'next_try': 0.0,
+                      'batch': 0, 'last_result': None}
+            for item_id in titles
+        }
+        self.in_flight = 0
+        self.batches_sent = 0
+        self.last_decrease_batch = 0   # 上次减半时已发出的批数，此前发出的请求再失败不再重复减半
+        self.last_progress = time.monotonic()
+        self.steam.Workshop.SetItemSubscribedCallback(self._on_subscribed)
+
+    def _on_subscribed(self, result):
+        item_id = str(getattr(result, 'publishedFileId', ''))
+        entry = self.items.get(item_id)
+        if entry is None or entry['status'] == 'confirmed':
+            return
+        code = getattr(result, 'result', None)
+        if code == K_ERESULT_OK:
+            # 之前的请求晚到的成功回调 (项目可能已重新排队或已判定失败) 同样算确认
+            entry['last_result'] = code
+            self._confirm(item_id)
+        elif entry['status'] == 'pending':
+            entry['last_result'] = code
+            self._schedule_retry(item_id, f"订阅回调返回错误码 {code}")
+
+    def _confirm(self, item_id, via=''):
+        entry = self.items[item_id]
+        if entry['status'] == 'pending':
+            self.in_flight -= 1
+        entry['status'] = 'confirmed'
+        self.last_progress = time.monotonic()
+        # 加性增: 一整批都确认后批大小加 1
+        self.batch_size = min(self.max_batch_size, self.batch_size + 1.0 / self.batch_size)
+        print(f"  [确认] {item_id} ({self.titles[item_id]}){via}")
+
+    def _schedule_retry(self, item_id, reason):
+        entry = self.items[item_id]
+        if entry['status'] == 'pending':
+            self.in_flight -= 1
+        self.last_progress = time.monotonic()
+        # 乘性减: Steam 处理不过来时立即放慢；同一轮 (上次减半前发出的批) 的多个失败只减半一次
+        if entry['batch'] > self.last_decrease_batch:
+            self.batch_size = max(1.0, self.batch_size / 2)
+            self.last_decrease_batch = self.batches_sent
+        if entry['attempts'] > self.max_retries:
+            entry['status'] = 'failed'
+            print(f"  [失败] {item_id} ({self.titles[item_id]}): {reason}，已达到最大重试次数")
+            return
+        delay = self.retry_delay * (2 ** (entry['attempts'] - 1))
+        entry['status'] = 'queued'
+        entry['next_try'] = time.monotonic() + delay
+        print(f"  [重试] {item_id} ({self.titles[item_id]}): {reason}，{delay:.1f} 秒后重试")
+
+    def _send(self, item_id):
+        entry = self.items[item_id]
+        entry['attempts'] += 1
+        entry['status'] = 'pending'
+        entry['sent_at'] = entry['checked_at'] = time.monotonic()
+        entry['batch'] = self.batches_sent
+        self.in_flight += 1
+        try:
+            self.steam.Workshop.SubscribeItem(int(item_id))
+        except Exception as e:
+            self._schedule_retry(item_id, f"请求发送失败: {e}")
+
+    def _dispatch_batch(self, now):
+        """发送一批到期的排队项目，返回发送数量"""
+        room = min(int(self.batch_size), self.max_in_flight - self.in_flight)
+        if room <= 0:
+            return 0
+        batch = [item_id for item_id, entry in self.items.items()
+                 if entry['status'] == 'queued' and now >= entry['next_try']][:room]
+        if batch:
+            self.batches_sent += 1
+        for item_id in batch:
+            self._send(item_id)
+        return len(batch)
+
+    def _is_subscribed(self, item_id):
+        try:
+            return bool(self.steam.Workshop.GetItemState(int(item_id)) & K_EITEM_STATE_SUBSCRIBED)
+        except Exception:
+            return False
+
+    def _check_overdue(self, now):
+        """
+        只查询已发出请求但迟迟没有回调的项目 (每个项目每 state_check_delay 秒最多查询一次)
+        状态未变时继续等待回调，超过 resend_timeout 才重新排队
+        """
+        for item_id, entry in self.items.items():
+            if entry['status'] != 'pending' or now - entry['checked_at'] < self.state_check_delay:
+                continue
+            entry['checked_at'] = now
+            if self._is_subscribed(item_id):
+                self._confirm(item_id, ' (状态查询)')
+            elif now - entry['sent_at'] >= self.resend_timeout:
+                self._schedule_retry(item_id, f"{self.resend_timeout:.0f} 秒内没有收到订阅回调")
+
+    def outstanding(self):
+        return [item_id for item_id, entry in self.items.items() if entry['status'] in ('pending', 'queued')]
+
+    def ids_with_status(self, status):
+        return {item_id for item_id, entry in self.items.items() if entry['status'] == status}
+
+    def run(self):
+        """发送全部订阅请求并等待确认，返回 (已确认ID集合, 未成功ID集合)"""
+        next_batch_at = 0.0
+        self.last_progress = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now >= next_batch_at and self._dispatch_batch(now):
+                next_batch_at = now + self.batch_interval
 
-    if not steam.Apps.IsSubscribedApp(GAME_APP_ID):
-        print(f"检测到你并未拥有 AppID: {GAME_APP_ID}")
-        return
+            self.steam.run_callbacks()
+            self._check_overdue(time.monotonic())
 
-    print(f"Steam API 连接成功，正在为 AppID {GAME_APP_ID} 处理汉化...")
-    
-    if DRY_RUN:
-        print("=" * 50 + "\n[测试模式] 仅模拟，不执行订阅\n" + "=" * 50)
+            if not self.outstanding() or time.monotonic() - self.last_progress >= self.timeout:
+                break
+            time.sleep(self.poll_interval)
 
-    raw_map = load_translations(JSON_FILE_PATH)
-    translation_map = preprocess_translations(raw_map)
-    
-    target_types = {'both'} 
-    if LANGUAGE_PREFERENCE == 'simplified': target_types.add('simplified')
-    elif LANGUAGE_PREFERENCE == 'traditional': target_types.add('traditional')
-    
-    # 1. 获取初始订阅列表
-    print("正在获取初始订阅列表...")
-    initial_subscribed_set = get_current_subscribed_ids(steam)
-    print(f"当前已订阅 {len(initial_subscribed_set)} 个 Mod。")
+        # 长时间没有进展而停止时，未确认的项目最后再查一次状态
+        for item_id in self.outstanding():
+            if self._is_subscribed(item_id):
+                self.items[item_id]['status'] = 'confirmed'
+            else:
+                self.items[item_id]['status'] = 'failed'
+        return self.ids_with_status('confirmed'), self.ids_with_status('failed')
 
-    # 2. 筛选出所有需要订阅的目标
+def load_dependency_graph(filepath=DEPGRAPH_FILE_PATH):
+    """读取依赖关系图，不存在或损坏时返回 None"""
+    if not filepath or not os.path.exists(filepath):
+        return None
+    try:
+        return DependencyGraph.load(filepath)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"依赖关系图不可用，只处理已订阅的Mod: {e}")
+        return None
+
+def plan_subscriptions(translation_map, subscribed_ids, language_preference, graph=None, report=True):
+    """
+    为已订阅的原版Mod挑选最佳汉化，返回需要新订阅的 [{'id', 'title', 'origin'}]
+    提供依赖关系图时，一次遍历求出与已订阅Mod相关的全部汉化包 (含合集汉化和附加汉化):
+    已订阅其中任一汉化的Mod不再挑选；依赖未订阅原版的汉化跳过，改用下一个候选；
+    已订阅Mod依赖、但没有订阅的Mod只报告，不为它们挑选汉化 (它们并没有安装)
+    report: 是否打印上述跳过和缺失的依赖
+    """
     pending_subscriptions = [] # 存储详细信息用于展示
     
     # [新增] 用于去重的集合，防止同一个汉化合集因为对应多个原Mod而被重复添加
     planned_subs_set = set()   
 
-    print("正在筛选最佳汉化...")
-    
-    for mod_id in list(initial_subscribed_set):
-        if mod_id in translation_map:
-            mod_data = translation_map[mod_id]
+    related, missing = graph.relevant_translations(subscribed_ids) if graph is not None else ({}, {})
+    covered = 0
+    blocked = {}
+
+    for mod_id in list(subscribed_ids):
+        mod_data = translation_map.get(mod_id)
+        if mod_data is not None:
+            mod_data = ensure_ranked(mod_data)
             
             # --- 检查原Mod是否本身就是翻译Mod ---
             original_tags = [t.lower() for t in mod_data.get("tags", [])]
@@ -178,16 +315,22 @@ def main():
                 continue
             # ----------------------------------
 
-            candidates = mod_data.get("translations", [])
-            
-            if not candidates: continue
+            # 已经订阅了依赖该Mod的汉化 (不一定是推荐的那个，例如合集汉化) -> 跳过
+            if any(trans_id in subscribed_ids for trans_id in related.get(mod_id, ())):
+                covered += 1
+                continue
 
-            filtered_candidates = [c for c in candidates if c['lang_type'] in target_types]
-            if LANGUAGE_PREFERENCE == 'traditional' and not filtered_candidates:
-                filtered_candidates = [c for c in candidates if c['lang_type'] == 'simplified']
-            
-            best = select_best_translation(filtered_candidates)
-            if not best: continue
+            # 推荐列表已按语言偏好排好序 (繁体缺失时已回退到简体)，第一个可用的即最佳
+            ranked = mod_data["best"].get(language_preference)
+            if not ranked: continue
+            best = None
+            for cand in ranked:
+                unmet = graph.unmet_dependencies(cand['id'], subscribed_ids) if graph is not None else []
+                if not unmet:
+                    best = cand
+                    break
+                blocked.setdefault(str(cand['id']), unmet)
+            if best is None: continue
             
             trans_id = str(best['id'])
             trans_title = best.get('title', 'Unknown')
@@ -195,7 +338,7 @@ def main():
             # 逻辑: 
             # 1. 如果这个汉化ID已经在 Steam 订阅了 -> 跳过
             # 2. 如果这个汉化ID已经在本次计划列表里了 -> 跳过 (去重关键)
-            if trans_id in initial_subscribed_set:
+            if trans_id in subscribed_ids:
                 continue
             
             if trans_id in planned_subs_set:
@@ -210,6 +353,104 @@ def main():
             })
             planned_subs_set.add(trans_id)
 
+    if report and graph is not None:
+        if covered:
+            print(f"根据依赖关系图，{covered} 个Mod已订阅了其他汉化 (如合集汉化)，不再挑选。")
+        if blocked:
+            print(f"跳过 {len(blocked)} 个依赖未订阅Mod的汉化，例如 {next(iter(blocked))} 依赖 {', '.join(next(iter(blocked.values())))}")
+        if missing:
+            example, dependents = next(iter(missing.items()))
+            print(f"已订阅的Mod依赖 {len(missing)} 个未订阅的Mod (不为它们挑选汉化)，例如 {example} (被 {dependents[0]} 依赖)")
+    return pending_subscriptions
+
+def request_plan(server_url, subscribed_ids, language_preference):
+    """请求 translation_service.py 挑选汉化，返回与 plan_subscriptions 相同的列表；失败时返回 None"""
+    payload = json.dumps({'subscribed': sorted(subscribed_ids), 'lang': language_preference}).encode('utf-8')
+    request = urllib.request.Request(server_url.rstrip('/') + '/plan', data=payload,
+                                     headers={'Content-Type': 'application/json'}, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=SERVICE_TIMEOUT) as response:
+            return json.loads(response.read())['translations']
+    except (urllib.error.URLError, OSError, ValueError, KeyError) as e:
+        print(f"汉化对照表服务不可用 ({e})，改为读取本地对照表。")
+        return None
+
+def collect_refresh_ids(translation_map, subscribed_ids, graph=None):
+    """已订阅的Mod和它们的全部候选汉化的ID (提供依赖关系图时还包括依赖它们的全部汉化包)，用于定向刷新"""
+    refresh_ids = set(subscribed_ids)
+    for mod_id in subscribed_ids:
+        mod_data = translation_map.get(mod_id)
+        if mod_data is not None:
+            refresh_ids.update(str(cand['id']) for cand in mod_data.get("translations", []))
+    if graph is not None:
+        related, _ = graph.relevant_translations(subscribed_ids)
+        for translation_ids in related.values():
+            refresh_ids.update(translation_ids)
+    return sorted(refresh_ids, key=int)
+
+def export_refresh_ids(steam, filepath):
+    """把需要定向刷新的ID写入文件 (每行一个)"""
+    translation_map = load_translations(JSON_FILE_PATH)
+    subscribed_ids = get_current_subscribed_ids(steam)
+    refresh_ids = collect_refresh_ids(translation_map, subscribed_ids, load_dependency_graph())
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(refresh_ids) + '\n')
+    print(f"已导出 {len(refresh_ids)} 个ID (已订阅 {len(subscribed_ids)} 个) 到 {filepath}")
+    print(f"运行 python scrap.py --refresh {filepath} 即可只刷新这些条目。")
+
+def main():
+    args = parse_args()
+    if args.profile:
+        profiler.enable(args.profile)
+
+    # 获取语言偏好设置 (只导出ID时不需要)
+    global LANGUAGE_PREFERENCE
+    if not args.export_ids:
+        LANGUAGE_PREFERENCE = get_language_preference(args.lang)
+        print(f"语言偏好已设置为: {'简体中文' if LANGUAGE_PREFERENCE == 'simplified' else '繁体中文'}")
+    
+    STEAMWORKS = load_steamworks()
+    try:
+        with profiler.stage('steam_init'):
+            steam = STEAMWORKS()
+            steam.initialize()
+    except Exception as e:
+        print(f"Steam 初始化失败: {e}")
+        return
+
+    if not steam.Apps.IsSubscribedApp(GAME_APP_ID):
+        print(f"检测到你并未拥有 AppID: {GAME_APP_ID}")
+        return
+
+    if args.export_ids:
+        export_refresh_ids(steam, args.export_ids)
+        return
+
+    print(f"Steam API 连接成功，正在为 AppID {GAME_APP_ID} 处理汉化...")
+    
+    if DRY_RUN:
+        print("=" * 50 + "\n[测试模式] 仅模拟，不执行订阅\n" + "=" * 50)
+
+    # 1. 获取初始订阅列表
+    print("正在获取初始订阅列表...")
+    with profiler.stage('subscribed_ids'):
+        initial_subscribed_set = get_current_subscribed_ids(steam)
+    print(f"当前已订阅 {len(initial_subscribed_set)} 个 Mod。")
+
+    # 2. 筛选出所有需要订阅的目标
+    print("正在筛选最佳汉化...")
+    pending_subscriptions = None
+    if args.server:
+        with profiler.stage('request_plan'):
+            pending_subscriptions = request_plan(args.server, initial_subscribed_set, LANGUAGE_PREFERENCE)
+    if pending_subscriptions is None:
+        with profiler.stage('load_translations'):
+            translation_map = load_translations(JSON_FILE_PATH)
+        with profiler.stage('load_graph'):
+            graph = load_dependency_graph()
+        with profiler.stage('plan'):
+            pending_subscriptions = plan_subscriptions(translation_map, initial_subscribed_set, LANGUAGE_PREFERENCE, graph)
+
     if not pending_subscriptions:
         print("没有发现需要新订阅的汉化。")
         input("回车结束...")
@@ -227,56 +468,19 @@ def main():
 
     # ================= 实际执行阶段 =================
     
-    # 步骤 A: 第一次全量发送订阅请求
-    print("\n>>> 开始批量发送订阅请求...")
-    # target_ids 现在直接等于 planned_subs_set，因为我们已经去重过了
-    target_ids = planned_subs_set 
-    
-    for item in pending_subscriptions:
-        tid = item['id']
-        print(f"发送订阅请求: {tid} ({item['title']})")
-        try:
-            steam.Workshop.SetItemSubscribedCallback(lambda result: print(f"订阅结果: {result}"))
-            steam.Workshop.SubscribeItem(int(tid))
-        except Exception as e:
-            print(f"  请求发送失败: {e}")
-    
-    print("\n>>> 请求发送完毕，开始循环验证...")
-
-    # 步骤 B: 循环检测与补漏
-    cycle = 0
-    all_success = False
-
-    while cycle < MAX_VERIFY_CYCLES:
-        print(f"等待 {VERIFY_INTERVAL} 秒以让 Steam 处理...", end="", flush=True)
-        time.sleep(VERIFY_INTERVAL)
-        print(" 正在刷新订阅列表...")
-
-        current_subs = get_current_subscribed_ids(steam)
-        missing_ids = target_ids - current_subs
-        
-        if not missing_ids:
-            print("\n[成功] 所有目标汉化均已检测到订阅生效！")
-            all_success = True
-            break
-        
-        cycle += 1
-        print(f"[{cycle}/{MAX_VERIFY_CYCLES}] 仍有 {len(missing_ids)} 个项目未生效。正在重试这些项目...")
-        
-        for tid in missing_ids:
-            # 查找标题用于显示
-            title = next((x['title'] for x in pending_subscriptions if x['id'] == tid), "Unknown")
-            print(f"  -> 重试订阅: {tid} ({title})")
-            steam.Workshop.SetItemSubscribedCallback(lambda result: print(f"订阅结果: {result}"))
-            steam.Workshop.SubscribeItem(int(tid))
-    
+    print("\n>>> 开始批量发送订阅请求，并等待 Steam 确认...")
+    titles = {item['id']: item['title'] for item in pending_subscriptions}
+    confirmer = SubscriptionConfirmer(steam, titles)
+    with profiler.stage('subscribe'):
+        confirmed, failed = confirmer.run()
+
     print("-" * 30)
-    if all_success:
-        print(f"处理完成。成功添加了 {len(target_ids)} 个订阅。")
+    if not failed:
+        print(f"处理完成。成功添加了 {len(confirmed)} 个订阅。")
     else:
-        remaining = target_ids - get_current_subscribed_ids(steam)
-        print(f"处理结束，但有 {len(remaining)} 个项目似乎未能订阅成功。")
-        print(f"失败ID: {remaining}")
+        print(f"处理结束，成功 {len(confirmed)} 个，但有 {len(failed)} 个项目未能订阅成功。")
+        for tid in sorted(failed):
+            print(f"  失败: {tid} ({titles[tid]})")
 
     print("请在 Steam 下载页面检查下载队列。")
 
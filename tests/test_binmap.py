@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+import match
+import subscribe
+from benchmark import clean_items, generate_dataset
+from binmap import BinaryTranslationMap, write_binary_map
+from item_table import ItemTable
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    items = clean_items(generate_dataset(3000))
+    ref_map = ItemTable()
+    relations = match.build_relations(items, ref_map)
+    translation_map = {parent_id: match.build_parent_entry(parent_id, ref_map, list(translations.values()))
+                       for parent_id, translations in relations.items()}
+    return items, translation_map
+
+
+def test_round_trip(dataset, tmp_path):
+    _, translation_map = dataset
+    path = str(tmp_path / 'translation_map.bin')
+    write_binary_map(path, translation_map)
+
+    with BinaryTranslationMap(path) as binary_map:
+        assert len(binary_map) == len(translation_map)
+        assert list(binary_map.keys()) == sorted(translation_map, key=int)
+        for mod_id, entry in translation_map.items():
+            assert mod_id in binary_map
+            assert binary_map[mod_id] == entry
+        assert '1' not in binary_map
+        assert binary_map.get('not-a-number') is None
+        with pytest.raises(KeyError):
+            binary_map['1']
+
+
+def test_empty_map(tmp_path):
+    path = str(tmp_path / 'empty.bin')
+    write_binary_map(path, {})
+    with BinaryTranslationMap(path) as binary_map:
+        assert len(binary_map) == 0
+        assert list(binary_map) == []
+        assert binary_map.get('123') is None
+
+
+def test_non_numeric_ids_are_skipped(tmp_path, capsys):
+    path = str(tmp_path / 'translation_map.bin')
+    write_binary_map(path, {'None': {'name': 'broken'}, '42': {'name': 'ok'}})
+    assert 'None' in capsys.readouterr().out
+    with BinaryTranslationMap(path) as binary_map:
+        assert list(binary_map.keys()) == ['42']
+        assert binary_map['42'] == {'name': 'ok'}
+
+
+def test_plan_same_for_json_and_binary_map(dataset, tmp_path):
+    items, translation_map = dataset
+    originals = [item['publishedfileid'] for item in items if 'Translation' not in item['tags']]
+    subscribed = set(random.Random(1).sample(originals, 500))
+    path = str(tmp_path / 'translation_map.bin')
+    write_binary_map(path, translation_map)
+
+    for preference in ('simplified', 'traditional'):
+        planned = subscribe.plan_subscriptions(translation_map, subscribed, preference)
+        with BinaryTranslationMap(path) as binary_map:
+            assert subscribe.plan_subscriptions(binary_map, subscribed, preference) == planned
+        assert planned
+        assert all(item['id'] not in subscribed and item['origin'] in subscribed for item in planned)
+        assert len({item['id'] for item in planned}) == len(planned)
@@ -0,0 +1,58 @@
+from depgraph import DependencyGraph
+
+# 原版: 1 依赖框架 2，2 依赖 3 (未安装)；汉化: 10 -> 1，11 (合集) -> 1 + 4，12 (附加汉化) -> 10，13 -> 2 + 5 (未安装)
+EDGES = [('1', ['2']), ('2', ['3']), ('4', []), ('10', ['1']), ('11', ['1', '4']), ('12', ['10']), ('13', ['2', '5'])]
+TRANSLATIONS = {'10', '11', '12', '13'}
+
+
+def make_graph():
+    return DependencyGraph.build(EDGES, TRANSLATIONS)
+
+
+def test_relevant_translations_in_one_traversal():
+    translations, missing = make_graph().relevant_translations({'1', '2', '4', '10'})
+    assert {mod_id: sorted(ids) for mod_id, ids in translations.items()} == {
+        '1': ['10', '11', '12'],
+        '2': ['13'],
+        '4': ['11'],
+    }
+    # 未安装的依赖只报告；汉化包依赖的未安装原版 (5) 不算已安装Mod缺失的依赖
+    assert missing == {'3': ['2']}
+
+
+def test_relevant_translations_skip_uninstalled_dependencies():
+    translations, missing = make_graph().relevant_translations({'1'})
+    assert sorted(translations) == ['1']
+    assert missing == {'2': ['1']}
+
+
+def test_unmet_dependencies_ignore_translations():
+    graph = make_graph()
+    assert graph.unmet_dependencies('11', {'1'}) == ['4']
+    assert graph.unmet_dependencies('12', {'1'}) == []
+    assert graph.unmet_dependencies('unknown', {'1'}) == []
+
+
+def test_dependency_closure_stops_at_translations():
+    graph = make_graph()
+    assert graph.dependency_closure({'1'}) == {'1', '2', '3'}
+    # 汉化包依赖的原版不因此被视为已加载；图中没有的ID原样保留
+    assert graph.dependency_closure({'13', 'unknown'}) == {'13', 'unknown'}
+
+
+def test_find_cycles():
+    graph = DependencyGraph.build([('1', ['2']), ('2', ['3']), ('3', ['1']), ('4', ['4']), ('5', ['1']), ('6', [])])
+    cycles = sorted(sorted(cycle) for cycle in graph.find_cycles())
+    assert cycles == [['1', '2', '3'], ['4']]
+    assert make_graph().find_cycles() == []
+
+
+def test_reverse_edges_and_save_load(tmp_path):
+    graph = make_graph()
+    assert sorted(graph.ids[i] for i in graph.dependents(graph.index['1'])) == ['10', '11']
+    path = str(tmp_path / 'graph.json')
+    graph.save(path)
+    loaded = DependencyGraph.load(path)
+    assert loaded.ids == graph.ids
+    assert loaded.edge_count == graph.edge_count
+    assert loaded.relevant_translations({'1', '2', '4', '10'}) == graph.relevant_translations({'1', '2', '4', '10'})
@@ -0,0 +1,49 @@
+import random
+
+import item_table
+from item_table import ItemTable
+
+
+def test_matches_dict_model_through_adds_removes_and_readds(monkeypatch):
+    # 调小阈值，让归并和清理在小数据量下也频繁发生
+    monkeypatch.setattr(item_table, 'MIN_PENDING', 8)
+    rng = random.Random(7)
+    table = ItemTable()
+    model = {}
+    for step in range(5000):
+        item_id = str(rng.randrange(1, 2000)) if rng.random() < 0.97 else f"x{rng.randrange(20)}"
+        if rng.random() < 0.25:
+            table.remove(item_id)
+            model.pop(item_id, None)
+        else:
+            tags = ['Mod', 'Translation'] if rng.random() < 0.3 else ['Mod']
+            deps = [str(rng.randrange(1, 2000)) for _ in range(rng.randrange(3))]
+            table.add(item_id, f"title {item_id} {step}", step, tags, deps)
+            model[item_id] = (f"title {item_id} {step}", step, tags, deps)
+
+    assert len(table) == len(model)
+    assert sorted(table) == sorted(model)
+    for item_id in [str(i) for i in range(2000)] + [f"x{i}" for i in range(20)]:
+        expected = model.get(item_id)
+        assert (item_id in table) == (expected is not None)
+        assert table.updated_of(item_id) == (expected[1] if expected else None)
+        if expected:
+            assert table.get(item_id) == {'title': expected[0], 'updated': expected[1], 'tags': expected[2]}
+            assert table.is_translation(item_id) == ('Translation' in expected[2])
+    assert dict(table.iter_deps()) == {item_id: deps for item_id, (_, _, _, deps) in model.items() if deps}
+
+
+def test_state_round_trip_keeps_pruned_details():
+    table = ItemTable()
+    table.add('30', 'Original', 3, ['Mod'])
+    table.add('10', 'Translation 汉化', 1, ['Translation'], ['30'])
+    table.add('0042', 'Odd id', 2, [], ['30', 'abc'])
+    table.prune_details({'30'})
+
+    restored = ItemTable.from_state(table.to_state())
+    assert list(restored) == ['30', '10', '0042']
+    assert restored.get('30') == {'title': 'Original', 'updated': 3, 'tags': ['Mod']}
+    assert restored.get('10') is None and restored.has_detail('10') is False
+    assert restored.updated_of('10') == 1
+    assert list(restored.iter_originals()) == [('30', 'Original'), ('0042', None)]
+    assert dict(restored.iter_deps()) == {'10': ['30'], '0042': ['30']}
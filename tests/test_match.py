@@ -0,0 +1,143 @@
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import match
+from benchmark import generate_dataset, clean_items
+from workshop_store import WorkshopStore
+
+ITEM_COUNT = 3000
+ORPHAN_RATIO = 0.2
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.setattr(match, 'INPUT_FOLDER', str(tmp_path))
+    monkeypatch.setattr(match, 'INPUT_DB', str(tmp_path / 'workshop.db'))
+    monkeypatch.setattr(match, 'OUTPUT_FILE', str(tmp_path / 'translation_map.json'))
+    monkeypatch.setattr(match, 'STATE_FILE', str(tmp_path / 'match_state.json'))
+    monkeypatch.setattr(match, 'DEPGRAPH_FILE', str(tmp_path / 'dependency_graph.json'))
+    monkeypatch.setattr(match, 'BINARY_OUTPUT_FILE', None)
+    return tmp_path
+
+
+def make_items(seed):
+    """合成条目，其中一部分汉化包去掉依赖 (需要按标题匹配)"""
+    rng = random.Random(seed)
+    items = clean_items(generate_dataset(ITEM_COUNT, 0.3, seed))
+    for item in items:
+        if 'Translation' in item['tags'] and len(item['children']) == 1 and rng.random() < ORPHAN_RATIO:
+            item['children'] = []
+    return items
+
+
+def mutate(items, seed):
+    """删除、更新 (含改标题) 和新增条目，覆盖按标题匹配受影响的各种情况，返回 (新增或更新的条目, 删除的ID)"""
+    rng = random.Random(seed)
+    by_id = {item['publishedfileid']: item for item in items}
+    originals = [item for item in items if 'Translation' not in item['tags']]
+    orphans = [item for item in items if 'Translation' in item['tags'] and not item['children']]
+
+    # 删除按标题匹配到的原版 (汉化包标题以原版标题开头)，以及随机条目
+    titles = {item['title']: item['publishedfileid'] for item in originals}
+    matched_parents = [titles[orphan['title'].rsplit(' ', 1)[0]] for orphan in orphans
+                       if orphan['title'].rsplit(' ', 1)[0] in titles]
+    deleted = set(rng.sample(matched_parents, 30)) | set(rng.sample(sorted(by_id), 70))
+
+    changed = []
+    for item in rng.sample([item for item in items if item['publishedfileid'] not in deleted], 200):
+        item = dict(item, time_updated=item['time_updated'] + 1)
+        if 'Translation' not in item['tags'] and rng.random() < 0.5:
+            item['title'] += ' Continued'
+        elif item['children'] and rng.random() < 0.3:
+            item['children'] = []
+        changed.append(item)
+
+    # 新的原版: 与之前没有匹配到原版的汉化包标题相近
+    next_id = max(int(item_id) for item_id in by_id) + 1
+    for orphan in rng.sample(orphans, 20):
+        name = orphan['title'].rsplit(' ', 1)[0]
+        changed.append(dict(orphan, publishedfileid=str(next_id), title=f"{name} Reborn", tags=['Mod', '1.5'],
+                            children=[]))
+        next_id += 1
+    return changed, sorted(deleted)
+
+
+def normalized_map(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        translation_map = json.load(f)
+    return {
+        parent_id: {
+            'title': entry['title'],
+            'updated': entry['updated'],
+            'tags': entry['tags'],
+            'translations': {trans['id']: trans for trans in entry['translations']},
+            'best': {lang: [trans['id'] for trans in ranked] for lang, ranked in entry['best'].items()},
+        }
+        for parent_id, entry in translation_map.items()
+    }
+
+
+def write_source(source, items, changed=(), deleted=()):
+    """把条目写入数据库或 JSON 分块文件 (与 scrap.py 的两种输出一致)"""
+    if source == 'db':
+        with WorkshopStore(match.INPUT_DB) as store:
+            store.delete_items(deleted)
+            store.upsert_items(list(changed) or items)
+        return
+    current = {item['publishedfileid']: item for item in items}
+    for item_id in deleted:
+        current.pop(item_id, None)
+    current.update((item['publishedfileid'], item) for item in changed)
+    with open(f"{match.INPUT_FOLDER}/workshop_data_1.json", 'w', encoding='utf-8') as f:
+        json.dump(list(current.values()), f, ensure_ascii=False)
+
+
+@pytest.mark.parametrize('source', ['db', 'json'])
+@pytest.mark.parametrize('detail_only', [False, True])
+def test_incremental_matches_full_rebuild(workspace, monkeypatch, source, detail_only):
+    monkeypatch.setattr(match, 'PARENT_DETAIL_ONLY', detail_only)
+    items = make_items(seed=7)
+    write_source(source, items)
+    match.main(workers=1, full=True)
+
+    changed, deleted = mutate(items, seed=8)
+    write_source(source, items, changed, deleted)
+    match.main(workers=1)
+    incremental = normalized_map(match.OUTPUT_FILE)
+
+    match.main(workers=1, full=True)
+    full = normalized_map(match.OUTPUT_FILE)
+
+    title_linked = [trans for entry in full.values() for trans in entry['translations'].values()
+                    if trans.get('matched_by') == 'title']
+    assert title_linked
+    assert incremental.keys() == full.keys()
+    assert incremental == full
+
+
+
+def test_load_all_files_bounds_in_flight_files(tmp_path, monkeypatch):
+    submitted = []
+
+    class CountingExecutor(ThreadPoolExecutor):
+        def submit(self, fn, *args):
+            submitted.append(args[0])
+            return super().submit(fn, *args)
+
+    monkeypatch.setattr(match, 'ProcessPoolExecutor', CountingExecutor)
+    paths = []
+    for i in range(20):
+        path = str(tmp_path / f"workshop_data_{i + 1}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('not json' if i == 5 else json.dumps([{'publishedfileid': str(i), 'title': f"Mod {i}"}]))
+        paths.append(path)
+
+    loaded = []
+    for file_path, items in match.load_all_files(paths, workers=2):
+        # 每取走一个结果 (含读取失败的文件) 最多再提交一个文件
+        assert len(submitted) <= paths.index(file_path) + 1 + 2 * 2
+        loaded.append((file_path, items[0]['publishedfileid']))
+    assert loaded == [(path, str(i)) for i, path in enumerate(paths) if i != 5]
@@ -0,0 +1,78 @@
+import gzip
+
+import pytest
+
+from ndjson_io import NdjsonWriter, iter_ndjson, list_parts
+
+
+def make_items(start, count):
+    return [{'publishedfileid': str(i), 'title': f"标题 {i}", 'tags': ['1.6']} for i in range(start, start + count)]
+
+
+def read_all(folder, prefix):
+    return [item for _, path in list_parts(str(folder), prefix) for item in iter_ndjson(path)]
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_round_trip_with_rotation(tmp_path, compression):
+    writer = NdjsonWriter(str(tmp_path), 'data_1', compression=compression, max_items=40)
+    items = make_items(0, 100)
+    for i in range(0, 100, 30):
+        writer.write(items[i:i + 30])
+    writer.close()
+
+    assert writer.total_items == 100
+    assert [index for index, _ in list_parts(str(tmp_path), 'data_1')] == [1, 2, 3]
+    assert read_all(tmp_path, 'data_1') == items
+
+
+def test_rotation_by_bytes(tmp_path):
+    writer = NdjsonWriter(str(tmp_path), 'data_1', max_bytes=200)
+    writer.write(make_items(0, 10))
+    writer.close()
+    assert len(writer.paths) > 1
+    assert len(read_all(tmp_path, 'data_1')) == 10
+
+
+def test_resumed_writer_continues_numbering(tmp_path):
+    first = NdjsonWriter(str(tmp_path), 'data_1', max_items=5)
+    first.write(make_items(0, 8))
+    first.close()
+    second = NdjsonWriter(str(tmp_path), 'data_1', max_items=5)
+    second.write(make_items(8, 4))
+    second.close()
+
+    assert [index for index, _ in list_parts(str(tmp_path), 'data_1')] == [1, 2, 3]
+    assert read_all(tmp_path, 'data_1') == make_items(0, 12)
+    # 其他前缀的分卷不受影响
+    NdjsonWriter(str(tmp_path), 'data_2').write(make_items(0, 1))
+    assert len(list_parts(str(tmp_path), 'data_1')) == 3
+    assert len(list_parts(str(tmp_path))) == 4
+
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    writer = NdjsonWriter(str(tmp_path), 'data_1')
+    writer.write(make_items(0, 3))
+    writer.close()
+    with open(writer.paths[0], 'ab') as f:
+        f.write(b'{"publishedfileid": "3", "tit')
+    assert read_all(tmp_path, 'data_1') == make_items(0, 3)
+
+
+def test_truncated_gzip_stream_keeps_flushed_pages(tmp_path, capsys):
+    writer = NdjsonWriter(str(tmp_path), 'data_1', compression='gzip')
+    writer.write(make_items(0, 5))
+    writer.write(make_items(5, 5))
+    # 模拟进程被强行终止: 压缩流已按页刷新，但没有写入结尾
+    writer._raw.close()
+
+    with pytest.raises(EOFError):
+        with gzip.open(writer.paths[0], 'rt', encoding='utf-8') as f:
+            f.read()
+    assert read_all(tmp_path, 'data_1') == make_items(0, 10)
+    assert '结尾不完整' in capsys.readouterr().out
+
+
+def test_unknown_compression():
+    with pytest.raises(ValueError):
+        NdjsonWriter('.', 'data', compression='bz2')
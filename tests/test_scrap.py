@@ -0,0 +1,203 @@
+import contextlib
+import io
+import os
+import signal
+
+import pytest
+
+pytest.importorskip('requests')
+import scrap
+from benchmark import MockQueryFilesServer, generate_dataset
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(scrap, 'OUTPUT_FOLDER', str(tmp_path))
+    monkeypatch.setattr(scrap, 'incomplete_chains', [])
+    scrap.temp_data.clear()
+    scrap.stop_event.clear()
+    with MockQueryFilesServer(generate_dataset(600, 0.2, 5)) as mock:
+        monkeypatch.setattr(scrap, 'QUERY_FILES_URL', mock.url)
+        monkeypatch.setattr(scrap, 'GET_DETAILS_URL', mock.details_url)
+        yield mock
+
+
+def quiet(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def test_jobs_keep_main_checkpoints_and_finish_at_page_limit(server, tmp_path):
+    # 主任务未完成的断点 (任务名与主任务、分片同名也不应互相覆盖或清理)
+    scrap.save_run_info({'run_started': 1, 'incremental': False, 'updated_since': None})
+    main_checkpoint = scrap.CrawlCheckpoint('main', {'app_id': scrap.APP_ID})
+    main_checkpoint.commit([{'publishedfileid': '1'}], 'cursor', 1, 1)
+
+    jobs = [{'name': 'main', 'app_id': scrap.APP_ID, 'required_tags': ['1.6'], 'excluded_tags': [],
+             'query_type': 1, 'max_pages': 2, 'fields': 'match'},
+            {'name': '1.4', 'app_id': scrap.APP_ID, 'required_tags': ['1.4'], 'excluded_tags': [],
+             'query_type': 1, 'max_pages': 100, 'fields': None}]
+    summaries = quiet(scrap.run_jobs, 'key', jobs, workers=2, requests_per_second=1000.0)
+
+    assert [summary['complete'] for summary in summaries] == [True, True]
+    assert summaries[0]['items'] == 200
+    # 任务的条目只写入各自的输出文件夹，不累积在全局临时数据中
+    assert scrap.temp_data == []
+    checkpoint_folder = tmp_path / scrap.CHECKPOINT_FOLDER
+    assert (checkpoint_folder / 'run.json').exists()
+    assert (checkpoint_folder / 'main.json').exists()
+    assert not (checkpoint_folder / scrap.JOBS_FOLDER / 'main').exists()
+    assert not (checkpoint_folder / scrap.JOBS_FOLDER / '1.4').exists()
+
+    # 主任务的全新爬取也不会删掉任务的断点
+    job_folder = scrap.job_checkpoint_folder('other')
+    scrap.CrawlCheckpoint('other', {}, job_folder).commit([], 'cursor', 1, 0)
+    scrap.clear_checkpoints()
+    assert not (checkpoint_folder / 'run.json').exists()
+    assert os.path.exists(os.path.join(job_folder, 'other.json'))
+
+
+def test_incomplete_crawl_keeps_watermark_and_checkpoints(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(scrap, 'response_cache', None)
+    scrap.save_run_info({'run_started': 500, 'incremental': True, 'updated_since': 100})
+    previous = {'last_run': 100, 'items': {'1': 90}}
+
+    scrap.incomplete_chains.append('1.6')
+    quiet(scrap.finish_crawl_state, previous, True, {'2': 450}, 500)
+    state = scrap.load_crawl_state()
+    assert state['last_run'] == 100
+    assert state['items'] == {'1': 90, '2': 450}
+    assert scrap.load_run_info()['run_started'] == 500
+
+    # 断点续爬完成后才推进水位线并清理断点
+    scrap.incomplete_chains.clear()
+    quiet(scrap.finish_crawl_state, state, True, {'3': 480}, 500)
+    state = scrap.load_crawl_state()
+    assert state['last_run'] == 500
+    assert state['items'] == {'1': 90, '2': 450, '3': 480}
+    assert scrap.load_run_info() is None
+
+
+class FakeResponse:
+    def __init__(self, status_code, retry_after=None):
+        self.status_code = status_code
+        self.headers = {'Retry-After': str(retry_after)} if retry_after is not None else {}
+
+
+class FakeHTTPError(Exception):
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.waits = 0
+
+    def wait(self):
+        self.waits += 1
+
+
+def test_retry_waits_for_longer_of_retry_after_and_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(scrap.time, 'sleep', sleeps.append)
+    responses = [FakeResponse(503, retry_after=0), FakeResponse(429, retry_after=30), FakeResponse(503)]
+
+    @scrap.retry_on_failure(max_retries=4, delay=8, max_delay=60)
+    def flaky():
+        if responses:
+            raise FakeHTTPError(responses.pop(0))
+        return 'ok'
+
+    limiter = CountingLimiter()
+    assert quiet(flaky, rate_limiter=limiter) == 'ok'
+    # 退避: 8、16、32 秒 (加抖动后为其一半到全部)；Retry-After: 0 不能缩短退避，30 秒长于退避时按 30 秒
+    assert 4 <= sleeps[0] <= 8
+    assert sleeps[1] == 30
+    assert 16 <= sleeps[2] <= 32
+    assert limiter.waits == 3
+
+
+def test_crawl_with_errors_and_resume(server, monkeypatch):
+    monkeypatch.setattr(scrap.time, 'sleep', lambda seconds: None)
+    server.error_rate = 0.2
+    limiter = scrap.RateLimiter(1000.0)
+    expected = sorted(str(item['publishedfileid']) for item in server.items)
+
+    first = quiet(scrap.fetch_clean_workshop_data, 'key', scrap.APP_ID, query_type=1, max_pages=3,
+                  rate_limiter=limiter, fields=scrap.FIELD_PROFILES['match'])
+    assert len(first) == 300
+    assert scrap.incomplete_chains == ['main']
+    assert set(first[0]) == set(scrap.FIELD_PROFILES['match'])
+
+    scrap.incomplete_chains.clear()
+    fetched = quiet(scrap.fetch_clean_workshop_data, 'key', scrap.APP_ID, query_type=1, max_pages=100,
+                    rate_limiter=limiter, fields=scrap.FIELD_PROFILES['match'], resume=True)
+    assert scrap.incomplete_chains == []
+    assert server.errors > 0
+    assert sorted(str(item['publishedfileid']) for item in fetched) == expected
+    assert all(isinstance(tag, str) for item in fetched for tag in item['tags'])
+
+
+def test_stream_interrupt_defers_close_to_main_thread(tmp_path, monkeypatch):
+    from ndjson_io import NdjsonWriter
+    writer = NdjsonWriter(str(tmp_path), 'data_1')
+    monkeypatch.setattr(scrap, 'stream_writer', writer)
+    scrap.stop_event.clear()
+    sink = scrap.make_stream_sink(writer, {})
+    sink([{'publishedfileid': '1', 'time_updated': 5}])
+
+    # 信号在主线程持有写入锁时到达: 不能阻塞，也不能关闭写入器
+    with scrap.stream_lock:
+        quiet(scrap.signal_handler, signal.SIGINT, None)
+    assert scrap.stop_event.is_set()
+    assert writer._stream is not None
+    sink([{'publishedfileid': '2', 'time_updated': 6}])
+
+    with pytest.raises(SystemExit):
+        quiet(scrap.signal_handler, signal.SIGINT, None)
+    writer.close()
+    scrap.stop_event.clear()
+
+
+def test_refresh_uses_lean_profile_without_full_data(server):
+    item_ids = [str(item['publishedfileid']) for item in server.items[:150]] + ['1']
+    items, missing = quiet(scrap.fetch_workshop_details, 'key', item_ids, full_data=False)
+    assert missing == ['1']
+    assert len(items) == 150
+    assert all(set(item) == set(scrap.FIELD_PROFILES['lean']) for item in items)
+
+    items, _ = quiet(scrap.fetch_workshop_details, 'key', item_ids[:5], full_data=True)
+    assert 'file_description' in items[0]
+
+
+def test_clean_item_defaults_are_not_shared():
+    fields = ['publishedfileid', 'views', 'children']
+    first = scrap.clean_workshop_item({'publishedfileid': '1'}, fields)
+    second = scrap.clean_workshop_item({'publishedfileid': '2'}, fields)
+    assert first == {'publishedfileid': '1', 'views': 0, 'children': []}
+    first['children'].append({'publishedfileid': '3'})
+    assert second['children'] == []
+
+
+def count_pages(server, func, *args, **kwargs):
+    scrap.temp_data.clear()
+    scrap.clear_checkpoints()
+    before = server.requests
+    items = quiet(func, 'key', scrap.APP_ID, *args, query_type=1, max_pages=1000, **kwargs)
+    return server.requests - before, sorted(str(item['publishedfileid']) for item in items)
+
+
+@pytest.mark.parametrize('tags', [['1.4', '1.5', '1.6'], None])
+def test_shards_do_not_overlap(server, monkeypatch, tags):
+    monkeypatch.setattr(scrap, 'SHARD_DATE_START', '2020-01-01')
+    serial_pages, serial_ids = count_pages(server, scrap.fetch_clean_workshop_data, required_tags=tags,
+                                           rate_limiter=scrap.RateLimiter(1000.0))
+    shards = scrap.build_shards(tags, 4 * scrap.SHARD_DATE_WINDOWS_PER_WORKER)
+    sharded_pages, sharded_ids = count_pages(server, scrap.fetch_sharded_workshop_data, required_tags=tags,
+                                             workers=4, requests_per_second=1000.0)
+
+    assert len(shards) > 1
+    assert sharded_ids == serial_ids
+    # 每个分片最多多出一页不满的页面
+    assert serial_pages <= sharded_pages <= serial_pages + len(shards)
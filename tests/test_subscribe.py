@@ -0,0 +1,109 @@
+import time
+
+import subscribe
+from benchmark import FakeSteamworks
+
+ITEM_COUNT = 20
+
+
+def make_titles(count=ITEM_COUNT):
+    return {str(2000000000 + i): f"汉化 {i}" for i in range(count)}
+
+
+def run_confirmer(steam, titles, **options):
+    settings = {'batch_interval': 0.0, 'poll_interval': 0.005, 'retry_delay': 0.01, 'timeout': 5.0}
+    settings.update(options)
+    started = time.monotonic()
+    confirmed, failed = subscribe.SubscriptionConfirmer(steam, titles, **settings).run()
+    return confirmed, failed, time.monotonic() - started
+
+
+def test_all_confirmed_by_callback():
+    titles = make_titles()
+    steam = FakeSteamworks(callback_latency=0.01, failure_rate=0.0)
+    confirmed, failed, _ = run_confirmer(steam, titles)
+    assert confirmed == set(titles)
+    assert not failed
+    assert steam.subscribe_calls == len(titles)
+
+
+def test_late_callback_does_not_resend():
+    # 回调晚于状态查询延迟、订阅状态也要等回调后才变化: 只能继续等待，不应重发
+    titles = make_titles()
+    steam = FakeSteamworks(callback_latency=0.3, failure_rate=0.0, instant_state=False)
+    confirmed, failed, _ = run_confirmer(steam, titles, state_check_delay=0.05, resend_timeout=5.0)
+    assert confirmed == set(titles)
+    assert not failed
+    assert steam.subscribe_calls == len(titles)
+
+
+def test_late_ok_accepted_after_requeue():
+    # 超过 resend_timeout 后项目已重新排队 (等待重试)，之前请求晚到的成功回调仍然确认
+    titles = make_titles()
+    steam = FakeSteamworks(callback_latency=0.3, failure_rate=0.0, instant_state=False)
+    confirmed, failed, elapsed = run_confirmer(steam, titles, state_check_delay=0.02, resend_timeout=0.1,
+                                               retry_delay=2.0)
+    assert confirmed == set(titles)
+    assert not failed
+    assert steam.subscribe_calls == len(titles)
+    assert elapsed < 2.0
+
+
+def test_explicit_failure_retried_until_limit():
+    titles = make_titles()
+    steam = FakeSteamworks(callback_latency=0.01, failure_rate=1.0)
+    confirmed, failed, _ = run_confirmer(steam, titles, max_retries=2)
+    assert not confirmed
+    assert failed == set(titles)
+    assert steam.subscribe_calls == len(titles) * 3
+
+
+def test_no_callback_resends_after_timeout():
+    titles = make_titles()
+    steam = FakeSteamworks(callback_latency=None, failure_rate=1.0)
+    confirmed, failed, _ = run_confirmer(steam, titles, state_check_delay=0.02, resend_timeout=0.1, max_retries=1)
+    assert not confirmed
+    assert failed == set(titles)
+    assert steam.subscribe_calls == len(titles) * 2
+
+
+def test_no_progress_stops_and_checks_state_once_more():
+    titles = make_titles()
+    steam = FakeSteamworks(callback_latency=None, failure_rate=0.0)
+    confirmed, failed, _ = run_confirmer(steam, titles, state_check_delay=10.0, resend_timeout=10.0, timeout=0.2)
+    # 没有回调，但订阅状态已变: 停止等待时的最后一次查询确认全部项目
+    assert confirmed == set(titles)
+    assert not failed
+    assert steam.subscribe_calls == len(titles)
+
+
+def test_failed_batch_halves_window_once():
+    titles = make_titles(8)
+    steam = FakeSteamworks(callback_latency=0.0, failure_rate=1.0)
+    confirmer = subscribe.SubscriptionConfirmer(steam, titles, batch_size=8, retry_delay=0.0)
+    assert confirmer._dispatch_batch(time.monotonic()) == 8
+    steam.run_callbacks()
+    assert confirmer.batch_size == 4.0
+
+    # 下一轮 (减半之后发出的批) 再失败才继续减半
+    assert confirmer._dispatch_batch(time.monotonic()) == 4
+    steam.run_callbacks()
+    assert confirmer.batch_size == 2.0
+
+
+def test_plan_uses_dependency_graph():
+    # 1 依赖 2 (已订阅) 和 3 (未订阅)；汉化 11 是覆盖 1 和 4 的合集，4 未订阅
+    graph = subscribe.DependencyGraph.build(
+        [('1', ['2', '3']), ('10', ['1']), ('11', ['1', '4']), ('20', ['2']), ('21', ['2']), ('30', ['3'])],
+        {'10', '11', '20', '21', '30'}
+    )
+
+    def entry(*ids):
+        return {'tags': [], 'best': {'simplified': [{'id': trans_id, 'title': f"汉化 {trans_id}"} for trans_id in ids]}}
+
+    translation_map = {'1': entry('11', '10'), '2': entry('20'), '3': entry('30')}
+    plan = subscribe.plan_subscriptions(translation_map, {'1', '2', '21'}, 'simplified', graph, report=False)
+    # 1: 合集 11 会连带订阅 4，改用 10；2: 已订阅了汉化 21；3: 未安装，不挑选
+    assert plan == [{'id': '10', 'title': '汉化 10', 'origin': '1'}]
+    assert subscribe.collect_refresh_ids(translation_map, {'1', '2', '21'}, graph) == \
+        ['1', '2', '10', '11', '20', '21']
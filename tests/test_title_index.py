@@ -0,0 +1,65 @@
+from title_index import TitleIndex, normalize_title, pick_match
+
+ORIGINALS = [
+    ('1', 'Dubs Bad Hygiene'),
+    ('2', 'Vanilla Expanded Framework'),
+    ('3', 'Vanilla Factions Expanded - Medieval'),
+    ('4', 'Vanilla Factions Expanded - Mechanoids'),
+    ('5', 'Hospitality'),
+]
+
+
+def make_index():
+    return TitleIndex(ORIGINALS)
+
+
+def test_normalize_strips_translation_words():
+    assert normalize_title('[CN] Dubs Bad Hygiene 简体中文汉化', strip_keywords=True) == 'dubs bad hygiene'
+    # 英文关键词需要整词匹配
+    assert normalize_title('Patchwork Translation', strip_keywords=True) == 'patchwork'
+
+
+def test_match_translation_titles():
+    index = make_index()
+    assert index.match('Dubs Bad Hygiene 简体中文')[0] == '1'
+    assert index.match('Vanilla Factions Expanded - Medieval 汉化')[0] == '3'
+    assert index.match('Hospitality Chinese Translation')[0] == '5'
+
+
+def test_no_match_for_unrelated_or_short_titles():
+    index = make_index()
+    assert index.match('Combat Extended 汉化') is None
+    # 去掉关键词后 n-gram 太少
+    assert index.query_grams('VE 汉化') == set()
+    assert index.match('VE 汉化') is None
+
+
+def test_ambiguous_titles_within_margin_are_not_matched():
+    index = TitleIndex([('1', 'Rimworld Storage Alpha'), ('2', 'Rimworld Storage Beta')])
+    candidates = index.candidates('Rimworld Storage 汉化')
+    assert [mod_id for mod_id, _ in candidates] in (['1', '2'], ['2', '1'])
+    assert abs(candidates[0][1] - candidates[1][1]) < 0.05
+    assert index.match('Rimworld Storage 汉化') is None
+
+
+def test_pick_match_threshold_and_margin():
+    assert pick_match([]) is None
+    assert pick_match([('1', 0.5)]) is None
+    assert pick_match([('1', 0.9), ('2', 0.88)]) is None
+    assert pick_match([('1', 0.9), ('2', 0.7)]) == ('1', 0.9)
+
+
+def test_common_grams_are_ignored():
+    titles = [(str(i), f"Vanilla Expanded {i}") for i in range(600)] + [('hygiene', 'Vanilla Expanded Hygiene Overhaul')]
+    index = TitleIndex(titles)
+    assert ' va' in index.common_grams
+    assert ' va' not in index.postings
+    # 共有的 "Vanilla Expanded" 不计分，只靠其余部分区分
+    assert index.match('Vanilla Expanded Hygiene Overhaul 汉化') == ('hygiene', 1.0)
+
+
+def test_similar_queries_finds_orphans_close_to_new_titles():
+    index = make_index()
+    queries = {'t1': 'Hospitality 汉化', 't2': 'Dubs Bad Hygiene 汉化', 't3': 'Save Our Ship 2 汉化'}
+    found = index.similar_queries(queries, [('6', 'Save Our Ship 2'), ('7', 'Hospitality Plus')])
+    assert found == {'t1', 't3'}
@@ -0,0 +1,65 @@
+import tracemalloc
+
+import pytest
+
+from benchmark import clean_items, generate_dataset
+from workshop_store import WorkshopStore
+
+
+@pytest.fixture(scope='module')
+def items():
+    return clean_items(generate_dataset(5000))
+
+
+@pytest.fixture
+def store(tmp_path, items):
+    with WorkshopStore(str(tmp_path / 'workshop.db')) as store:
+        for i in range(0, len(items), 700):
+            store.upsert_items(items[i:i + 700], crawled_at=1)
+        yield store
+
+
+def expected_item(item):
+    return {
+        'publishedfileid': str(item['publishedfileid']),
+        'title': item['title'],
+        'time_updated': item['time_updated'],
+        'tags': item['tags'],
+        'children': [{'publishedfileid': str(child['publishedfileid'])} for child in item['children']],
+        'subscriptions': item['subscriptions'],
+        'vote_data': {'score': item['vote_data']['score']},
+    }
+
+
+def test_iter_all_items_in_batches(store, items):
+    expected = sorted((expected_item(item) for item in items), key=lambda item: int(item['publishedfileid']))
+    for batch_size in (7, 1000, len(items), len(items) + 1):
+        assert list(store.iter_items(batch_size=batch_size)) == expected
+
+
+def test_iter_selected_items(store, items):
+    selected = [str(item['publishedfileid']) for item in items[::3]] + ['1', str(items[0]['publishedfileid'])]
+    result = list(store.iter_items(selected))
+    assert [item['publishedfileid'] for item in result] == sorted({str(item['publishedfileid']) for item in items[::3]}, key=int)
+    by_id = {str(item['publishedfileid']): item for item in items}
+    assert all(item == expected_item(by_id[item['publishedfileid']]) for item in result)
+
+
+def test_iter_reflects_writes_between_batches(store, items):
+    iterator = store.iter_items(batch_size=100)
+    first = next(iterator)
+    store.delete_items([item['publishedfileid'] for item in items])
+    # 已读出的一批照常产出，之后的批次看到删除后的数据
+    assert len([first] + list(iterator)) == 100
+
+
+def test_iter_memory_does_not_grow_with_item_count(store):
+    def peak(batch_size):
+        tracemalloc.start()
+        for _ in store.iter_items(batch_size=batch_size):
+            pass
+        result = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result
+
+    assert peak(200) * 5 < peak(10 ** 9)
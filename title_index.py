@@ -0,0 +1,138 @@
+import heapq
+import re
+from collections import Counter
+
+from classifier import KEYWORD_PATTERN
+
+# ================= 配置区域 =================
+NGRAM_SIZE = 3              # 字符 n-gram 长度
+MATCH_THRESHOLD = 0.6       # 相似度 (Dice 系数) 不低于该值才认为匹配
+MIN_MARGIN = 0.05           # 最佳候选需领先第二名至少这么多，否则视为无法确定
+MIN_QUERY_GRAMS = 4         # 去掉汉化关键词后 n-gram 太少的标题不参与匹配 (信息不足，容易误配)
+MAX_POSTING_RATIO = 0.02    # 出现在超过该比例标题中的 n-gram 视为常用词，不参与打分
+# 汉化包标题中常见、但原版标题中没有的词 (其余中文关键词由 classifier.KEYWORD_PATTERN 去除)
+STRIP_WORDS = ['translation', 'translated', 'patch', 'language', 'localization',
+               '汉化包', '漢化包', '翻译', '翻譯', '补丁', '補丁', '汉化', '漢化', '中文', '简体', '繁体', '簡體', '繁體', '简中', '繁中']
+# ===========================================
+
+# 相似度低于该值的标题既不会匹配，也不会因领先不足而阻止匹配
+CANDIDATE_SCORE = max(MATCH_THRESHOLD - MIN_MARGIN, 0.0)
+
+# 英文词需要单词边界 (避免 "patch" 误中 "Patchwork")
+STRIP_PATTERN = re.compile(
+    '|'.join(rf'\b{re.escape(word)}\b' if word.isascii() else re.escape(word)
+             for word in sorted(STRIP_WORDS, key=len, reverse=True)),
+    re.IGNORECASE
+)
+# 括号、标点等统一替换为空格
+PUNCT_PATTERN = re.compile(r'[\s\W_]+')
+
+
+def normalize_title(title, strip_keywords=False):
+    """统一大小写和标点；strip_keywords 为真时去掉汉化相关的关键词 (用于汉化包标题)"""
+    title = title or ''
+    if strip_keywords:
+        # 先去掉整词 (如 "中文")，再去掉单个关键词 (如 "汉"、"CN")
+        title = STRIP_PATTERN.sub(' ', title)
+        title = KEYWORD_PATTERN.sub(' ', title)
+    return PUNCT_PATTERN.sub(' ', title.lower()).strip()
+
+
+def title_ngrams(text, n=NGRAM_SIZE):
+    """标题的字符 n-gram 集合 (首尾补空格，短词也能产生 n-gram)"""
+    padded = f' {text} '
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class TitleIndex:
+    """
+    原版Mod标题的字符 n-gram 倒排索引
+    查询时只累加与查询共有 n-gram 的标题，按 Dice 系数 2|A∩B| / (|A| + |B|) 打分，
+    耗时与命中的倒排表长度成正比，而不是与标题总数成正比
+    """
+    def __init__(self, titles):
+        """titles: 可迭代的 (Mod ID, 标题)"""
+        self.ids = []
+        postings = {}
+        for mod_id, title in titles:
+            doc = len(self.ids)
+            self.ids.append(mod_id)
+            for gram in title_ngrams(normalize_title(title)):
+                postings.setdefault(gram, []).append(doc)
+
+        # 常用 n-gram 的倒排表很长，却几乎不能区分标题，直接丢弃 (打分时两边都不计入)
+        max_postings = max(10, int(len(self.ids) * MAX_POSTING_RATIO))
+        self.common_grams = {gram for gram, docs in postings.items() if len(docs) > max_postings}
+        self.postings = {gram: docs for gram, docs in postings.items() if len(docs) <= max_postings}
+        self.sizes = [0] * len(self.ids)
+        for docs in self.postings.values():
+            for doc in docs:
+                self.sizes[doc] += 1
+
+    def __len__(self):
+        return len(self.ids)
+
+    def query_grams(self, title):
+        """汉化包标题参与打分的 n-gram (去掉汉化关键词和常用 n-gram)；太少时返回空集合"""
+        grams = title_ngrams(normalize_title(title, strip_keywords=True)) - self.common_grams
+        return grams if len(grams) >= MIN_QUERY_GRAMS else set()
+
+    def search(self, title, limit=2, min_score=0.0):
+        """返回与汉化包标题最相似的原版 [(Mod ID, 相似度), ...]，按相似度从高到低，只返回不低于 min_score 的候选"""
+        grams = self.query_grams(title)
+        if not grams:
+            return []
+        shared = Counter()
+        for gram in grams:
+            postings = self.postings.get(gram)
+            if postings:
+                shared.update(postings)
+        # 共有 n-gram 数为 c 时相似度最高为 2c / (|A| + c)，据此先排除不可能达到 min_score 的标题
+        min_count = min_score * len(grams) / (2.0 - min_score)
+        sizes = self.sizes
+        scored = heapq.nlargest(limit, (
+            (2.0 * count / (len(grams) + sizes[doc]), doc) for doc, count in shared.items() if count >= min_count
+        ))
+        return [(self.ids[doc], score) for score, doc in scored if score >= min_score]
+
+    def candidates(self, title):
+        """决定匹配结果的候选 (最多两个，相似度不低于 CANDIDATE_SCORE)；其余标题怎么变化都不影响结果"""
+        return self.search(title, min_score=CANDIDATE_SCORE)
+
+    def match(self, title):
+        """返回 (Mod ID, 相似度)；没有足够可信的候选时返回 None"""
+        return pick_match(self.candidates(title))
+
+    def similar_queries(self, queries, titles, min_score=CANDIDATE_SCORE):
+        """
+        反向查询: queries 为 {键: 汉化包标题}，titles 为可迭代的 (Mod ID, 原版标题)
+        返回与其中任一原版标题的相似度不低于 min_score 的查询键 (标题按本索引的常用 n-gram 计算，无需在索引中)
+        """
+        by_gram = {}
+        query_sizes = {}
+        for key, title in queries.items():
+            grams = self.query_grams(title)
+            query_sizes[key] = len(grams)
+            for gram in grams:
+                by_gram.setdefault(gram, []).append(key)
+
+        found = set()
+        for _, title in titles:
+            grams = title_ngrams(normalize_title(title)) - self.common_grams
+            shared = Counter()
+            for gram in grams:
+                keys = by_gram.get(gram)
+                if keys:
+                    shared.update(keys)
+            found.update(key for key, count in shared.items()
+                         if 2.0 * count / (query_sizes[key] + len(grams)) >= min_score)
+        return found
+
+
+def pick_match(candidates, threshold=MATCH_THRESHOLD, margin=MIN_MARGIN):
+    """由 TitleIndex.candidates 的结果得出 (Mod ID, 相似度)；没有足够可信的候选时返回 None"""
+    if not candidates or candidates[0][1] < threshold:
+        return None
+    if len(candidates) > 1 and candidates[0][1] - candidates[1][1] < margin:
+        return None
+    return candidates[0]
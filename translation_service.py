@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+from depgraph import DependencyGraph
+from subscribe import plan_subscriptions, ensure_ranked
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ================= 配置区域 =================
+HOST = '127.0.0.1'
+PORT = 8765
+MAP_FILE = './translation_map.json'         # match.py 生成的对照表
+DEPGRAPH_FILE = './dependency_graph.json'   # match.py 生成的依赖关系图 (可选)
+RELOAD_INTERVAL = 5.0                        # 检查对照表是否被重新生成的间隔 (秒)
+MAX_REQUEST_BYTES = 4 * 1024 * 1024          # 单个请求体的大小上限
+# ===========================================
+
+LANGUAGES = ('simplified', 'traditional')
+
+
+class TranslationIndex:
+    """
+    常驻内存的对照表和依赖关系图
+    文件被 match.py 重新生成 (修改时间变化) 后自动重新读取；新数据读取完成后整体替换，读取期间照常提供查询
+    """
+    def __init__(self, map_path=MAP_FILE, graph_path=DEPGRAPH_FILE):
+        self.map_path = map_path
+        self.graph_path = graph_path
+        self.lock = threading.Lock()
+        self.translation_map = {}
+        self.graph = None
+        self.loaded_at = 0
+        self._mtimes = (None, None)
+
+    def _file_mtimes(self):
+        def mtime(path):
+            return os.path.getmtime(path) if path and os.path.exists(path) else None
+        return mtime(self.map_path), mtime(self.graph_path)
+
+    def reload_if_changed(self):
+        """文件有变化时重新读取，返回是否重新读取"""
+        mtimes = self._file_mtimes()
+        if mtimes == self._mtimes or mtimes[0] is None:
+            return False
+
+        with open(self.map_path, 'rb') as f:
+            translation_map = orjson.loads(f.read()) if orjson else json.load(f)
+        # 预先补全推荐排序 (旧版对照表)，之后的查询只读
+        for mod_data in translation_map.values():
+            ensure_ranked(mod_data)
+        graph = DependencyGraph.load(self.graph_path) if mtimes[1] is not None else None
+
+        with self.lock:
+            self.translation_map = translation_map
+            self.graph = graph
+            self.loaded_at = int(time.time())
+            self._mtimes = mtimes
+        print(f"已加载对照表: {len(translation_map)} 个原版Mod"
+              + (f"，依赖关系图 {len(graph)} 个节点" if graph is not None else ""))
+        return True
+
+    def snapshot(self):
+        with self.lock:
+            return self.translation_map, self.graph, self.loaded_at
+
+    def plan(self, subscribed_ids, language_preference):
+        translation_map, graph, loaded_at = self.snapshot()
+        return plan_subscriptions(translation_map, set(subscribed_ids), language_preference, graph, report=False), loaded_at
+
+    def watch(self, interval=RELOAD_INTERVAL):
+        """后台线程: 定期检查文件是否变化"""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload_if_changed()
+                except (OSError, ValueError, KeyError) as e:
+                    # 可能正在写入，下次再试
+                    print(f"重新加载失败，继续使用旧数据: {e}")
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+
+def make_handler(index):
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urlparse(self.path).path.rstrip('/')
+            translation_map, graph, loaded_at = index.snapshot()
+            if path == '/health':
+                self._send_json(200, {'mods': len(translation_map), 'graph': graph is not None, 'loaded_at': loaded_at})
+            elif path.startswith('/mods/'):
+                mod_data = translation_map.get(path[len('/mods/'):])
+                if mod_data is None:
+                    self._send_json(404, {'error': 'not found'})
+                else:
+                    self._send_json(200, mod_data)
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            """
+            POST /plan  {"subscribed": [ID, ...], "lang": "simplified" | "traditional"}
+            返回 {"translations": [{"id", "title", "origin"}, ...], "loaded_at": 对照表加载时间}
+            """
+            if urlparse(self.path).path.rstrip('/') != '/plan':
+                self._send_json(404, {'error': 'not found'})
+                return
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > MAX_REQUEST_BYTES:
+                self._send_json(413, {'error': 'request too large'})
+                return
+            try:
+                request = json.loads(self.rfile.read(length) or b'{}')
+                subscribed = [str(mod_id) for mod_id in request['subscribed']]
+                language = request.get('lang', 'simplified')
+                if language not in LANGUAGES:
+                    raise ValueError(f"unknown lang: {language}")
+            except (ValueError, KeyError, TypeError) as e:
+                self._send_json(400, {'error': str(e)})
+                return
+            translations, loaded_at = index.plan(subscribed, language)
+            self._send_json(200, {'translations': translations, 'loaded_at': loaded_at})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(host=HOST, port=PORT, map_path=MAP_FILE, graph_path=DEPGRAPH_FILE, reload_interval=RELOAD_INTERVAL):
+    index = TranslationIndex(map_path, graph_path)
+    if not index.reload_if_changed():
+        print(f"错误: 找不到对照表 {map_path}，请先运行 match.py")
+        return
+    index.watch(reload_interval)
+    server = ThreadingHTTPServer((host, port), make_handler(index))
+    server.daemon_threads = True
+    print(f"汉化对照表服务已启动: http://{host}:{port} (POST /plan, GET /mods/<ID>, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='汉化对照表查询服务: 常驻内存，对照表更新后自动重新加载')
+    parser.add_argument('--host', default=HOST, help='监听地址')
+    parser.add_argument('--port', type=int, default=PORT, help='监听端口')
+    parser.add_argument('--map', default=MAP_FILE, help='translation_map.json 路径')
+    parser.add_argument('--graph', default=DEPGRAPH_FILE, help='dependency_graph.json 路径 (不存在时忽略)')
+    parser.add_argument('--reload-interval', type=float, default=RELOAD_INTERVAL, help='检查文件更新的间隔 (秒)')
+    args = parser.parse_args()
+    serve(args.host, args.port, args.map, args.graph, args.reload_interval)
@@ -0,0 +1,233 @@
+import json
+import sqlite3
+import threading
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS items (
+    publishedfileid INTEGER PRIMARY KEY,
+    title           TEXT,
+    time_created    INTEGER,
+    time_updated    INTEGER,
+    subscriptions   INTEGER,
+    score           REAL,
+    crawled_at      INTEGER,
+    data            TEXT
+);
+CREATE TABLE IF NOT EXISTS tags (
+    item_id  INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    tag      TEXT NOT NULL,
+    PRIMARY KEY (item_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS children (
+    item_id   INTEGER NOT NULL,
+    position  INTEGER NOT NULL,
+    parent_id INTEGER NOT NULL,
+    PRIMARY KEY (item_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_items_time_updated ON items (time_updated);
+CREATE INDEX IF NOT EXISTS idx_tags_tag ON tags (tag);
+CREATE INDEX IF NOT EXISTS idx_children_parent ON children (parent_id);
+'''
+
+
+class WorkshopStore:
+    """
+    基于 SQLite 的创意工坊数据存储
+    items:    每个Mod一行，以 publishedfileid 为主键 (重复爬取时覆盖，天然去重)
+    tags:     Mod -> 标签 (按原顺序)，按标签建索引
+    children: Mod -> 依赖的Mod (汉化包 -> 原版)，按被依赖的ID建索引
+    data 列保存清洗后的完整条目 JSON
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # 并发分片爬取时多个线程共用一个连接，写入由锁串行化
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(SCHEMA)
+            self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def upsert_items(self, items, crawled_at=0):
+        """写入一批条目 (已存在的按 publishedfileid 覆盖)，一批一个事务"""
+        item_rows = []
+        tag_rows = []
+        child_rows = []
+        item_ids = []
+        for item in items:
+            item_id = int(item.get('publishedfileid'))
+            item_ids.append((item_id,))
+            item_rows.append((
+                item_id,
+                item.get('title'),
+                item.get('time_created'),
+                item.get('time_updated', 0),
+                item.get('subscriptions', 0),
+                (item.get('vote_data') or {}).get('score', 0),
+                crawled_at,
+                json.dumps(item, ensure_ascii=False)
+            ))
+            for position, tag in enumerate(item.get('tags') or []):
+                tag_rows.append((item_id, position, tag))
+            for position, child in enumerate(item.get('children') or []):
+                child_rows.append((item_id, position, int(child.get('publishedfileid'))))
+
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    '''INSERT INTO items (publishedfileid, title, time_created, time_updated, subscriptions, score, crawled_at, data)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT(publishedfileid) DO UPDATE SET
+                           title = excluded.title,
+                           time_created = excluded.time_created,
+                           time_updated = excluded.time_updated,
+                           subscriptions = excluded.subscriptions,
+                           score = excluded.score,
+                           crawled_at = excluded.crawled_at,
+                           data = excluded.data''',
+                    item_rows
+                )
+                self.conn.executemany('DELETE FROM tags WHERE item_id = ?', item_ids)
+                self.conn.executemany('DELETE FROM children WHERE item_id = ?', item_ids)
+                self.conn.executemany('INSERT INTO tags (item_id, position, tag) VALUES (?, ?, ?)', tag_rows)
+                self.conn.executemany('INSERT INTO children (item_id, position, parent_id) VALUES (?, ?, ?)', child_rows)
+
+    def delete_items(self, item_ids):
+        """删除条目及其标签和依赖关系"""
+        rows = [(int(item_id),) for item_id in item_ids]
+        with self.lock:
+            with self.conn:
+                self.conn.executemany('DELETE FROM items WHERE publishedfileid = ?', rows)
+                self.conn.executemany('DELETE FROM tags WHERE item_id = ?', rows)
+                self.conn.executemany('DELETE FROM children WHERE item_id = ?', rows)
+
+    def delete_not_crawled_since(self, crawled_at):
+        """全量爬取成功后删除本次没有出现的条目 (已从创意工坊删除或不再符合筛选条件)，返回删除数量"""
+        with self.lock:
+            stale_ids = [row[0] for row in self.conn.execute(
+                'SELECT publishedfileid FROM items WHERE crawled_at < ?', (crawled_at,))]
+        if stale_ids:
+            self.delete_items(stale_ids)
+        return len(stale_ids)
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+
+    def get_item(self, item_id):
+        """按ID读取完整条目，不存在时返回 None"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT data FROM items WHERE publishedfileid = ?', (int(item_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find_ids_by_tag(self, tag):
+        """返回带有指定标签的所有Mod ID"""
+        with self.lock:
+            return [str(row[0]) for row in self.conn.execute(
+                'SELECT item_id FROM tags WHERE tag = ?', (tag,))]
+
+    def find_dependents(self, parent_id):
+        """返回依赖指定Mod的所有Mod ID (例如某个原版Mod的全部汉化包)"""
+        with self.lock:
+            return [str(row[0]) for row in self.conn.execute(
+                'SELECT item_id FROM children WHERE parent_id = ?', (int(parent_id),))]
+
+    def find_updated_since(self, timestamp):
+        """返回 time_updated 不早于指定时间的所有Mod ID"""
+        with self.lock:
+            return [str(row[0]) for row in self.conn.execute(
+                'SELECT publishedfileid FROM items WHERE time_updated >= ?', (timestamp,))]
+
+    def get_update_times(self):
+        """返回所有条目的 time_updated (ID -> 时间戳)，用于判断哪些条目有变化"""
+        with self.lock:
+            return {str(item_id): time_updated or 0 for item_id, time_updated in self.conn.execute(
+                'SELECT publishedfileid, time_updated FROM items')}
+
+    def get_titles(self, item_ids):
+        """按ID批量读取标题 (ID -> 标题)，不存在的ID不出现在结果中"""
+        item_ids = [int(item_id) for item_id in item_ids]
+        titles = {}
+        with self.lock:
+            for i in range(0, len(item_ids), 500):
+                chunk = item_ids[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                for item_id, title in self.conn.execute(
+                        f'SELECT publishedfileid, title FROM items WHERE publishedfileid IN ({placeholders})', chunk):
+                    titles[str(item_id)] = title or ''
+        return titles
+
+    def iter_items(self, item_ids=None, batch_size=1000):
+        """
+        逐条产出 match.py 需要的字段 (不解析 data 列)；item_ids 为空时产出全部条目
+        格式与爬虫输出一致: tags 为字符串列表，children 为 [{'publishedfileid': ...}]
+        按ID顺序分批读取，每批只取出这批条目的标签和依赖，内存占用与条目总数无关
+        (批与批之间释放锁，按上一批最后的ID继续，期间其他线程可以写入)
+        """
+        if item_ids is None:
+            last_id = None
+            while True:
+                if last_id is None:
+                    batch = self._query_items('ORDER BY publishedfileid LIMIT ?', (batch_size,))
+                else:
+                    batch = self._query_items('WHERE publishedfileid > ? ORDER BY publishedfileid LIMIT ?',
+                                              (last_id, batch_size))
+                yield from batch
+                if len(batch) < batch_size:
+                    return
+                last_id = int(batch[-1]['publishedfileid'])
+        item_ids = sorted({int(item_id) for item_id in item_ids})
+        # SQLite 单条语句的参数数量有限，分批查询
+        for i in range(0, len(item_ids), 500):
+            chunk = item_ids[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            yield from self._query_items(f'WHERE publishedfileid IN ({placeholders}) ORDER BY publishedfileid',
+                                         chunk, f'WHERE item_id IN ({placeholders})')
+
+    def _query_items(self, item_clause, params, link_clause=None):
+        """
+        读取一批条目，返回列表
+        item_clause 筛选 items 表 (须按ID排序)；link_clause 为空时按这批条目的ID范围读取标签和依赖，
+        否则用 link_clause 和同样的 params 筛选
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                f'SELECT publishedfileid, title, time_updated, subscriptions, score FROM items {item_clause}', params
+            ).fetchall()
+            if not rows:
+                return []
+            link_params = params
+            if link_clause is None:
+                link_clause = 'WHERE item_id BETWEEN ? AND ?'
+                link_params = (rows[0][0], rows[-1][0])
+            tags = {}
+            for item_id, tag in self.conn.execute(
+                    f'SELECT item_id, tag FROM tags {link_clause} ORDER BY item_id, position', link_params):
+                tags.setdefault(item_id, []).append(tag)
+            children = {}
+            for item_id, parent_id in self.conn.execute(
+                    f'SELECT item_id, parent_id FROM children {link_clause} ORDER BY item_id, position', link_params):
+                children.setdefault(item_id, []).append({'publishedfileid': str(parent_id)})
+
+        return [{
+            'publishedfileid': str(item_id),
+            'title': title or '',
+            'time_updated': time_updated or 0,
+            'tags': tags.get(item_id, []),
+            'children': children.get(item_id, []),
+            'subscriptions': subscriptions or 0,
+            'vote_data': {'score': score or 0}
+        } for item_id, title, time_updated, subscriptions, score in rows]